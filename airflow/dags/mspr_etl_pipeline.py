@@ -3,8 +3,9 @@ from datetime import datetime
 from airflow import DAG
 from airflow.operators.python import PythonOperator
 
-from src.etl import run_etl
-from src.dashboard import build_dashboard
+from src.etl import export_clean, run_etl
+from src.dashboard import build_dashboard, web_export
+from src.model import predict, retrain
 
 
 with DAG(
@@ -30,4 +31,27 @@ with DAG(
         python_callable=build_dashboard.run_dashboard_pipeline,
     )
 
+    export_web_dashboard = PythonOperator(
+        task_id="export_web_dashboard",
+        python_callable=web_export.run_web_dashboard_pipeline,
+    )
+
+    export_clean_dataset = PythonOperator(
+        task_id="export_clean_dataset",
+        python_callable=export_clean.run_export_pipeline,
+    )
+
+    retrain_models = PythonOperator(
+        task_id="retrain_models",
+        python_callable=retrain.run_retrain_pipeline,
+    )
+
+    score_predictions = PythonOperator(
+        task_id="score_predictions",
+        python_callable=predict.run_prediction_pipeline,
+    )
+
     load_presidential_results >> load_socio_economic_indicators >> build_matplotlib_dashboard
+    load_socio_economic_indicators >> export_web_dashboard
+    load_socio_economic_indicators >> export_clean_dataset
+    load_socio_economic_indicators >> retrain_models >> score_predictions
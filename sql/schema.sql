@@ -1,14 +1,18 @@
 -- Postgres schema for MSPR Electio Analytics POC (Ile-de-France)
 
 CREATE TABLE IF NOT EXISTS geo_department (
-  dept_code char(2) PRIMARY KEY,
-  dept_name text NOT NULL
+  dept_code varchar(3) PRIMARY KEY,
+  dept_name text NOT NULL,
+  region_name text
 );
 
+-- Columns added after the first release: older databases get them here.
+ALTER TABLE geo_department ADD COLUMN IF NOT EXISTS region_name text;
+
 CREATE TABLE IF NOT EXISTS geo_commune (
   insee_code char(5) PRIMARY KEY,
   commune_name text NOT NULL,
-  dept_code char(2) NOT NULL REFERENCES geo_department (dept_code),
+  dept_code varchar(3) NOT NULL REFERENCES geo_department (dept_code),
   population integer,
   area_km2 numeric,
   latitude numeric,
@@ -28,7 +32,22 @@ CREATE TABLE IF NOT EXISTS candidate (
   candidate_id serial PRIMARY KEY,
   candidate_name text NOT NULL,
   party_name text,
-  party_code text
+  party_code text,
+  person_key text
+);
+
+ALTER TABLE candidate ADD COLUMN IF NOT EXISTS person_key text;
+
+CREATE UNIQUE INDEX IF NOT EXISTS candidate_person_key_idx
+ON candidate (person_key) WHERE person_key IS NOT NULL;
+
+-- Normalised spelling seen in a given year -> candidate, filled by
+-- src/etl/candidates.py so reloads skip fuzzy matching.
+CREATE TABLE IF NOT EXISTS candidate_alias (
+  alias_key text NOT NULL,
+  year smallint NOT NULL,
+  candidate_id integer NOT NULL REFERENCES candidate (candidate_id),
+  PRIMARY KEY (alias_key, year)
 );
 
 CREATE TABLE IF NOT EXISTS election_result (
@@ -59,3 +78,147 @@ CREATE TABLE IF NOT EXISTS indicator_value (
   source_file text,
   PRIMARY KEY (indicator_id, insee_code, year)
 );
+
+-- Latest value per indicator for a set of geographies (src/etl/stats.py):
+-- the lookup filters on insee_code and year, not on indicator_id.
+CREATE INDEX IF NOT EXISTS indicator_value_geo_year_idx
+ON indicator_value (insee_code, indicator_id, year);
+
+-- Bumped by the ETL in every loading transaction; read clients key their
+-- caches on it.
+CREATE TABLE IF NOT EXISTS etl_load_version (
+  singleton boolean PRIMARY KEY DEFAULT true CHECK (singleton),
+  version bigint NOT NULL DEFAULT 0,
+  source text,
+  updated_at timestamptz NOT NULL DEFAULT now()
+);
+
+INSERT INTO etl_load_version (singleton) VALUES (true) ON CONFLICT DO NOTHING;
+
+-- Load units completed by the ETL, with the fingerprint of their input
+-- (src/etl/checkpoints.py); written by the loading transaction itself.
+CREATE TABLE IF NOT EXISTS etl_checkpoint (
+  pipeline text NOT NULL,
+  unit text NOT NULL,
+  fingerprint text NOT NULL,
+  rows bigint,
+  completed_at timestamptz NOT NULL DEFAULT now(),
+  PRIMARY KEY (pipeline, unit)
+);
+
+-- Spatial neighbour graph and spatial-lag features (src/etl/spatial.py).
+CREATE TABLE IF NOT EXISTS geo_neighbor (
+  insee_code char(5) NOT NULL REFERENCES geo_commune (insee_code),
+  neighbor_code char(5) NOT NULL REFERENCES geo_commune (insee_code),
+  rank smallint NOT NULL,
+  distance_km real NOT NULL,
+  weight real NOT NULL,
+  PRIMARY KEY (insee_code, neighbor_code)
+);
+
+CREATE TABLE IF NOT EXISTS election_result_spatial_lag (
+  election_id integer NOT NULL REFERENCES election (election_id),
+  insee_code char(5) NOT NULL REFERENCES geo_commune (insee_code),
+  candidate_id integer NOT NULL REFERENCES candidate (candidate_id),
+  lag_vote_share real,
+  neighbor_count smallint NOT NULL,
+  PRIMARY KEY (election_id, insee_code, candidate_id)
+);
+
+CREATE TABLE IF NOT EXISTS indicator_value_spatial_lag (
+  indicator_id integer NOT NULL REFERENCES indicator (indicator_id),
+  insee_code char(5) NOT NULL REFERENCES geo_commune (insee_code),
+  year integer NOT NULL,
+  lag_value double precision,
+  neighbor_count smallint NOT NULL,
+  PRIMARY KEY (indicator_id, insee_code, year)
+);
+
+-- Batch predictions written by src/model/predict.py (one row per model
+-- version, scenario, geography and candidate).
+CREATE TABLE IF NOT EXISTS model_prediction (
+  model_name text NOT NULL,
+  model_version text NOT NULL,
+  scenario text NOT NULL,
+  insee_code char(5) NOT NULL REFERENCES geo_commune (insee_code),
+  candidate_id integer NOT NULL REFERENCES candidate (candidate_id),
+  predicted_share real NOT NULL,
+  scored_at timestamptz NOT NULL DEFAULT now(),
+  PRIMARY KEY (model_name, model_version, scenario, insee_code, candidate_id)
+);
+
+-- Candidate -> party -> bloc mapping and bloc rollups (src/etl/blocs.py).
+CREATE TABLE IF NOT EXISTS political_bloc (
+  bloc_code text PRIMARY KEY,
+  bloc_name text NOT NULL,
+  position smallint NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS political_party (
+  party_code text PRIMARY KEY,
+  party_name text NOT NULL,
+  bloc_code text NOT NULL REFERENCES political_bloc (bloc_code)
+);
+
+CREATE TABLE IF NOT EXISTS election_candidate_party (
+  election_id integer NOT NULL REFERENCES election (election_id),
+  candidate_id integer NOT NULL REFERENCES candidate (candidate_id),
+  party_code text REFERENCES political_party (party_code),
+  bloc_code text NOT NULL REFERENCES political_bloc (bloc_code),
+  PRIMARY KEY (election_id, candidate_id)
+);
+
+CREATE TABLE IF NOT EXISTS bloc_result (
+  election_id integer NOT NULL REFERENCES election (election_id),
+  level text NOT NULL CHECK (level IN ('commune', 'departement', 'region')),
+  geo_code text NOT NULL,
+  bloc_code text NOT NULL REFERENCES political_bloc (bloc_code),
+  votes bigint,
+  votes_valid bigint,
+  vote_share double precision,
+  candidate_count smallint NOT NULL,
+  PRIMARY KEY (election_id, level, geo_code, bloc_code)
+);
+
+CREATE TABLE IF NOT EXISTS indicator_vote_stat (
+  election_id integer NOT NULL REFERENCES election (election_id),
+  scope_level text NOT NULL CHECK (scope_level IN ('france', 'region', 'departement')),
+  scope_code text NOT NULL,
+  indicator_id integer NOT NULL REFERENCES indicator (indicator_id),
+  target_kind text NOT NULL CHECK (target_kind IN ('candidate', 'bloc')),
+  target_code text NOT NULL,
+  n_obs integer NOT NULL,
+  pearson_r double precision,
+  slope double precision,
+  intercept double precision,
+  PRIMARY KEY (election_id, scope_level, scope_code, indicator_id, target_kind, target_code)
+);
+
+-- Last version of each bureau applied by the live mode (src/etl/live.py);
+-- a changed bureau is swapped out of its commune and department totals.
+CREATE TABLE IF NOT EXISTS live_bureau (
+  election_id integer NOT NULL REFERENCES election (election_id),
+  bureau_key text NOT NULL,
+  insee_code char(5) NOT NULL REFERENCES geo_commune (insee_code),
+  row_hash text NOT NULL,
+  registered integer NOT NULL,
+  votes_cast integer NOT NULL,
+  votes_valid integer NOT NULL,
+  candidate_ids integer[] NOT NULL,
+  votes integer[] NOT NULL,
+  updated_at timestamptz NOT NULL DEFAULT now(),
+  PRIMARY KEY (election_id, bureau_key)
+);
+
+-- Read position of each live feed file, committed with the bureaus it
+-- produced: a restart resumes from file_offset.
+CREATE TABLE IF NOT EXISTS live_feed_file (
+  election_id integer NOT NULL REFERENCES election (election_id),
+  path text NOT NULL,
+  inode bigint NOT NULL,
+  file_offset bigint NOT NULL,
+  size bigint NOT NULL,
+  mtime_ns bigint NOT NULL,
+  header text,
+  PRIMARY KEY (election_id, path)
+);
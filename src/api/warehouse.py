@@ -0,0 +1,477 @@
+from __future__ import annotations
+
+import io
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from src.etl.db import fetch_load_version, get_pool
+from src.etl.export_clean import rows_to_table
+
+CACHE_MAX_ENTRIES = int(os.getenv("WAREHOUSE_CACHE_MAX_ENTRIES", "256"))
+CACHE_TTL_SECONDS = float(os.getenv("WAREHOUSE_CACHE_TTL_SECONDS", "900"))
+# The load-version stamp is re-read at most this often; between two reads a
+# cache hit never touches the database.
+VERSION_CHECK_SECONDS = float(os.getenv("WAREHOUSE_VERSION_CHECK_SECONDS", "5"))
+# election_result holds department rows under the pseudo commune code
+# rpad(dept_code, 5, '0') and, after live loads, commune rows next to them.
+# Result readers pick one level; level=None returns both.
+RESULT_LEVEL_FILTERS = {
+    "departement": "er.insee_code = rpad(gc.dept_code, 5, '0')",
+    "commune": "er.insee_code <> rpad(gc.dept_code, 5, '0')",
+}
+
+RESULT_SCHEMA = pa.schema(
+    [
+        ("year", pa.int16()),
+        ("round", pa.int16()),
+        ("dept_code", pa.string()),
+        ("dept_name", pa.string()),
+        ("insee_code", pa.string()),
+        ("candidate_name", pa.string()),
+        ("party_code", pa.string()),
+        ("registered", pa.int32()),
+        ("votes_cast", pa.int32()),
+        ("votes_valid", pa.int32()),
+        ("votes", pa.int32()),
+        ("vote_share", pa.float64()),
+    ]
+)
+
+TURNOUT_SCHEMA = pa.schema(
+    [
+        ("year", pa.int16()),
+        ("dept_code", pa.string()),
+        ("dept_name", pa.string()),
+        ("insee_code", pa.string()),
+        ("turnout_rate", pa.float64()),
+    ]
+)
+
+INDICATOR_SCHEMA = pa.schema(
+    [
+        ("indicator_code", pa.string()),
+        ("year", pa.int16()),
+        ("dept_code", pa.string()),
+        ("insee_code", pa.string()),
+        ("value", pa.float64()),
+        ("source_file", pa.string()),
+    ]
+)
+
+WINNER_SCHEMA = pa.schema(
+    [
+        ("year", pa.int16()),
+        ("round", pa.int16()),
+        ("dept_code", pa.string()),
+        ("dept_name", pa.string()),
+        ("insee_code", pa.string()),
+        ("candidate_name", pa.string()),
+        ("votes", pa.int32()),
+        ("vote_share", pa.float64()),
+    ]
+)
+
+BLOC_SCHEMA = pa.schema(
+    [
+        ("year", pa.int16()),
+        ("round", pa.int16()),
+        ("level", pa.string()),
+        ("geo_code", pa.string()),
+        ("bloc_code", pa.string()),
+        ("bloc_name", pa.string()),
+        ("votes", pa.int64()),
+        ("votes_valid", pa.int64()),
+        ("vote_share", pa.float64()),
+    ]
+)
+
+STAT_SCHEMA = pa.schema(
+    [
+        ("year", pa.int16()),
+        ("round", pa.int16()),
+        ("scope_level", pa.string()),
+        ("scope_code", pa.string()),
+        ("indicator_code", pa.string()),
+        ("target_kind", pa.string()),
+        ("target_code", pa.string()),
+        ("target_name", pa.string()),
+        ("n_obs", pa.int32()),
+        ("pearson_r", pa.float64()),
+        ("slope", pa.float64()),
+        ("intercept", pa.float64()),
+    ]
+)
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+_version_state = {"version": None, "checked_at": 0.0}
+
+
+def _where(filters):
+    clauses = [clause for clause, value in filters if value is not None]
+    params = [value for clause, value in filters if value is not None and "%s" in clause]
+    if not clauses:
+        return "", params
+    return "WHERE " + " AND ".join(clauses), params
+
+
+def _level_filter(level):
+    if level is None:
+        return ("", None)
+    if level not in RESULT_LEVEL_FILTERS:
+        raise RuntimeError(f"Unknown result level {level!r}.")
+    return (RESULT_LEVEL_FILTERS[level], level)
+
+
+def _run_query(sql, params, schema):
+    pool = get_pool()
+    conn = pool.getconn()
+    try:
+        with conn:
+            with conn.cursor() as cur:
+                cur.execute(sql, params)
+                return rows_to_table(cur.fetchall(), schema)
+    finally:
+        pool.putconn(conn)
+
+
+def current_load_version(force=False):
+    now = time.monotonic()
+    if (
+        not force
+        and _version_state["version"] is not None
+        and now - _version_state["checked_at"] < VERSION_CHECK_SECONDS
+    ):
+        return _version_state["version"]
+
+    pool = get_pool()
+    conn = pool.getconn()
+    try:
+        with conn:
+            with conn.cursor() as cur:
+                version = fetch_load_version(cur)
+    finally:
+        pool.putconn(conn)
+
+    with _cache_lock:
+        if version != _version_state["version"]:
+            _cache.clear()
+        _version_state["version"] = version
+        _version_state["checked_at"] = now
+    return version
+
+
+def clear_cache():
+    with _cache_lock:
+        _cache.clear()
+        _version_state["version"] = None
+        _version_state["checked_at"] = 0.0
+
+
+def cache_info():
+    with _cache_lock:
+        return {
+            "entries": len(_cache),
+            "max_entries": CACHE_MAX_ENTRIES,
+            "ttl_seconds": CACHE_TTL_SECONDS,
+            "load_version": _version_state["version"],
+        }
+
+
+def _to_payload(table, fmt):
+    if fmt == "arrow":
+        return table
+    if fmt == "parquet":
+        sink = io.BytesIO()
+        pq.write_table(table, sink, compression="zstd")
+        return sink.getvalue()
+    if fmt == "pandas":
+        return table.to_pandas()
+    raise ValueError(f"Unsupported payload format: {fmt}")
+
+
+def _cached(name, params, fmt, build_table):
+    version = current_load_version()
+    key = (name, params, fmt, version)
+    now = time.monotonic()
+    with _cache_lock:
+        entry = _cache.get(key)
+        if entry is not None and now - entry[0] < CACHE_TTL_SECONDS:
+            _cache.move_to_end(key)
+            payload = entry[1]
+            # DataFrames are mutable; hand out a copy so callers cannot
+            # alter what the next reader gets.
+            return payload.copy() if fmt == "pandas" else payload
+
+    table = build_table()
+    payload = _to_payload(table, fmt)
+    with _cache_lock:
+        _cache[key] = (now, payload)
+        _cache.move_to_end(key)
+        while len(_cache) > CACHE_MAX_ENTRIES:
+            _cache.popitem(last=False)
+    return payload.copy() if fmt == "pandas" else payload
+
+
+def _results_query(
+    year=None, dept_code=None, round_no=1, election_type="presidentielle", level="departement"
+):
+    where, params = _where(
+        [
+            ("e.election_type = %s", election_type),
+            ("e.round = %s", round_no),
+            ("EXTRACT(YEAR FROM e.election_date)::int = %s", year),
+            ("gc.dept_code = %s", dept_code),
+            _level_filter(level),
+        ]
+    )
+    sql = f"""
+        SELECT
+            EXTRACT(YEAR FROM e.election_date)::int AS year,
+            e.round,
+            gc.dept_code::text,
+            d.dept_name,
+            er.insee_code::text,
+            c.candidate_name,
+            c.party_code,
+            er.registered,
+            er.votes_cast,
+            er.votes_valid,
+            er.votes,
+            er.vote_share::float8
+        FROM election_result er
+        JOIN election e ON e.election_id = er.election_id
+        JOIN candidate c ON c.candidate_id = er.candidate_id
+        JOIN geo_commune gc ON gc.insee_code = er.insee_code
+        JOIN geo_department d ON d.dept_code = gc.dept_code
+        {where}
+        ORDER BY year, gc.dept_code, er.insee_code, c.candidate_name
+    """
+    return sql, params
+
+
+def results(
+    year=None,
+    dept_code=None,
+    round_no=1,
+    election_type="presidentielle",
+    level="departement",
+    fmt="arrow",
+):
+    sql, params = _results_query(year, dept_code, round_no, election_type, level)
+    return _cached(
+        "results",
+        (year, dept_code, round_no, election_type, level),
+        fmt,
+        lambda: _run_query(sql, params, RESULT_SCHEMA),
+    )
+
+
+def _turnout_series_query(dept_code=None):
+    where, params = _where(
+        [("i.indicator_code = %s", "turnout_rate"), ("gc.dept_code = %s", dept_code)]
+    )
+    sql = f"""
+        SELECT iv.year, gc.dept_code::text, d.dept_name, iv.insee_code::text, iv.value::float8
+        FROM indicator_value iv
+        JOIN indicator i ON i.indicator_id = iv.indicator_id
+        JOIN geo_commune gc ON gc.insee_code = iv.insee_code
+        JOIN geo_department d ON d.dept_code = gc.dept_code
+        {where}
+        ORDER BY gc.dept_code, iv.insee_code, iv.year
+    """
+    return sql, params
+
+
+def turnout_series(dept_code=None, fmt="arrow"):
+    sql, params = _turnout_series_query(dept_code)
+    return _cached(
+        "turnout_series", (dept_code,), fmt, lambda: _run_query(sql, params, TURNOUT_SCHEMA)
+    )
+
+
+def _indicator_series_query(indicator_code=None, dept_code=None):
+    where, params = _where(
+        [
+            ("i.indicator_code <> %s", "turnout_rate"),
+            ("i.indicator_code = %s", indicator_code),
+            ("gc.dept_code = %s", dept_code),
+        ]
+    )
+    sql = f"""
+        SELECT
+            i.indicator_code,
+            iv.year,
+            gc.dept_code::text,
+            iv.insee_code::text,
+            iv.value::float8,
+            iv.source_file
+        FROM indicator_value iv
+        JOIN indicator i ON i.indicator_id = iv.indicator_id
+        JOIN geo_commune gc ON gc.insee_code = iv.insee_code
+        {where}
+        ORDER BY i.indicator_code, iv.insee_code, iv.year
+    """
+    return sql, params
+
+
+def indicator_series(indicator_code=None, dept_code=None, fmt="arrow"):
+    sql, params = _indicator_series_query(indicator_code, dept_code)
+    return _cached(
+        "indicator_series",
+        (indicator_code, dept_code),
+        fmt,
+        lambda: _run_query(sql, params, INDICATOR_SCHEMA),
+    )
+
+
+def _winners_query(
+    year=None, dept_code=None, round_no=1, election_type="presidentielle", level="departement"
+):
+    where, params = _where(
+        [
+            ("e.election_type = %s", election_type),
+            ("e.round = %s", round_no),
+            ("EXTRACT(YEAR FROM e.election_date)::int = %s", year),
+            ("gc.dept_code = %s", dept_code),
+            _level_filter(level),
+        ]
+    )
+    sql = f"""
+        SELECT DISTINCT ON (er.election_id, er.insee_code)
+            EXTRACT(YEAR FROM e.election_date)::int AS year,
+            e.round,
+            gc.dept_code::text,
+            d.dept_name,
+            er.insee_code::text,
+            c.candidate_name,
+            er.votes,
+            er.vote_share::float8
+        FROM election_result er
+        JOIN election e ON e.election_id = er.election_id
+        JOIN candidate c ON c.candidate_id = er.candidate_id
+        JOIN geo_commune gc ON gc.insee_code = er.insee_code
+        JOIN geo_department d ON d.dept_code = gc.dept_code
+        {where}
+        ORDER BY er.election_id, er.insee_code, er.vote_share DESC NULLS LAST
+    """
+    return sql, params
+
+
+def winners(
+    year=None,
+    dept_code=None,
+    round_no=1,
+    election_type="presidentielle",
+    level="departement",
+    fmt="arrow",
+):
+    sql, params = _winners_query(year, dept_code, round_no, election_type, level)
+    return _cached(
+        "winners",
+        (year, dept_code, round_no, election_type, level),
+        fmt,
+        lambda: _run_query(sql, params, WINNER_SCHEMA),
+    )
+
+
+def bloc_results(
+    year=None,
+    level="departement",
+    geo_code=None,
+    round_no=1,
+    election_type="presidentielle",
+    fmt="arrow",
+):
+    # Reads the pre-aggregated bloc_result rollup, never election_result.
+    where, params = _where(
+        [
+            ("e.election_type = %s", election_type),
+            ("e.round = %s", round_no),
+            ("EXTRACT(YEAR FROM e.election_date)::int = %s", year),
+            ("br.level = %s", level),
+            ("br.geo_code = %s", geo_code),
+        ]
+    )
+    sql = f"""
+        SELECT
+            EXTRACT(YEAR FROM e.election_date)::int AS year,
+            e.round,
+            br.level,
+            br.geo_code,
+            br.bloc_code,
+            pb.bloc_name,
+            br.votes,
+            br.votes_valid,
+            br.vote_share
+        FROM bloc_result br
+        JOIN election e ON e.election_id = br.election_id
+        JOIN political_bloc pb ON pb.bloc_code = br.bloc_code
+        {where}
+        ORDER BY year, br.level, br.geo_code, pb.position
+    """
+    return _cached(
+        "bloc_results",
+        (year, level, geo_code, round_no, election_type),
+        fmt,
+        lambda: _run_query(sql, params, BLOC_SCHEMA),
+    )
+
+
+def indicator_vote_stats(
+    year=None,
+    scope_level="france",
+    scope_code=None,
+    indicator_code=None,
+    target_kind=None,
+    round_no=1,
+    election_type="presidentielle",
+    fmt="arrow",
+):
+    # Precomputed by the stats stage after each load (src/etl/stats.py).
+    where, params = _where(
+        [
+            ("e.election_type = %s", election_type),
+            ("e.round = %s", round_no),
+            ("EXTRACT(YEAR FROM e.election_date)::int = %s", year),
+            ("s.scope_level = %s", scope_level),
+            ("s.scope_code = %s", scope_code),
+            ("i.indicator_code = %s", indicator_code),
+            ("s.target_kind = %s", target_kind),
+        ]
+    )
+    sql = f"""
+        SELECT
+            EXTRACT(YEAR FROM e.election_date)::int AS year,
+            e.round,
+            s.scope_level,
+            s.scope_code,
+            i.indicator_code,
+            s.target_kind,
+            s.target_code,
+            COALESCE(c.candidate_name, pb.bloc_name) AS target_name,
+            s.n_obs,
+            s.pearson_r,
+            s.slope,
+            s.intercept
+        FROM indicator_vote_stat s
+        JOIN election e ON e.election_id = s.election_id
+        JOIN indicator i ON i.indicator_id = s.indicator_id
+        LEFT JOIN candidate c
+          ON s.target_kind = 'candidate' AND c.candidate_id::text = s.target_code
+        LEFT JOIN political_bloc pb
+          ON s.target_kind = 'bloc' AND pb.bloc_code = s.target_code
+        {where}
+        ORDER BY year, s.scope_level, s.scope_code, i.indicator_code, s.target_kind, s.target_code
+    """
+    return _cached(
+        "indicator_vote_stats",
+        (year, scope_level, scope_code, indicator_code, target_kind, round_no, election_type),
+        fmt,
+        lambda: _run_query(sql, params, STAT_SCHEMA),
+    )
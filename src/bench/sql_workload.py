@@ -0,0 +1,416 @@
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import shutil
+import socket
+import statistics
+import subprocess
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+
+import psycopg2
+
+from src.api import warehouse
+from src.etl import stats
+from src.etl.geo import DEPT_NAME_BY_CODE, REGION_BY_DEPT_CODE, dept_insee_code
+from src.model import tensor
+
+SCHEMA_PATH = Path(__file__).resolve().parents[2] / "sql" / "schema.sql"
+BENCH_OUTPUT_DIR = Path(os.getenv("BENCH_OUTPUT_DIR", "data/processed/bench"))
+BENCH_BASELINE_PATH = Path(os.getenv("BENCH_BASELINE", "sql/bench_baseline.json"))
+# Server to create the throwaway database on; without it a temporary cluster
+# is started with initdb/pg_ctl when they are installed, else DB_* is used.
+BENCH_DSN = os.getenv("BENCH_DSN", "")
+BENCH_REPEAT = int(os.getenv("BENCH_REPEAT", "5"))
+# A query fails when its median is this much slower than the baseline...
+BENCH_REGRESSION_THRESHOLD = float(os.getenv("BENCH_REGRESSION_THRESHOLD", "0.25"))
+# ...and slower by at least this many milliseconds (timer noise on fast queries).
+BENCH_MIN_DELTA_MS = float(os.getenv("BENCH_MIN_DELTA_MS", "5"))
+# Tables at least this large must not be read by a sequential scan, unless
+# the query reads them whole by design.
+BENCH_LARGE_TABLE_ROWS = int(os.getenv("BENCH_LARGE_TABLE_ROWS", "100000"))
+
+BENCH_SCALE = {
+    "communes_per_dept": int(os.getenv("BENCH_COMMUNES_PER_DEPT", "350")),
+    "years": [1995, 2002, 2007, 2012, 2017, 2022],
+    "candidates": int(os.getenv("BENCH_CANDIDATES", "12")),
+    "indicators": int(os.getenv("BENCH_INDICATORS", "10")),
+}
+
+SYNTHETIC_COMMUNES = """
+    INSERT INTO geo_commune (insee_code, commune_name, dept_code, population)
+    SELECT d.dept_code || lpad(n::text, 5 - length(d.dept_code), '0'),
+           'Commune ' || d.dept_code || '-' || n,
+           d.dept_code,
+           (random() * 20000)::int
+    FROM geo_department d
+    CROSS JOIN generate_series(1, %s) AS n
+    WHERE n < power(10, 5 - length(d.dept_code))
+"""
+
+SYNTHETIC_ELECTIONS = """
+    INSERT INTO election (election_type, election_date, round, scope)
+    SELECT 'presidentielle', make_date(y, 4, 20) + (r - 1) * 14, r, 'commune'
+    FROM unnest(%s::int[]) AS y
+    CROSS JOIN generate_series(1, 2) AS r
+"""
+
+SYNTHETIC_CANDIDATES = """
+    INSERT INTO candidate (candidate_name, party_code)
+    SELECT format('BENCH %%s %%s', y, k), 'P' || k
+    FROM unnest(%s::int[]) AS y
+    CROSS JOIN generate_series(1, %s) AS k
+"""
+
+# Every commune x candidate of every election; second rounds keep the first
+# two candidates.
+SYNTHETIC_RESULTS = """
+    INSERT INTO election_result (
+      election_id, insee_code, candidate_id, registered, votes_cast, votes_valid, votes,
+      vote_share
+    )
+    SELECT e.election_id, gc.insee_code, c.candidate_id, 1000, 800, 780, v.votes,
+           round(v.votes / 780.0, 5)
+    FROM election e
+    JOIN candidate c
+      ON split_part(c.candidate_name, ' ', 2)::int = EXTRACT(YEAR FROM e.election_date)::int
+     AND (e.round = 1 OR split_part(c.candidate_name, ' ', 3)::int <= 2)
+    CROSS JOIN geo_commune gc
+    CROSS JOIN LATERAL (
+      SELECT (random() * 780 / split_part(c.candidate_name, ' ', 3)::int)::int AS votes
+    ) v
+    WHERE c.candidate_name LIKE 'BENCH %'
+"""
+
+SYNTHETIC_INDICATORS = """
+    INSERT INTO indicator (indicator_code, indicator_name, unit, source)
+    SELECT code, code, '%%', 'synthetic'
+    FROM unnest(%s::text[]) AS code
+"""
+
+SYNTHETIC_INDICATOR_VALUES = """
+    INSERT INTO indicator_value (indicator_id, insee_code, year, value, source_file)
+    SELECT i.indicator_id, gc.insee_code, y, round((random() * 100)::numeric, 3), 'synthetic'
+    FROM indicator i
+    CROSS JOIN geo_commune gc
+    CROSS JOIN unnest(%s::int[]) AS y
+"""
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@contextmanager
+def _temporary_cluster():
+    root = Path(tempfile.mkdtemp(prefix="mspr_bench_pg_"))
+    data_dir = root / "data"
+    port = _free_port()
+    subprocess.run(
+        ["initdb", "-D", str(data_dir), "-U", "bench", "--auth=trust", "-E", "UTF8"],
+        check=True,
+        capture_output=True,
+    )
+    subprocess.run(
+        [
+            "pg_ctl",
+            "-D",
+            str(data_dir),
+            "-l",
+            str(root / "server.log"),
+            "-o",
+            f"-p {port} -k {root} -c listen_addresses=''",
+            "-w",
+            "start",
+        ],
+        check=True,
+        capture_output=True,
+    )
+    try:
+        yield {"host": str(root), "port": port, "user": "bench", "dbname": "postgres"}
+    finally:
+        subprocess.run(
+            ["pg_ctl", "-D", str(data_dir), "-m", "fast", "-w", "stop"], capture_output=True
+        )
+        shutil.rmtree(root, ignore_errors=True)
+
+
+@contextmanager
+def _server(dsn=None):
+    dsn = dsn or BENCH_DSN
+    if dsn:
+        yield {"dsn": dsn}
+    elif shutil.which("initdb") and shutil.which("pg_ctl"):
+        with _temporary_cluster() as kwargs:
+            yield kwargs
+    else:
+        # Never the warehouse server by default: the run creates and drops
+        # databases and loads it with synthetic data.
+        raise RuntimeError(
+            "No server for the benchmark: pass --dsn or set BENCH_DSN, or install "
+            "initdb/pg_ctl for a temporary cluster."
+        )
+
+
+@contextmanager
+def throwaway_database(dsn=None):
+    # A database created for the run and dropped afterwards, so the
+    # benchmark never touches the warehouse data.
+    name = f"mspr_bench_{os.getpid()}_{int(time.time())}"
+    with _server(dsn) as server:
+        admin = psycopg2.connect(**server)
+        admin.autocommit = True
+        try:
+            with admin.cursor() as cur:
+                cur.execute(f'CREATE DATABASE "{name}"')
+            try:
+                yield dict(server, dbname=name)
+            finally:
+                with admin.cursor() as cur:
+                    cur.execute(f'DROP DATABASE IF EXISTS "{name}" WITH (FORCE)')
+        finally:
+            admin.close()
+
+
+def load_synthetic_data(conn, scale=None):
+    scale = scale or BENCH_SCALE
+    started = time.perf_counter()
+    indicator_codes = ["turnout_rate", "unemployment_rate", "poverty_rate"] + [
+        f"bench_indicator_{i:02d}" for i in range(scale["indicators"])
+    ]
+    with conn:
+        with conn.cursor() as cur:
+            cur.execute(SCHEMA_PATH.read_text(encoding="utf-8"))
+            cur.executemany(
+                """
+                INSERT INTO geo_department (dept_code, dept_name, region_name)
+                VALUES (%s, %s, %s)
+                """,
+                [
+                    (code, name, REGION_BY_DEPT_CODE.get(code))
+                    for code, name in sorted(DEPT_NAME_BY_CODE.items())
+                ],
+            )
+            cur.execute(SYNTHETIC_COMMUNES, (scale["communes_per_dept"],))
+            # Department rows use the pseudo commune code, as in the ETL.
+            cur.executemany(
+                """
+                INSERT INTO geo_commune (insee_code, commune_name, dept_code)
+                VALUES (%s, %s, %s)
+                """,
+                [
+                    (dept_insee_code(code), f"{name} (departement)", code)
+                    for code, name in sorted(DEPT_NAME_BY_CODE.items())
+                ],
+            )
+            cur.execute(SYNTHETIC_ELECTIONS, (scale["years"],))
+            cur.execute(SYNTHETIC_CANDIDATES, (scale["years"], scale["candidates"]))
+            cur.execute(SYNTHETIC_RESULTS)
+            cur.execute(SYNTHETIC_INDICATORS, (indicator_codes,))
+            cur.execute(SYNTHETIC_INDICATOR_VALUES, (scale["years"],))
+    conn.autocommit = True
+    with conn.cursor() as cur:
+        cur.execute("VACUUM ANALYZE")
+        cur.execute(
+            """
+            SELECT relname, reltuples::bigint
+            FROM pg_class
+            WHERE relkind = 'r' AND relnamespace = 'public'::regnamespace
+            """
+        )
+        table_rows = dict(cur.fetchall())
+    conn.autocommit = False
+    print(
+        f"[bench] synthetic data election_result={table_rows.get('election_result', 0)} "
+        f"indicator_value={table_rows.get('indicator_value', 0)} "
+        f"seconds={time.perf_counter() - started:.1f}"
+    )
+    return table_rows
+
+
+def canonical_queries(cur):
+    # The recurring read shapes, built by the same code that issues them.
+    cur.execute(
+        "SELECT array_agg(insee_code::text) FROM geo_commune WHERE dept_code = %s", ("59",)
+    )
+    nord_codes = cur.fetchone()[0] or []
+    return [
+        {"name": "winners_year_dept", "query": warehouse._winners_query(2022, "75")},
+        {
+            "name": "winners_all",
+            "query": warehouse._winners_query(),
+            "full_scan": ("election_result",),
+        },
+        {"name": "results_year_dept", "query": warehouse._results_query(2022, "69")},
+        {"name": "turnout_series_dept", "query": warehouse._turnout_series_query("33")},
+        {
+            "name": "indicator_series_dept",
+            "query": warehouse._indicator_series_query("poverty_rate", "13"),
+        },
+        {
+            "name": "feature_results",
+            "query": (tensor.RESULTS_QUERY, None),
+            "full_scan": ("election_result",),
+        },
+        {
+            "name": "feature_indicators",
+            "query": (tensor.INDICATORS_QUERY, None),
+            "full_scan": ("indicator_value",),
+        },
+        {
+            "name": "stats_latest_indicators",
+            "query": (stats.INDICATORS_QUERY, (nord_codes, 2022)),
+        },
+    ]
+
+
+def _plan_nodes(node):
+    yield node
+    for child in node.get("Plans", ()):
+        yield from _plan_nodes(child)
+
+
+def time_query(cur, sql, params, repeat=None):
+    repeat = repeat or BENCH_REPEAT
+    cur.execute(sql, params)
+    rows = len(cur.fetchall())
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        cur.execute(sql, params)
+        cur.fetchall()
+        timings.append((time.perf_counter() - started) * 1000)
+    return rows, timings
+
+
+def explain_query(cur, sql, params):
+    cur.execute(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {sql}", params)
+    plan = cur.fetchone()[0]
+    return plan[0] if isinstance(plan, list) else json.loads(plan)[0]
+
+
+def run_workload(conn, table_rows, repeat=None):
+    large = {name for name, rows in table_rows.items() if rows >= BENCH_LARGE_TABLE_ROWS}
+    report = {}
+    with conn.cursor() as cur:
+        for spec in canonical_queries(cur):
+            sql, params = spec["query"]
+            rows, timings = time_query(cur, sql, params, repeat)
+            plan = explain_query(cur, sql, params)
+            root = plan["Plan"]
+            seq_scans = sorted(
+                {
+                    node["Relation Name"]
+                    for node in _plan_nodes(root)
+                    if node.get("Node Type") == "Seq Scan" and node.get("Relation Name") in large
+                }
+                - set(spec.get("full_scan", ()))
+            )
+            report[spec["name"]] = {
+                "rows": rows,
+                "median_ms": round(statistics.median(timings), 3),
+                "min_ms": round(min(timings), 3),
+                "execution_ms": plan.get("Execution Time"),
+                "shared_hit_blocks": root.get("Shared Hit Blocks"),
+                "shared_read_blocks": root.get("Shared Read Blocks"),
+                "seq_scans": seq_scans,
+                "plan": plan,
+            }
+            print(
+                f"[bench] query={spec['name']} rows={rows} "
+                f"median_ms={report[spec['name']]['median_ms']} seq_scans={seq_scans or '-'}"
+            )
+    conn.rollback()
+    return report
+
+
+def check_report(report, baseline=None, scale=None):
+    failures = []
+    for name, entry in report.items():
+        if entry["seq_scans"]:
+            failures.append(f"{name}: sequential scan on {', '.join(entry['seq_scans'])}")
+    if not baseline:
+        return failures
+    if baseline.get("scale") != (scale or BENCH_SCALE):
+        print("[warn] baseline was taken at another scale; timings are not compared.")
+        return failures
+    for name, entry in report.items():
+        reference = baseline["queries"].get(name)
+        if reference is None:
+            continue
+        limit = reference["median_ms"] * (1 + BENCH_REGRESSION_THRESHOLD)
+        delta = entry["median_ms"] - reference["median_ms"]
+        if entry["median_ms"] > limit and delta >= BENCH_MIN_DELTA_MS:
+            failures.append(
+                f"{name}: {entry['median_ms']:.1f} ms vs baseline {reference['median_ms']:.1f} ms "
+                f"(+{delta / reference['median_ms']:.0%})"
+            )
+    return failures
+
+
+def write_report(report, failures, output_dir=None):
+    output_dir = Path(output_dir or BENCH_OUTPUT_DIR)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S")
+    path = output_dir / f"sql_workload_{stamp}.json"
+    payload = {"created_at": stamp, "scale": BENCH_SCALE, "queries": report, "failures": failures}
+    path.write_text(json.dumps(payload, indent=2), encoding="utf-8")
+    return path
+
+
+def save_baseline(report, path=None):
+    path = Path(path or BENCH_BASELINE_PATH)
+    queries = {
+        name: {"median_ms": entry["median_ms"], "rows": entry["rows"]}
+        for name, entry in report.items()
+    }
+    path.write_text(
+        json.dumps({"scale": BENCH_SCALE, "queries": queries}, indent=2), encoding="utf-8"
+    )
+    return path
+
+
+def run_benchmark(dsn=None, repeat=None, baseline_path=None, update_baseline=False):
+    baseline_path = Path(baseline_path or BENCH_BASELINE_PATH)
+    baseline = None
+    if baseline_path.exists() and not update_baseline:
+        baseline = json.loads(baseline_path.read_text(encoding="utf-8"))
+
+    with throwaway_database(dsn) as kwargs:
+        conn = psycopg2.connect(**kwargs)
+        try:
+            table_rows = load_synthetic_data(conn)
+            report = run_workload(conn, table_rows, repeat)
+        finally:
+            conn.close()
+
+    failures = check_report(report, baseline)
+    path = write_report(report, failures)
+    print(f"[bench] report: {path}")
+    if update_baseline:
+        print(f"[bench] baseline written: {save_baseline(report, baseline_path)}")
+    for failure in failures:
+        print(f"[fail] {failure}")
+    return report, failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Banc d'essai des requetes SQL recurrentes.")
+    parser.add_argument("--dsn", default=None, help="serveur Postgres jetable (sinon BENCH_DSN)")
+    parser.add_argument("--repeat", type=int, default=None)
+    parser.add_argument("--baseline", default=None)
+    parser.add_argument("--update-baseline", action="store_true")
+    args = parser.parse_args(argv)
+    _, failures = run_benchmark(args.dsn, args.repeat, args.baseline, args.update_baseline)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,62 +1,82 @@
 from __future__ import annotations
 
+import math
+import os
 from pathlib import Path
 
 import matplotlib.pyplot as plt
+import numpy as np
 import pandas as pd
+from matplotlib.collections import LineCollection
+from matplotlib.ticker import MaxNLocator
 
 try:
-    from src.etl import run_etl
+    from src.api import warehouse
+    from src.etl.geo import REGION_BY_DEPT_CODE
 except ModuleNotFoundError:
     import sys
 
     sys.path.append(str(Path(__file__).resolve().parents[2]))
-    from src.etl import run_etl
+    from src.api import warehouse
+    from src.etl.geo import REGION_BY_DEPT_CODE
 
 OUTPUT_DIR = Path("data/processed/dashboard")
 OUTPUT_FILE = OUTPUT_DIR / "idf_dashboard_matplotlib.png"
 
+# overview: the 2x2 board; faceted: small multiples per region, paginated;
+# auto: faceted once there are more departments than the board can show.
+DASHBOARD_MODE = os.getenv("DASHBOARD_MODE", "auto").lower()
+FACET_THRESHOLD = int(os.getenv("DASHBOARD_FACET_THRESHOLD", "12"))
+FACET_COLUMNS = int(os.getenv("DASHBOARD_FACET_COLUMNS", "4"))
+FACET_ROWS = int(os.getenv("DASHBOARD_FACET_ROWS", "3"))
+FACET_DPI = int(os.getenv("DASHBOARD_FACET_DPI", "110"))
+FACET_LABEL_LIMIT = 15
+
 INDICATOR_LABELS = {
     "unemployment_rate": "Chomage (%)",
     "poverty_rate": "Pauvrete (%)",
 }
 
+FACET_METRICS = {
+    "turnout_pct": "Participation au 1er tour presidentiel (%)",
+    "winner_share_pct": "Score du candidat arrive 1er (%)",
+    "unemployment_rate": INDICATOR_LABELS["unemployment_rate"],
+    "poverty_rate": INDICATOR_LABELS["poverty_rate"],
+}
+
 
 def _prepare_election_data():
-    df = run_etl.collect_election_results_dataframe()
-    if df.empty:
+    turnout = warehouse.turnout_series(fmt="pandas")
+    winner = warehouse.winners(level="departement", fmt="pandas")
+    if turnout.empty or winner.empty:
         raise RuntimeError("Aucune donnee election disponible pour generer le dashboard.")
 
     turnout = (
-        df[["year", "dept_code", "dept_name", "turnout_rate"]]
+        turnout[["year", "dept_code", "dept_name", "turnout_rate"]]
         .dropna(subset=["turnout_rate"])
         .drop_duplicates(subset=["year", "dept_code"])
         .copy()
     )
     turnout["turnout_pct"] = turnout["turnout_rate"] * 100
 
-    winner = (
-        df.dropna(subset=["vote_share"])
-        .sort_values(["year", "dept_code", "vote_share"], ascending=[True, True, False])
-        .groupby(["year", "dept_code", "dept_name"], as_index=False)
-        .first()
-    )
+    winner = winner.dropna(subset=["vote_share"]).copy()
     winner["winner_share_pct"] = winner["vote_share"] * 100
 
     return turnout, winner
 
 
 def _prepare_socio_data():
-    df = run_etl.collect_socio_indicator_values_dataframe()
+    df = warehouse.indicator_series(fmt="pandas")
     if df.empty:
         raise RuntimeError("Aucune donnee socio-economique disponible pour generer le dashboard.")
     return df
 
 
 def _plot_turnout(ax, turnout_df, dept_order):
+    chunks = dict(tuple(turnout_df.sort_values("year").groupby("dept_code", sort=False)))
     for code in dept_order:
-        chunk = turnout_df[turnout_df["dept_code"] == code].sort_values("year")
-        if chunk.empty:
+        chunk = chunks.get(code)
+        if chunk is None:
             continue
         ax.plot(
             chunk["year"],
@@ -90,12 +110,12 @@ def _plot_winner_heatmap(ax, winner_df, dept_order):
 
 def _plot_socio_timeseries(ax, socio_df, indicator_code, dept_order):
     label = INDICATOR_LABELS.get(indicator_code, indicator_code)
-    indicator_df = socio_df[socio_df["indicator_code"] == indicator_code].copy()
-    indicator_df["dept_code"] = indicator_df["insee_code"].str[:2]
+    indicator_df = socio_df[socio_df["indicator_code"] == indicator_code]
+    chunks = dict(tuple(indicator_df.sort_values("year").groupby("dept_code", sort=False)))
 
     for code in dept_order:
-        chunk = indicator_df[indicator_df["dept_code"] == code].sort_values("year")
-        if chunk.empty:
+        chunk = chunks.get(code)
+        if chunk is None:
             continue
         ax.plot(chunk["year"], chunk["value"], marker="o", linewidth=1.8, label=code)
 
@@ -107,7 +127,6 @@ def _plot_socio_timeseries(ax, socio_df, indicator_code, dept_order):
 
 def _plot_latest_poverty(ax, socio_df, dept_order):
     poverty = socio_df[socio_df["indicator_code"] == "poverty_rate"].copy()
-    poverty["dept_code"] = poverty["insee_code"].str[:2]
     if poverty.empty:
         ax.set_title("Pauvrete (%) - donnees indisponibles")
         ax.axis("off")
@@ -124,10 +143,7 @@ def _plot_latest_poverty(ax, socio_df, dept_order):
     ax.grid(axis="y", alpha=0.25, linestyle="--")
 
 
-def build_dashboard(output_path: Path = OUTPUT_FILE):
-    turnout_df, winner_df = _prepare_election_data()
-    socio_df = _prepare_socio_data()
-
+def build_overview_dashboard(turnout_df, winner_df, socio_df, output_path: Path = OUTPUT_FILE):
     dept_order = sorted(turnout_df["dept_code"].unique().tolist())
 
     fig, axes = plt.subplots(2, 2, figsize=(18, 11), constrained_layout=True)
@@ -150,10 +166,125 @@ def build_dashboard(output_path: Path = OUTPUT_FILE):
     return output_path
 
 
+def _facet_frame(turnout_df, winner_df, socio_df):
+    # Every metric in one long (metric, region, dept, year, value) frame, so
+    # the panels come out of a single sort + groupby.
+    parts = [
+        turnout_df[["dept_code", "year", "turnout_pct"]]
+        .rename(columns={"turnout_pct": "value"})
+        .assign(metric="turnout_pct"),
+        winner_df[["dept_code", "year", "winner_share_pct"]]
+        .rename(columns={"winner_share_pct": "value"})
+        .assign(metric="winner_share_pct"),
+        socio_df.loc[
+            socio_df["indicator_code"].isin(list(FACET_METRICS)),
+            ["dept_code", "year", "value", "indicator_code"],
+        ].rename(columns={"indicator_code": "metric"}),
+    ]
+    long = pd.concat(parts, ignore_index=True).dropna(subset=["value"])
+    long["dept_code"] = long["dept_code"].astype(str)
+    long["region"] = long["dept_code"].map(REGION_BY_DEPT_CODE).fillna("Autre")
+    long["metric"] = pd.Categorical(long["metric"], categories=list(FACET_METRICS))
+    return long.sort_values(["metric", "region", "dept_code", "year"], kind="stable")
+
+
+def _facet_panels(long):
+    panels = {}
+    for (metric, region), chunk in long.groupby(["metric", "region"], sort=False, observed=True):
+        codes = chunk["dept_code"].to_numpy()
+        points = np.column_stack(
+            [chunk["year"].to_numpy(dtype="float64"), chunk["value"].to_numpy(dtype="float64")]
+        )
+        starts = np.flatnonzero(codes[1:] != codes[:-1]) + 1
+        segments = np.split(points, starts)
+        labels = codes[np.r_[0, starts]]
+        panels.setdefault(metric, []).append((region, segments, labels, points))
+    return panels
+
+
+def _draw_facet(ax, region, segments, labels, points):
+    # One LineCollection and one scatter per panel, whatever the number of
+    # departments in the region.
+    colors = plt.cm.tab20(np.arange(len(segments)) % 20)
+    ax.add_collection(LineCollection(segments, colors=colors, linewidths=1.4))
+    ax.scatter(points[:, 0], points[:, 1], s=6, c="#333333", linewidths=0)
+    if len(segments) <= FACET_LABEL_LIMIT:
+        for segment, label, color in zip(segments, labels, colors):
+            ax.annotate(
+                label,
+                segment[-1],
+                xytext=(3, 0),
+                textcoords="offset points",
+                fontsize=7,
+                color=color,
+                va="center",
+            )
+    ax.autoscale_view()
+    ax.set_title(f"{region} ({len(segments)})", fontsize=9)
+    ax.grid(alpha=0.25, linestyle="--")
+    ax.tick_params(labelsize=7)
+    ax.xaxis.set_major_locator(MaxNLocator(4, integer=True))
+    ax.yaxis.set_major_locator(MaxNLocator(4))
+
+
+def build_faceted_dashboard(turnout_df, winner_df, socio_df, output_dir: Path = OUTPUT_DIR):
+    panels = _facet_panels(_facet_frame(turnout_df, winner_df, socio_df))
+    per_page = FACET_COLUMNS * FACET_ROWS
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    paths = []
+    for metric, metric_panels in panels.items():
+        pages = math.ceil(len(metric_panels) / per_page)
+        for page in range(pages):
+            page_panels = metric_panels[page * per_page : (page + 1) * per_page]
+            rows = math.ceil(len(page_panels) / FACET_COLUMNS)
+            # Figures are rendered and closed one page at a time, so memory
+            # stays at one page whatever the number of regions.
+            fig, axes = plt.subplots(
+                rows,
+                FACET_COLUMNS,
+                figsize=(4 * FACET_COLUMNS, 2.8 * rows + 0.6),
+                sharex=True,
+                sharey=True,
+                squeeze=False,
+            )
+            # Fixed margins: constrained layout would measure every tick
+            # label of every panel before drawing.
+            fig.subplots_adjust(
+                left=0.05, right=0.97, bottom=0.06, top=0.9, wspace=0.12, hspace=0.35
+            )
+            for ax, panel in zip(axes.flat, page_panels):
+                _draw_facet(ax, *panel)
+            for ax in axes.flat[len(page_panels) :]:
+                ax.axis("off")
+            fig.suptitle(f"{FACET_METRICS[metric]} - par region (page {page + 1}/{pages})")
+            path = output_dir / f"facets_{metric}_p{page + 1:02d}.png"
+            fig.savefig(path, dpi=FACET_DPI, pil_kwargs={"compress_level": 1})
+            plt.close(fig)
+            paths.append(path)
+    return paths
+
+
+def build_dashboard(output_path: Path = OUTPUT_FILE, mode=None):
+    turnout_df, winner_df = _prepare_election_data()
+    socio_df = _prepare_socio_data()
+
+    mode = mode or DASHBOARD_MODE
+    if mode == "auto":
+        many = turnout_df["dept_code"].nunique() > FACET_THRESHOLD
+        mode = "faceted" if many else "overview"
+    if mode == "faceted":
+        return build_faceted_dashboard(turnout_df, winner_df, socio_df, output_path.parent)
+    return build_overview_dashboard(turnout_df, winner_df, socio_df, output_path)
+
+
 def run_dashboard_pipeline():
-    output_path = build_dashboard()
-    print(f"[done] dashboard matplotlib genere: {output_path}")
-    return str(output_path)
+    output = build_dashboard()
+    if isinstance(output, list):
+        print(f"[done] dashboard matplotlib genere: {len(output)} pages dans {OUTPUT_DIR}")
+        return [str(path) for path in output]
+    print(f"[done] dashboard matplotlib genere: {output}")
+    return str(output)
 
 
 def main():
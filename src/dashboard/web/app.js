@@ -0,0 +1,229 @@
+// Static dashboard front end: the manifest is inlined in index.html, payloads
+// are content-hashed JSON shards fetched only when a region enters the view
+// or a department is opened.
+(function () {
+  "use strict";
+
+  var manifest = JSON.parse(document.getElementById("manifest").textContent);
+  var metricSelect = document.getElementById("metric");
+  var regionsRoot = document.getElementById("regions");
+  var detail = document.getElementById("detail");
+  var shardCache = new Map();
+  var metricsByCode = {};
+  var currentMetric = null;
+  var observer = null;
+
+  function load(file) {
+    if (!shardCache.has(file)) {
+      shardCache.set(
+        file,
+        fetch(file).then(function (response) {
+          if (!response.ok) throw new Error(file + ": " + response.status);
+          return response.json();
+        })
+      );
+    }
+    return shardCache.get(file);
+  }
+
+  // Largest-Triangle-Three-Buckets: keeps the visual shape of a long series
+  // with at most `threshold` points, about one per two pixels of chart width.
+  function lttb(points, threshold) {
+    if (threshold >= points.length || threshold < 3) return points;
+    var sampled = [points[0]];
+    var every = (points.length - 2) / (threshold - 2);
+    var a = 0;
+    for (var i = 0; i < threshold - 2; i++) {
+      var start = Math.floor((i + 1) * every) + 1;
+      var end = Math.min(Math.floor((i + 2) * every) + 1, points.length);
+      var avgX = 0, avgY = 0;
+      for (var j = start; j < end; j++) { avgX += points[j][0]; avgY += points[j][1]; }
+      avgX /= end - start || 1;
+      avgY /= end - start || 1;
+      var rangeStart = Math.floor(i * every) + 1;
+      var rangeEnd = Math.floor((i + 1) * every) + 1;
+      var best = rangeStart, bestArea = -1;
+      for (var k = rangeStart; k < rangeEnd; k++) {
+        var area = Math.abs(
+          (points[a][0] - avgX) * (points[k][1] - points[a][1]) -
+          (points[a][0] - points[k][0]) * (avgY - points[a][1])
+        );
+        if (area > bestArea) { bestArea = area; best = k; }
+      }
+      sampled.push(points[best]);
+      a = best;
+    }
+    sampled.push(points[points.length - 1]);
+    return sampled;
+  }
+
+  function toPoints(years, values) {
+    var points = [];
+    for (var i = 0; i < years.length; i++) {
+      if (values[i] !== null && values[i] !== undefined) points.push([years[i], values[i]]);
+    }
+    return points;
+  }
+
+  function sparkline(seriesList, width, height, colors) {
+    var all = [];
+    seriesList.forEach(function (points) { all = all.concat(points); });
+    if (!all.length) return "<svg viewBox=\"0 0 " + width + " " + height + "\"></svg>";
+    var xs = all.map(function (p) { return p[0]; });
+    var ys = all.map(function (p) { return p[1]; });
+    var x0 = Math.min.apply(null, xs), x1 = Math.max.apply(null, xs);
+    var y0 = Math.min.apply(null, ys), y1 = Math.max.apply(null, ys);
+    var sx = function (x) {
+      return x1 === x0 ? width / 2 : 2 + (x - x0) / (x1 - x0) * (width - 4);
+    };
+    var sy = function (y) {
+      return y1 === y0 ? height / 2 : height - 2 - (y - y0) / (y1 - y0) * (height - 4);
+    };
+    var paths = seriesList.map(function (points, index) {
+      var drawn = lttb(points, Math.max(3, Math.floor(width / 2)));
+      var d = drawn.map(function (p, i) {
+        return (i ? "L" : "M") + sx(p[0]).toFixed(1) + " " + sy(p[1]).toFixed(1);
+      }).join("");
+      var color = colors ? colors[index % colors.length] : "#3367d6";
+      var dot = "";
+      if (drawn.length === 1) {
+        dot = "<circle r=\"2\" cx=\"" + sx(drawn[0][0]) + "\" cy=\"" + sy(drawn[0][1]) +
+          "\" fill=\"" + color + "\"/>";
+      }
+      return "<path d=\"" + d + "\" fill=\"none\" stroke=\"" + color +
+        "\" stroke-width=\"1.5\"/>" + dot;
+    });
+    return "<svg viewBox=\"0 0 " + width + " " + height + "\" preserveAspectRatio=\"none\"" +
+      " height=\"" + height + "\">" + paths.join("") + "</svg>";
+  }
+
+  function escapeHtml(text) {
+    return String(text).replace(/[&<>"]/g, function (ch) {
+      return { "&": "&amp;", "<": "&lt;", ">": "&gt;", "\"": "&quot;" }[ch];
+    });
+  }
+
+  function formatValue(value, unit) {
+    if (value === null || value === undefined) return "-";
+    var digits = Math.abs(value) >= 1000 ? 0 : 1;
+    var text = value.toLocaleString("fr-FR", { maximumFractionDigits: digits });
+    return unit ? text + " " + unit : text;
+  }
+
+  function lastValue(years, values) {
+    for (var i = values.length - 1; i >= 0; i--) {
+      if (values[i] !== null) return [years[i], values[i]];
+    }
+    return null;
+  }
+
+  function renderRegion(section) {
+    var region = manifest.regions[Number(section.dataset.index)];
+    var metric = currentMetric;
+    var file = region.shards[metric];
+    var grid = section.querySelector(".grid");
+    if (!file) {
+      grid.innerHTML = "<p class=\"muted\">Pas de donnees pour cet indicateur.</p>";
+      return;
+    }
+    load(file).then(function (shard) {
+      if (metric !== currentMetric) return;
+      var unit = metricsByCode[metric].unit;
+      grid.innerHTML = region.depts.map(function (dept) {
+        var values = shard.depts[dept[0]] || [];
+        var last = lastValue(shard.years, values);
+        return "<div class=\"card\" data-dept=\"" + escapeHtml(dept[0]) + "\">" +
+          "<div class=\"name\">" + escapeHtml(dept[0] + " " + dept[1]) + "</div>" +
+          "<div class=\"value\">" + (last ? formatValue(last[1], unit) +
+            " <span class=\"muted\">" + last[0] + "</span>" : "-") + "</div>" +
+          sparkline([toPoints(shard.years, values)], 160, 36) + "</div>";
+      }).join("");
+    }).catch(function (error) {
+      grid.innerHTML = "<p class=\"muted\">" + escapeHtml(error.message) + "</p>";
+    });
+  }
+
+  function showMetric(metric) {
+    currentMetric = metric;
+    if (observer) observer.disconnect();
+    regionsRoot.innerHTML = manifest.regions.map(function (region, index) {
+      return "<section data-index=\"" + index + "\"><h2>" + escapeHtml(region.name) +
+        " <span class=\"muted\">" + region.depts.length + " dept.</span></h2>" +
+        "<div class=\"grid\"></div></section>";
+    }).join("");
+    var sections = regionsRoot.querySelectorAll("section");
+    if (!("IntersectionObserver" in window)) {
+      sections.forEach(renderRegion);
+      return;
+    }
+    observer = new IntersectionObserver(function (entries) {
+      entries.forEach(function (entry) {
+        if (!entry.isIntersecting) return;
+        observer.unobserve(entry.target);
+        renderRegion(entry.target);
+      });
+    }, { rootMargin: "200px 0px" });
+    sections.forEach(function (section) { observer.observe(section); });
+  }
+
+  var BLOC_COLORS = ["#b2182b", "#ef8a62", "#999999", "#67a9cf", "#2166ac", "#542788", "#1b7837"];
+
+  function showDepartment(code) {
+    var file = manifest.departments[code];
+    if (!file) return;
+    detail.hidden = false;
+    detail.innerHTML = "<p class=\"muted\">Chargement...</p>";
+    load(file).then(function (dept) {
+      var html = ["<button type=\"button\" id=\"close\">Fermer</button>",
+        "<h2>" + escapeHtml(dept.code + " " + dept.name) + "</h2>",
+        "<p class=\"muted\">" + escapeHtml(dept.region) + "</p>"];
+      manifest.metrics.forEach(function (metric) {
+        var series = dept.metrics[metric.code];
+        if (!series) return;
+        var last = lastValue(series.years, series.values);
+        html.push("<h3>" + escapeHtml(metric.label) + " <span class=\"muted\">" +
+          (last ? formatValue(last[1], metric.unit) + " (" + last[0] + ")" : "") + "</span></h3>");
+        html.push(sparkline([toPoints(series.years, series.values)], 380, 60));
+      });
+      if (dept.blocs && dept.blocs.years) {
+        var names = Object.keys(dept.blocs.series);
+        html.push("<h3>Blocs politiques (%)</h3>");
+        html.push(sparkline(names.map(function (name) {
+          return toPoints(dept.blocs.years, dept.blocs.series[name]);
+        }), 380, 90, BLOC_COLORS));
+        html.push("<p class=\"muted\">" + names.map(function (name, index) {
+          var color = BLOC_COLORS[index % BLOC_COLORS.length];
+          return "<span style=\"color:" + color + "\">&#9632;</span> " + escapeHtml(name);
+        }).join(" ") + "</p>");
+      }
+      Object.keys(dept.candidates).sort().reverse().forEach(function (year) {
+        html.push("<h3>Presidentielle " + year + ", 1er tour</h3><table>");
+        dept.candidates[year].forEach(function (row) {
+          html.push("<tr><td>" + escapeHtml(row[0]) + "</td><td>" +
+            formatValue(row[1], "%") + "</td></tr>");
+        });
+        html.push("</table>");
+      });
+      detail.innerHTML = html.join("");
+      document.getElementById("close").onclick = function () { detail.hidden = true; };
+    }).catch(function (error) {
+      detail.innerHTML = "<p class=\"muted\">" + escapeHtml(error.message) + "</p>";
+    });
+  }
+
+  manifest.metrics.forEach(function (metric) {
+    metricsByCode[metric.code] = metric;
+    var option = document.createElement("option");
+    option.value = metric.code;
+    option.textContent = metric.label;
+    metricSelect.appendChild(option);
+  });
+  document.getElementById("version").textContent =
+    "donnees du " + manifest.generated_at.slice(0, 10);
+  metricSelect.onchange = function () { showMetric(metricSelect.value); };
+  regionsRoot.onclick = function (event) {
+    var card = event.target.closest(".card");
+    if (card) showDepartment(card.dataset.dept);
+  };
+  if (manifest.metrics.length) showMetric(manifest.metrics[0].code);
+})();
@@ -0,0 +1,332 @@
+from __future__ import annotations
+
+import gzip
+import hashlib
+import json
+import math
+import os
+import re
+import unicodedata
+from datetime import datetime, timezone
+from pathlib import Path
+
+import pandas as pd
+
+try:
+    from src.api import warehouse
+    from src.etl.geo import REGION_BY_DEPT_CODE
+except ModuleNotFoundError:
+    import sys
+
+    sys.path.append(str(Path(__file__).resolve().parents[2]))
+    from src.api import warehouse
+    from src.etl.geo import REGION_BY_DEPT_CODE
+
+WEB_OUTPUT_DIR = Path(os.getenv("WEB_DASHBOARD_DIR", "data/processed/dashboard/web"))
+WEB_ASSETS_DIR = Path(__file__).resolve().parent / "web"
+# Writes a .gz next to every payload, for servers that serve precompressed
+# files (nginx gzip_static, most CDNs).
+WEB_GZIP = os.getenv("WEB_DASHBOARD_GZIP", "true").lower() in {"1", "true", "yes"}
+# Warning threshold for index.html + script + the shards of the first regions.
+WEB_INITIAL_BUDGET_KB = float(os.getenv("WEB_DASHBOARD_BUDGET_KB", "300"))
+WEB_TOP_CANDIDATES = int(os.getenv("WEB_DASHBOARD_TOP_CANDIDATES", "6"))
+INITIAL_REGIONS = 2
+HASH_LENGTH = 12
+
+METRICS = {
+    "turnout_pct": ("Participation au 1er tour presidentiel", "%"),
+    "winner_share_pct": ("Score du candidat arrive 1er", "%"),
+}
+INDICATOR_LABELS = {
+    "unemployment_rate": ("Chomage", "%"),
+    "poverty_rate": ("Pauvrete", "%"),
+    "median_standard_of_living": ("Niveau de vie median", "EUR"),
+    "no_diploma_rate_20_24": ("Sans diplome (20-24 ans)", "%"),
+    "social_housing_share": ("Logement social", "%"),
+}
+
+
+def _slug(text):
+    text = unicodedata.normalize("NFKD", str(text))
+    text = "".join(ch for ch in text if not unicodedata.combining(ch)).lower()
+    return re.sub(r"[^a-z0-9]+", "-", text).strip("-")
+
+
+def _round(value, digits=2):
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return None
+    return round(float(value), digits)
+
+
+def _series(frame, years, value_column):
+    # Values aligned on the shard's year axis; null where a year is missing.
+    by_year = dict(zip(frame["year"].astype(int), frame[value_column]))
+    return [_round(by_year.get(year)) for year in years]
+
+
+def _department_results(results_df):
+    # Department totals from the department-level rows: counts are summed
+    # once per geography, then shares recomputed from the sums.
+    results_df = results_df.astype({"dept_code": str, "candidate_name": str})
+    geo = results_df.drop_duplicates(["year", "insee_code"])
+    totals = geo.groupby(["dept_code", "year"], as_index=False)[
+        ["registered", "votes_cast", "votes_valid"]
+    ].sum(min_count=1)
+    votes = results_df.groupby(["dept_code", "year", "candidate_name"], as_index=False)[
+        "votes"
+    ].sum(min_count=1)
+    votes = votes.merge(totals[["dept_code", "year", "votes_valid"]], on=["dept_code", "year"])
+    votes["share_pct"] = votes["votes"] / votes["votes_valid"] * 100
+    votes = votes.sort_values(["dept_code", "year", "share_pct"], ascending=[True, True, False])
+    return totals, votes
+
+
+def build_metric_frame(results_df, turnout_df, indicator_df):
+    # Long (metric, dept_code, year, value) frame behind every grid shard.
+    totals, votes = _department_results(results_df)
+    parts = []
+    if not turnout_df.empty:
+        turnout = (
+            turnout_df.astype({"dept_code": str})
+            .groupby(["dept_code", "year"], as_index=False)["turnout_rate"]
+            .mean()
+        )
+        parts.append(
+            turnout.assign(metric="turnout_pct", value=turnout["turnout_rate"] * 100)[
+                ["metric", "dept_code", "year", "value"]
+            ]
+        )
+    if not votes.empty:
+        winners = votes.groupby(["dept_code", "year"], as_index=False)["share_pct"].max()
+        parts.append(
+            winners.rename(columns={"share_pct": "value"}).assign(metric="winner_share_pct")[
+                ["metric", "dept_code", "year", "value"]
+            ]
+        )
+    if not indicator_df.empty:
+        indicators = (
+            indicator_df.astype({"dept_code": str, "indicator_code": str})
+            .groupby(["indicator_code", "dept_code", "year"], as_index=False)["value"]
+            .mean()
+            .rename(columns={"indicator_code": "metric"})
+        )
+        parts.append(indicators[["metric", "dept_code", "year", "value"]])
+    if not parts:
+        return pd.DataFrame(columns=["metric", "dept_code", "year", "value"])
+    long = pd.concat(parts, ignore_index=True).dropna(subset=["value"])
+    long["year"] = long["year"].astype(int)
+    return long.sort_values(["metric", "dept_code", "year"], kind="stable")
+
+
+def _metric_catalog(metric_frame):
+    catalog = []
+    for code in metric_frame["metric"].drop_duplicates():
+        label, unit = METRICS.get(code) or INDICATOR_LABELS.get(code) or (code, "")
+        catalog.append({"code": code, "label": label, "unit": unit})
+    return catalog
+
+
+def build_metric_shards(metric_frame, regions):
+    # One payload per (metric, region): the grid loads a region's shard of the
+    # selected metric only when the region scrolls into view.
+    shards = {}
+    region_of = {code: region["name"] for region in regions for code, _ in region["depts"]}
+    metric_frame = metric_frame.assign(region=metric_frame["dept_code"].map(region_of))
+    for (metric, region), chunk in metric_frame.groupby(["metric", "region"], sort=False):
+        years = sorted(chunk["year"].unique().tolist())
+        shards[(metric, region)] = {
+            "metric": metric,
+            "region": region,
+            "years": years,
+            "depts": {
+                code: _series(dept_chunk, years, "value")
+                for code, dept_chunk in chunk.groupby("dept_code", sort=True)
+            },
+        }
+    return shards
+
+
+def build_department_shards(results_df, metric_frame, bloc_df, names):
+    # One detail payload per department, fetched when its card is opened.
+    _, votes = _department_results(results_df)
+    votes_by_dept = dict(tuple(votes.groupby("dept_code", sort=False)))
+    metrics_by_dept = dict(tuple(metric_frame.groupby("dept_code", sort=False)))
+    blocs_by_dept = {}
+    if not bloc_df.empty:
+        bloc_df = bloc_df.astype({"geo_code": str})
+        blocs_by_dept = dict(tuple(bloc_df.groupby("geo_code", sort=False)))
+
+    shards = {}
+    for code, name in names.items():
+        metrics = metrics_by_dept.get(code, metric_frame.iloc[0:0])
+        candidates = {}
+        for year, year_votes in votes_by_dept.get(code, votes.iloc[0:0]).groupby("year"):
+            top = year_votes.head(WEB_TOP_CANDIDATES)
+            candidates[str(int(year))] = [
+                [candidate, _round(share)]
+                for candidate, share in zip(top["candidate_name"], top["share_pct"])
+            ]
+        blocs = {}
+        dept_blocs = blocs_by_dept.get(code)
+        if dept_blocs is not None:
+            bloc_years = sorted(dept_blocs["year"].astype(int).unique().tolist())
+            blocs = {"years": bloc_years, "series": {}}
+            for bloc_name, chunk in dept_blocs.groupby("bloc_name", sort=False):
+                chunk = chunk.assign(share_pct=chunk["vote_share"] * 100)
+                blocs["series"][bloc_name] = _series(chunk, bloc_years, "share_pct")
+        shards[code] = {
+            "code": code,
+            "name": name,
+            "region": REGION_BY_DEPT_CODE.get(code, "Autre"),
+            "metrics": {
+                metric: {
+                    "years": chunk["year"].tolist(),
+                    "values": [_round(value) for value in chunk["value"]],
+                }
+                for metric, chunk in metrics.groupby("metric", sort=False)
+            },
+            "candidates": candidates,
+            "blocs": blocs,
+        }
+    return shards
+
+
+def _encode(payload):
+    return json.dumps(payload, separators=(",", ":"), sort_keys=True, ensure_ascii=False).encode(
+        "utf-8"
+    )
+
+
+def _write_hashed(output_dir, subdir, stem, suffix, content):
+    # The name carries the content hash: payloads can be cached forever and
+    # an unchanged shard keeps its name from one export to the next.
+    digest = hashlib.sha256(content).hexdigest()[:HASH_LENGTH]
+    relpath = f"{subdir}/{stem}-{digest}{suffix}"
+    path = output_dir / relpath
+    if not path.exists():
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.part")
+        tmp_path.write_bytes(content)
+        os.replace(tmp_path, path)
+        if WEB_GZIP:
+            path.with_name(f"{path.name}.gz").write_bytes(gzip.compress(content, mtime=0))
+    return relpath
+
+
+def _regions(names):
+    grouped = {}
+    for code in sorted(names):
+        grouped.setdefault(REGION_BY_DEPT_CODE.get(code, "Autre"), []).append([code, names[code]])
+    return [
+        {"name": region, "slug": _slug(region), "depts": depts}
+        for region, depts in sorted(grouped.items())
+    ]
+
+
+def _prune(output_dir, keep):
+    # Drops payloads referenced neither by this export nor the previous one,
+    # so viewers still on the previous page finish their session.
+    removed = 0
+    for subdir in ("assets", "data"):
+        for path in (output_dir / subdir).glob("*"):
+            relpath = f"{subdir}/{path.name.removesuffix('.gz')}"
+            if relpath not in keep:
+                path.unlink()
+                removed += 1
+    return removed
+
+
+def _referenced(manifest):
+    files = {manifest["app"]}
+    files.update(manifest["departments"].values())
+    for region in manifest["regions"]:
+        files.update(region["shards"].values())
+    return files
+
+
+def export_web_dashboard(output_dir: Path = WEB_OUTPUT_DIR):
+    output_dir = Path(output_dir)
+    results_df = warehouse.results(level="departement", fmt="pandas")
+    if results_df.empty:
+        raise RuntimeError("Aucune donnee election disponible pour exporter le dashboard web.")
+    turnout_df = warehouse.turnout_series(fmt="pandas")
+    indicator_df = warehouse.indicator_series(fmt="pandas")
+    bloc_df = warehouse.bloc_results(level="departement", fmt="pandas")
+
+    names = dict(
+        results_df[["dept_code", "dept_name"]]
+        .astype(str)
+        .drop_duplicates("dept_code")
+        .itertuples(index=False)
+    )
+    regions = _regions(names)
+    metric_frame = build_metric_frame(results_df, turnout_df, indicator_df)
+
+    previous_path = output_dir / "manifest.json"
+    previous = None
+    if previous_path.exists():
+        previous = json.loads(previous_path.read_text(encoding="utf-8"))
+
+    manifest = {
+        "generated_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "load_version": warehouse.current_load_version(force=True),
+        "metrics": _metric_catalog(metric_frame),
+        "regions": regions,
+        "departments": {},
+    }
+    for region in regions:
+        region["shards"] = {}
+    by_name = {region["name"]: region for region in regions}
+    for (metric, region), payload in build_metric_shards(metric_frame, regions).items():
+        by_name[region]["shards"][metric] = _write_hashed(
+            output_dir, "data", f"{metric}-{by_name[region]['slug']}", ".json", _encode(payload)
+        )
+    for code, payload in build_department_shards(results_df, metric_frame, bloc_df, names).items():
+        manifest["departments"][code] = _write_hashed(
+            output_dir, "data", f"dept-{_slug(code)}", ".json", _encode(payload)
+        )
+    app_source = (WEB_ASSETS_DIR / "app.js").read_bytes()
+    manifest["app"] = _write_hashed(output_dir, "assets", "app", ".js", app_source)
+
+    # index.html is the only unversioned file: it embeds the manifest, so the
+    # first paint needs no extra round trip.
+    inline = _encode(manifest).decode("utf-8").replace("</", "<\\/")
+    html = (WEB_ASSETS_DIR / "index.html").read_text(encoding="utf-8")
+    html = html.replace("__MANIFEST__", inline).replace("__APP_JS__", manifest["app"])
+    (output_dir / "index.html").write_text(html, encoding="utf-8")
+    previous_path.write_text(json.dumps(manifest, indent=1, ensure_ascii=False), encoding="utf-8")
+
+    keep = _referenced(manifest) | (_referenced(previous) if previous else set())
+    removed = _prune(output_dir, keep)
+
+    default_metric = manifest["metrics"][0]["code"] if manifest["metrics"] else None
+    initial = len(html.encode("utf-8")) + len(app_source)
+    for region in regions[:INITIAL_REGIONS]:
+        if default_metric in region["shards"]:
+            initial += (output_dir / region["shards"][default_metric]).stat().st_size
+    shard_count = len(manifest["departments"]) + sum(len(r["shards"]) for r in regions)
+    print(
+        f"[web] departments={len(names)} metrics={len(manifest['metrics'])} "
+        f"shards={shard_count} removed={removed} initial_kb={initial / 1024:.1f}"
+    )
+    if initial > WEB_INITIAL_BUDGET_KB * 1024:
+        print(
+            f"[warn] initial page load {initial / 1024:.0f} KB exceeds "
+            f"WEB_DASHBOARD_BUDGET_KB={WEB_INITIAL_BUDGET_KB:.0f}"
+        )
+    return output_dir / "index.html"
+
+
+def run_web_dashboard_pipeline():
+    output = export_web_dashboard()
+    print(f"[done] dashboard web exporte: {output}")
+    return str(output)
+
+
+def main():
+    run_web_dashboard_pipeline()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
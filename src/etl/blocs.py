@@ -0,0 +1,417 @@
+from __future__ import annotations
+
+import re
+
+from . import checkpoints
+from .db import ensure_schema, get_conn
+from .geo import REGION_BY_DEPT_CODE
+
+BLOCS = {
+    "extreme_gauche": ("Extreme gauche", 1),
+    "gauche": ("Gauche", 2),
+    "ecologiste": ("Ecologistes", 3),
+    "centre": ("Centre", 4),
+    "droite": ("Droite", 5),
+    "extreme_droite": ("Extreme droite", 6),
+    "divers": ("Divers / non classes", 7),
+}
+
+PARTIES = {
+    "LO": ("Lutte ouvriere", "extreme_gauche"),
+    "LCR": ("Ligue communiste revolutionnaire", "extreme_gauche"),
+    "NPA": ("Nouveau parti anticapitaliste", "extreme_gauche"),
+    "PT": ("Parti des travailleurs", "extreme_gauche"),
+    "PSU": ("Parti socialiste unifie", "extreme_gauche"),
+    "PCF": ("Parti communiste francais", "gauche"),
+    "FG": ("Front de gauche", "gauche"),
+    "LFI": ("La France insoumise", "gauche"),
+    "SFIO": ("Section francaise de l'Internationale ouvriere", "gauche"),
+    "PS": ("Parti socialiste", "gauche"),
+    "MRG": ("Mouvement des radicaux de gauche", "gauche"),
+    "PRG": ("Parti radical de gauche", "gauche"),
+    "MDC": ("Mouvement des citoyens", "gauche"),
+    "DVG": ("Divers gauche", "gauche"),
+    "ECO": ("Ecologistes", "ecologiste"),
+    "VEC": ("Les Verts", "ecologiste"),
+    "EELV": ("Europe Ecologie Les Verts", "ecologiste"),
+    "CD": ("Centre democrate", "centre"),
+    "UDF": ("Union pour la democratie francaise", "centre"),
+    "MODEM": ("Mouvement democrate", "centre"),
+    "CAP21": ("Citoyennete action participation pour le 21e siecle", "centre"),
+    "REM": ("La Republique en marche", "centre"),
+    "UDR": ("Union des democrates pour la Republique", "droite"),
+    "RI": ("Republicains independants", "droite"),
+    "RPR": ("Rassemblement pour la Republique", "droite"),
+    "DL": ("Democratie liberale", "droite"),
+    "UMP": ("Union pour un mouvement populaire", "droite"),
+    "LR": ("Les Republicains", "droite"),
+    "MPF": ("Mouvement pour la France", "droite"),
+    "DLF": ("Debout la France", "droite"),
+    "DVD": ("Divers droite", "droite"),
+    "FN": ("Front national", "extreme_droite"),
+    "RN": ("Rassemblement national", "extreme_droite"),
+    "MNR": ("Mouvement national republicain", "extreme_droite"),
+    "REC": ("Reconquete", "extreme_droite"),
+    "CPNT": ("Chasse, peche, nature et traditions", "divers"),
+    "UPR": ("Union populaire republicaine", "divers"),
+    "RES": ("Resistons !", "divers"),
+    "SP": ("Solidarite et progres", "divers"),
+    "DIV": ("Divers", "divers"),
+    "EXG": ("Divers extreme gauche", "extreme_gauche"),
+    "NUP": ("Nouvelle union populaire ecologique et sociale", "gauche"),
+    "UDI": ("Union des democrates et independants", "centre"),
+    "ENS": ("Ensemble", "centre"),
+    "HOR": ("Horizons", "centre"),
+    "DVC": ("Divers centre", "centre"),
+    "EXD": ("Divers extreme droite", "extreme_droite"),
+    "REG": ("Regionalistes", "divers"),
+}
+
+# Legislative and European results are reported by nuance (a party code
+# from the Ministry of the Interior) rather than by candidate; nuances that
+# differ from the party codes above are aliased here.
+PARTY_BY_NUANCE = {"COM": "PCF", "FI": "LFI", "SOC": "PS", "RDG": "PRG", "MDM": "MODEM"}
+
+# First-round candidates of each presidential election, by canonical name
+# (as produced by run_etl._canonical_candidate_name).
+CANDIDATE_PARTY_BY_YEAR = {
+    1969: {
+        "POMPIDOU": "UDR",
+        "POHER": "CD",
+        "DUCLOS": "PCF",
+        "DEFFERRE": "SFIO",
+        "ROCARD": "PSU",
+        "DUCATEL": "DIV",
+        "KRIVINE": "LCR",
+    },
+    1974: {
+        "MITTERRAND": "PS",
+        "GISCARD D'ESTAING": "RI",
+        "CHABAN-DELMAS": "UDR",
+        "ROYER": "DVD",
+        "LAGUILLER": "LO",
+        "DUMONT": "ECO",
+        "LE PEN": "FN",
+        "MULLER": "DVG",
+        "KRIVINE": "LCR",
+        "RENOUVIN": "DIV",
+        "SEBAG": "DIV",
+        "HERAUD": "DIV",
+    },
+    1981: {
+        "GISCARD D'ESTAING": "UDF",
+        "MITTERRAND": "PS",
+        "CHIRAC": "RPR",
+        "MARCHAIS": "PCF",
+        "LALONDE": "ECO",
+        "LAGUILLER": "LO",
+        "CREPEAU": "MRG",
+        "DEBRE": "DVD",
+        "GARAUD": "DVD",
+        "BOUCHARDEAU": "PSU",
+    },
+    1988: {
+        "MITTERRAND": "PS",
+        "CHIRAC": "RPR",
+        "BARRE": "UDF",
+        "LE PEN": "FN",
+        "LAJOINIE": "PCF",
+        "WAECHTER": "VEC",
+        "JUQUIN": "DVG",
+        "LAGUILLER": "LO",
+        "BOUSSEL": "PT",
+    },
+    1995: {
+        "JOSPIN": "PS",
+        "CHIRAC": "RPR",
+        "BALLADUR": "RPR",
+        "LE PEN": "FN",
+        "HUE": "PCF",
+        "LAGUILLER": "LO",
+        "DE VILLIERS": "MPF",
+        "VOYNET": "VEC",
+        "CHEMINADE": "SP",
+    },
+    2002: {
+        "CHIRAC": "RPR",
+        "LE PEN": "FN",
+        "JOSPIN": "PS",
+        "BAYROU": "UDF",
+        "LAGUILLER": "LO",
+        "CHEVENEMENT": "MDC",
+        "MAMERE": "VEC",
+        "BESANCENOT": "LCR",
+        "SAINT-JOSSE": "CPNT",
+        "MADELIN": "DL",
+        "HUE": "PCF",
+        "MEGRET": "MNR",
+        "TAUBIRA": "PRG",
+        "LEPAGE": "CAP21",
+        "BOUTIN": "DVD",
+        "GLUCKSTEIN": "PT",
+    },
+    2007: {
+        "SARKOZY": "UMP",
+        "ROYAL": "PS",
+        "BAYROU": "UDF",
+        "LE PEN": "FN",
+        "BESANCENOT": "LCR",
+        "DE VILLIERS": "MPF",
+        "BUFFET": "PCF",
+        "VOYNET": "VEC",
+        "LAGUILLER": "LO",
+        "BOVE": "DVG",
+        "NIHOUS": "CPNT",
+        "SCHIVARDI": "PT",
+    },
+    2012: {
+        "HOLLANDE": "PS",
+        "SARKOZY": "UMP",
+        "LE PEN": "FN",
+        "MELENCHON": "FG",
+        "BAYROU": "MODEM",
+        "JOLY": "EELV",
+        "DUPONT-AIGNAN": "DLF",
+        "POUTOU": "NPA",
+        "ARTHAUD": "LO",
+        "CHEMINADE": "SP",
+    },
+    2017: {
+        "MACRON": "REM",
+        "LE PEN": "FN",
+        "FILLON": "LR",
+        "MELENCHON": "LFI",
+        "HAMON": "PS",
+        "DUPONT-AIGNAN": "DLF",
+        "LASSALLE": "RES",
+        "POUTOU": "NPA",
+        "ASSELINEAU": "UPR",
+        "ARTHAUD": "LO",
+        "CHEMINADE": "SP",
+    },
+    2022: {
+        "MACRON": "REM",
+        "LE PEN": "RN",
+        "MELENCHON": "LFI",
+        "ZEMMOUR": "REC",
+        "PECRESSE": "LR",
+        "JADOT": "EELV",
+        "LASSALLE": "RES",
+        "ROUSSEL": "PCF",
+        "DUPONT-AIGNAN": "DLF",
+        "HIDALGO": "PS",
+        "POUTOU": "NPA",
+        "ARTHAUD": "LO",
+    },
+}
+
+UNCLASSIFIED_BLOC = "divers"
+BLOC_LEVELS = ("commune", "departement", "region")
+
+# Department-level facts use the pseudo commune code rpad(dept_code, 5, '0')
+# (see geo.dept_insee_code); every other code is a real commune.
+ROLLUP_QUERIES = {
+    "commune": """
+        INSERT INTO bloc_result
+          (election_id, level, geo_code, bloc_code, votes, votes_valid, vote_share,
+           candidate_count)
+        SELECT er.election_id, 'commune', er.insee_code, ecp.bloc_code,
+               SUM(er.votes), MAX(er.votes_valid), SUM(er.vote_share), COUNT(*)
+        FROM election_result er
+        JOIN geo_commune gc ON gc.insee_code = er.insee_code
+        JOIN election_candidate_party ecp
+          ON ecp.election_id = er.election_id AND ecp.candidate_id = er.candidate_id
+        WHERE er.election_id = ANY(%s)
+          AND er.insee_code <> rpad(gc.dept_code, 5, '0')
+        GROUP BY er.election_id, er.insee_code, ecp.bloc_code
+    """,
+    # Department rows come from the department-level facts; a department
+    # loaded only at commune level is rolled up from its communes.
+    "departement": """
+        INSERT INTO bloc_result
+          (election_id, level, geo_code, bloc_code, votes, votes_valid, vote_share,
+           candidate_count)
+        SELECT er.election_id, 'departement', gc.dept_code, ecp.bloc_code,
+               SUM(er.votes), MAX(er.votes_valid), SUM(er.vote_share), COUNT(*)
+        FROM election_result er
+        JOIN geo_commune gc ON gc.insee_code = er.insee_code
+        JOIN election_candidate_party ecp
+          ON ecp.election_id = er.election_id AND ecp.candidate_id = er.candidate_id
+        WHERE er.election_id = ANY(%s)
+          AND er.insee_code = rpad(gc.dept_code, 5, '0')
+        GROUP BY er.election_id, gc.dept_code, ecp.bloc_code
+        UNION ALL
+        SELECT br.election_id, 'departement', gc.dept_code, br.bloc_code,
+               SUM(br.votes), SUM(br.votes_valid),
+               SUM(br.votes)::float8 / NULLIF(SUM(br.votes_valid), 0),
+               MAX(br.candidate_count)
+        FROM bloc_result br
+        JOIN geo_commune gc ON gc.insee_code = br.geo_code
+        WHERE br.election_id = ANY(%s) AND br.level = 'commune'
+          AND NOT EXISTS (
+            SELECT 1 FROM election_result d
+            WHERE d.election_id = br.election_id
+              AND d.insee_code = rpad(gc.dept_code, 5, '0')
+          )
+        GROUP BY br.election_id, gc.dept_code, br.bloc_code
+    """,
+    "region": """
+        INSERT INTO bloc_result
+          (election_id, level, geo_code, bloc_code, votes, votes_valid, vote_share,
+           candidate_count)
+        SELECT br.election_id, 'region', gd.region_name, br.bloc_code,
+               SUM(br.votes), SUM(br.votes_valid),
+               COALESCE(
+                 SUM(br.vote_share * br.votes_valid) / NULLIF(SUM(br.votes_valid), 0),
+                 AVG(br.vote_share)
+               ),
+               MAX(br.candidate_count)
+        FROM bloc_result br
+        JOIN geo_department gd ON gd.dept_code = br.geo_code
+        WHERE br.election_id = ANY(%s) AND br.level = 'departement'
+          AND gd.region_name IS NOT NULL
+        GROUP BY br.election_id, gd.region_name, br.bloc_code
+    """,
+}
+
+
+def _name_key(name):
+    return re.sub(r"[^A-Z]", "", str(name).upper())
+
+
+def party_for_candidate(year, candidate_name, election_type="presidentielle"):
+    key = _name_key(candidate_name)
+    if election_type != "presidentielle":
+        code = PARTY_BY_NUANCE.get(key, key)
+        return code if code in PARTIES else None
+
+    mapping = CANDIDATE_PARTY_BY_YEAR.get(int(year), {})
+    by_key = {_name_key(name): party for name, party in mapping.items()}
+    if key in by_key:
+        return by_key[key]
+    # Source columns sometimes carry the first name too ("EMMANUEL MACRON").
+    matches = {party for name_key, party in by_key.items() if name_key and name_key in key}
+    return matches.pop() if len(matches) == 1 else None
+
+
+def seed_bloc_tables(cur):
+    cur.executemany(
+        """
+        INSERT INTO political_bloc (bloc_code, bloc_name, position)
+        VALUES (%s, %s, %s)
+        ON CONFLICT (bloc_code) DO UPDATE
+        SET bloc_name = EXCLUDED.bloc_name, position = EXCLUDED.position
+        """,
+        [(code, name, position) for code, (name, position) in BLOCS.items()],
+    )
+    cur.executemany(
+        """
+        INSERT INTO political_party (party_code, party_name, bloc_code)
+        VALUES (%s, %s, %s)
+        ON CONFLICT (party_code) DO UPDATE
+        SET party_name = EXCLUDED.party_name, bloc_code = EXCLUDED.bloc_code
+        """,
+        [(code, name, bloc) for code, (name, bloc) in PARTIES.items()],
+    )
+    cur.executemany(
+        "UPDATE geo_department SET region_name = %s WHERE dept_code = %s",
+        [(region, code) for code, region in REGION_BY_DEPT_CODE.items()],
+    )
+
+
+def sync_candidate_parties(cur, election_ids):
+    cur.execute(
+        """
+        SELECT DISTINCT er.election_id, EXTRACT(YEAR FROM e.election_date)::int,
+               e.election_type, c.candidate_id, c.candidate_name
+        FROM election_result er
+        JOIN election e ON e.election_id = er.election_id
+        JOIN candidate c ON c.candidate_id = er.candidate_id
+        WHERE er.election_id = ANY(%s)
+        """,
+        (list(election_ids),),
+    )
+    rows = []
+    unclassified = []
+    for election_id, year, election_type, candidate_id, candidate_name in cur.fetchall():
+        party_code = party_for_candidate(year, candidate_name, election_type)
+        bloc_code = PARTIES[party_code][1] if party_code else UNCLASSIFIED_BLOC
+        if party_code is None:
+            unclassified.append(f"{year}:{candidate_name}")
+        rows.append((election_id, candidate_id, party_code, bloc_code))
+
+    cur.execute(
+        "DELETE FROM election_candidate_party WHERE election_id = ANY(%s)", (list(election_ids),)
+    )
+    cur.executemany(
+        """
+        INSERT INTO election_candidate_party (election_id, candidate_id, party_code, bloc_code)
+        VALUES (%s, %s, %s, %s)
+        """,
+        rows,
+    )
+    # candidate.party_code / party_name follow the candidate's latest election.
+    cur.execute(
+        """
+        UPDATE candidate c
+        SET party_code = latest.party_code, party_name = pp.party_name
+        FROM (
+          SELECT DISTINCT ON (ecp.candidate_id) ecp.candidate_id, ecp.party_code
+          FROM election_candidate_party ecp
+          JOIN election e ON e.election_id = ecp.election_id
+          WHERE ecp.party_code IS NOT NULL
+          ORDER BY ecp.candidate_id, e.election_date DESC
+        ) latest
+        JOIN political_party pp ON pp.party_code = latest.party_code
+        WHERE c.candidate_id = latest.candidate_id
+        """
+    )
+    if unclassified:
+        print(f"[warn] candidates without party mapping: {', '.join(sorted(unclassified))}")
+    return len(rows)
+
+
+def refresh_bloc_rollups(cur, election_ids=None):
+    seed_bloc_tables(cur)
+    if election_ids is None:
+        cur.execute("SELECT DISTINCT election_id FROM election_result")
+        election_ids = [row[0] for row in cur.fetchall()]
+    election_ids = sorted(set(int(e) for e in election_ids))
+    if not election_ids:
+        return 0
+
+    sync_candidate_parties(cur, election_ids)
+    cur.execute("DELETE FROM bloc_result WHERE election_id = ANY(%s)", (election_ids,))
+    total = 0
+    # Order matters: departments may roll up from communes, regions from
+    # departments.
+    for level in BLOC_LEVELS:
+        query = ROLLUP_QUERIES[level]
+        cur.execute(query, (election_ids,) * query.count("%s"))
+        total += max(cur.rowcount, 0)
+    print(f"[blocs] rollup rows={total} elections={len(election_ids)}")
+    return total
+
+
+def run_bloc_pipeline():
+    ensure_schema()
+    conn = get_conn()
+    try:
+        with conn:
+            with conn.cursor() as cur:
+                rows = refresh_bloc_rollups(cur)
+                # Stamps the bloc partitions for model retraining.
+                checkpoints.record_loaded(
+                    cur, "blocs", "rollup", checkpoints.fingerprint(rows), rows
+                )
+    finally:
+        conn.close()
+
+
+def main():
+    run_bloc_pipeline()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,330 @@
+from __future__ import annotations
+
+import argparse
+import fcntl
+import hashlib
+import json
+import os
+import shutil
+import time
+import urllib.request
+from contextlib import contextmanager
+from pathlib import Path
+
+CACHE_DIR = Path(os.getenv("RAW_CACHE_DIR", "data/raw/data_gouv_cache"))
+# 0 keeps every blob; otherwise least recently used blobs are evicted past it.
+CACHE_MAX_BYTES = int(float(os.getenv("RAW_CACHE_MAX_MB", "0")) * 1024 * 1024)
+# Offline: never download, serve only from the cache or the mirror.
+CACHE_OFFLINE = os.getenv("RAW_CACHE_OFFLINE", "false").lower() in {"1", "true", "yes"}
+# A directory or http(s) base URL laid out like CACHE_DIR (manifest.json + blobs/).
+CACHE_MIRROR = os.getenv("RAW_CACHE_MIRROR", "")
+# Blobs are hashed on every read; true skips it while their size and mtime
+# are those recorded when they were last hashed.
+CACHE_TRUST_STAT = os.getenv("RAW_CACHE_TRUST_STAT", "false").lower() in {"1", "true", "yes"}
+CHUNK_SIZE = 1024 * 1024
+
+MANIFEST_NAME = "manifest.json"
+BLOBS_DIR = "blobs"
+
+_MIRROR_MANIFESTS = {}
+
+
+def _sha256_file(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as handle:
+        for chunk in iter(lambda: handle.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _blob_relpath(sha256, filename):
+    return f"{BLOBS_DIR}/{sha256[:2]}/{sha256}{Path(filename).suffix}"
+
+
+def _empty_manifest():
+    return {"urls": {}, "blobs": {}}
+
+
+def _read_manifest(root):
+    path = Path(root) / MANIFEST_NAME
+    if not path.exists():
+        return _empty_manifest()
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def _write_manifest(root, manifest):
+    path = Path(root) / MANIFEST_NAME
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.part")
+    tmp_path.write_text(json.dumps(manifest, indent=1, sort_keys=True), encoding="utf-8")
+    os.replace(tmp_path, path)
+
+
+@contextmanager
+def _manifest():
+    # Source adapters download from several processes at once: every
+    # read-modify-write of the manifest holds an exclusive file lock.
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    with open(CACHE_DIR / ".lock", "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        manifest = _read_manifest(CACHE_DIR)
+        yield manifest
+        _write_manifest(CACHE_DIR, manifest)
+
+
+def _stat_stamp(path):
+    stat = path.stat()
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _pin(blob):
+    # Blobs handed out to a process that is still running are never evicted
+    # under it; pins of finished processes are dropped on the way.
+    pins = [pid for pid in blob.get("pins", []) if _pid_alive(pid)]
+    if os.getpid() not in pins:
+        pins.append(os.getpid())
+    blob["pins"] = pins
+
+
+def _pinned(blob):
+    return any(_pid_alive(pid) for pid in blob.get("pins", []))
+
+
+def _lookup(url):
+    # Returns (path, blob entry) for the URL's blob, pinned to this process;
+    # the entry is None when the blob can be used without hashing it.
+    with _manifest() as manifest:
+        sha256 = manifest["urls"].get(url, {}).get("sha256")
+        blob = manifest["blobs"].get(sha256)
+        if blob is None:
+            return None, None
+        path = CACHE_DIR / blob["path"]
+        if not path.exists():
+            return None, None
+        blob["last_used"] = time.time()
+        _pin(blob)
+        if CACHE_TRUST_STAT and _stat_stamp(path) == blob["verified"]:
+            return path, None
+        return path, dict(blob, sha256=sha256)
+
+
+def _mirror_manifest(mirror):
+    if mirror not in _MIRROR_MANIFESTS:
+        try:
+            if mirror.startswith(("http://", "https://")):
+                with urllib.request.urlopen(f"{mirror.rstrip('/')}/{MANIFEST_NAME}") as response:
+                    _MIRROR_MANIFESTS[mirror] = json.loads(response.read().decode("utf-8"))
+            else:
+                _MIRROR_MANIFESTS[mirror] = _read_manifest(mirror)
+        except OSError as exc:
+            print(f"[warn] cache mirror {mirror} unavailable: {exc}")
+            _MIRROR_MANIFESTS[mirror] = _empty_manifest()
+    return _MIRROR_MANIFESTS[mirror]
+
+
+def _fetch_to(source, tmp_path):
+    if isinstance(source, Path):
+        shutil.copyfile(source, tmp_path)
+    else:
+        urllib.request.urlretrieve(source, tmp_path)
+
+
+def _fetch_sources(url, filename):
+    sources = []
+    if CACHE_MIRROR:
+        manifest = _mirror_manifest(CACHE_MIRROR)
+        sha256 = manifest["urls"].get(url, {}).get("sha256")
+        blob = manifest["blobs"].get(sha256)
+        if blob is not None:
+            if CACHE_MIRROR.startswith(("http://", "https://")):
+                sources.append((f"{CACHE_MIRROR.rstrip('/')}/{blob['path']}", sha256))
+            else:
+                sources.append((Path(CACHE_MIRROR) / blob["path"], sha256))
+    # Files downloaded before the cache was content addressed.
+    legacy_path = CACHE_DIR / f"{hashlib.sha1(url.encode('utf-8')).hexdigest()[:12]}_{filename}"
+    if legacy_path.exists():
+        sources.append((legacy_path, None))
+    if not CACHE_OFFLINE:
+        sources.append((url, None))
+    return sources
+
+
+def _evict(manifest, keep):
+    if CACHE_MAX_BYTES <= 0:
+        return
+    total = sum(blob["size"] for blob in manifest["blobs"].values())
+    for sha256, blob in sorted(manifest["blobs"].items(), key=lambda item: item[1]["last_used"]):
+        if total <= CACHE_MAX_BYTES:
+            break
+        if sha256 == keep or _pinned(blob):
+            continue
+        (CACHE_DIR / blob["path"]).unlink(missing_ok=True)
+        del manifest["blobs"][sha256]
+        total -= blob["size"]
+        print(f"[cache] evicted {blob['path']} ({blob['size']} bytes)")
+    manifest["urls"] = {
+        url: entry
+        for url, entry in manifest["urls"].items()
+        if entry["sha256"] in manifest["blobs"]
+    }
+
+
+def _store(url, filename, tmp_path, sha256):
+    with _manifest() as manifest:
+        blob = manifest["blobs"].get(sha256)
+        relpath = blob["path"] if blob else _blob_relpath(sha256, filename)
+        path = CACHE_DIR / relpath
+        if path.exists():
+            # Same content already stored under another URL.
+            tmp_path.unlink()
+        else:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(tmp_path, path)
+        manifest["blobs"][sha256] = {
+            "path": relpath,
+            "size": path.stat().st_size,
+            "verified": _stat_stamp(path),
+            "last_used": time.time(),
+            "pins": (blob or {}).get("pins", []),
+        }
+        _pin(manifest["blobs"][sha256])
+        manifest["urls"][url] = {"sha256": sha256, "filename": filename}
+        _evict(manifest, keep=sha256)
+    return path
+
+
+def cached_download(url, filename=None, sha256=None):
+    filename = filename or url.rstrip("/").split("/")[-1]
+    path, unverified = _lookup(url)
+    if path is not None and unverified is None:
+        return path
+    if path is not None:
+        actual = _sha256_file(path)
+        if actual == unverified["sha256"]:
+            with _manifest() as manifest:
+                manifest["blobs"][actual].update(verified=_stat_stamp(path), last_used=time.time())
+            return path
+        print(f"[warn] cache blob {path} is corrupted, fetching it again")
+        path.unlink(missing_ok=True)
+
+    tmp_dir = CACHE_DIR / "tmp"
+    tmp_dir.mkdir(parents=True, exist_ok=True)
+    errors = []
+    for source, expected in _fetch_sources(url, filename):
+        expected = expected or sha256
+        # Download next to the store and rename, so concurrent workers never
+        # read a half-written file.
+        tmp_path = tmp_dir / f"{hashlib.sha1(url.encode('utf-8')).hexdigest()}.{os.getpid()}.part"
+        try:
+            _fetch_to(source, tmp_path)
+        except OSError as exc:
+            errors.append(f"{source}: {exc}")
+            tmp_path.unlink(missing_ok=True)
+            continue
+        actual = _sha256_file(tmp_path)
+        if expected and actual != expected:
+            errors.append(f"{source}: sha256 {actual} != {expected}")
+            tmp_path.unlink()
+            continue
+        stored = _store(url, filename, tmp_path, actual)
+        if isinstance(source, Path) and source.parent == CACHE_DIR:
+            source.unlink()
+        return stored
+
+    mode = "offline" if CACHE_OFFLINE else "online"
+    details = "; ".join(errors) or "not in the cache or the mirror"
+    raise RuntimeError(f"Cannot fetch {url} ({mode}): {details}")
+
+
+def forget_url(url):
+    # The next cached_download of the URL fetches it again; the blob itself
+    # stays until evicted, and is reused if the content is unchanged.
+    with _manifest() as manifest:
+        return manifest["urls"].pop(url, None) is not None
+
+
+def verify_cache():
+    # Re-hashes every blob and drops the ones whose content no longer matches.
+    with _manifest() as manifest:
+        blobs = dict(manifest["blobs"])
+    corrupted = []
+    for sha256, blob in blobs.items():
+        path = CACHE_DIR / blob["path"]
+        if not path.exists() or _sha256_file(path) != sha256:
+            path.unlink(missing_ok=True)
+            corrupted.append(sha256)
+    with _manifest() as manifest:
+        for sha256 in corrupted:
+            manifest["blobs"].pop(sha256, None)
+        for sha256, blob in manifest["blobs"].items():
+            if sha256 in blobs:
+                blob["verified"] = _stat_stamp(CACHE_DIR / blob["path"])
+        manifest["urls"] = {
+            url: entry
+            for url, entry in manifest["urls"].items()
+            if entry["sha256"] in manifest["blobs"]
+        }
+    print(f"[cache] verified blobs={len(blobs)} corrupted={len(corrupted)}")
+    return corrupted
+
+
+def export_mirror(output_dir):
+    # Copies the store into a directory usable as RAW_CACHE_MIRROR, e.g. on a
+    # build agent without network access.
+    output_dir = Path(output_dir)
+    with _manifest() as manifest:
+        exported = json.loads(json.dumps(manifest))
+    for blob in exported["blobs"].values():
+        blob.pop("pins", None)
+        target = output_dir / blob["path"]
+        if not target.exists():
+            target.parent.mkdir(parents=True, exist_ok=True)
+            shutil.copyfile(CACHE_DIR / blob["path"], target)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    _write_manifest(output_dir, exported)
+    print(f"[cache] exported urls={len(exported['urls'])} blobs={len(exported['blobs'])}")
+    return output_dir
+
+
+def cache_status():
+    with _manifest() as manifest:
+        size = sum(blob["size"] for blob in manifest["blobs"].values())
+        return {
+            "urls": len(manifest["urls"]),
+            "blobs": len(manifest["blobs"]),
+            "bytes": size,
+            "max_bytes": CACHE_MAX_BYTES,
+            "offline": CACHE_OFFLINE,
+            "mirror": CACHE_MIRROR,
+        }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Cache des fichiers bruts telecharges.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("status", help="taille et nombre d'entrees du cache")
+    commands.add_parser("verify", help="recalcule le SHA-256 de chaque blob")
+    export_parser = commands.add_parser("export", help="copie le cache vers un miroir")
+    export_parser.add_argument("output_dir")
+
+    args = parser.parse_args(argv)
+    if args.command == "status":
+        print(json.dumps(cache_status(), indent=2))
+    elif args.command == "verify":
+        verify_cache()
+    else:
+        export_mirror(args.output_dir)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,223 @@
+from __future__ import annotations
+
+import csv
+import os
+import re
+import unicodedata
+from pathlib import Path
+
+from .db import ensure_schema, get_conn
+
+CANDIDATE_OVERRIDES_PATH = Path(
+    os.getenv("CANDIDATE_OVERRIDES", Path(__file__).with_name("candidate_overrides.csv"))
+)
+# Share of trigrams two spellings must have in common to be the same person.
+CANDIDATE_MATCH_THRESHOLD = float(os.getenv("CANDIDATE_MATCH_THRESHOLD", "0.6"))
+NGRAM_SIZE = 3
+
+def name_key(name):
+    text = unicodedata.normalize("NFKD", str(name or ""))
+    text = "".join(ch for ch in text if not unicodedata.combining(ch)).upper()
+    return " ".join(re.findall(r"[A-Z]+", text))
+
+
+def _compact(key):
+    return key.replace(" ", "")
+
+
+def _ngrams(compact):
+    padded = f"^{compact}$"
+    return {padded[i : i + NGRAM_SIZE] for i in range(len(padded) - NGRAM_SIZE + 1)}
+
+
+def read_overrides(path=None):
+    path = Path(path or CANDIDATE_OVERRIDES_PATH)
+    overrides = {}
+    if not path.exists():
+        return overrides
+    with path.open(encoding="utf-8") as handle:
+        for row in csv.DictReader(line for line in handle if not line.startswith("#")):
+            year = int(row["year"]) if (row.get("year") or "").strip() else None
+            overrides[(year, _compact(name_key(row["name"])))] = (
+                row["person_key"].strip(),
+                (row.get("display_name") or "").strip() or None,
+            )
+    return overrides
+
+
+def new_index(overrides=None):
+    return {
+        "overrides": read_overrides() if overrides is None else overrides,
+        "persons": {},
+        "exact": {},
+        "blocks": {},
+        "grams": {},
+        "tokens": {},
+        "resolved": {},
+    }
+
+
+def add_person(index, person_key, candidate_id=None, *names):
+    index["persons"][person_key] = candidate_id
+    for name in (person_key, *names):
+        key = name_key(name)
+        compact = _compact(key)
+        if not compact:
+            continue
+        index["exact"].setdefault(compact, person_key)
+        index["tokens"].setdefault(person_key, []).append(frozenset(key.split()))
+        grams = _ngrams(compact)
+        index["grams"].setdefault(person_key, set()).update(grams)
+        for gram in grams:
+            index["blocks"].setdefault(gram, set()).add(person_key)
+
+
+def _match(index, key):
+    compact = _compact(key)
+    tokens = set(key.split())
+    grams = _ngrams(compact)
+    # Blocking: only persons sharing at least one trigram are scored.
+    shared = {}
+    for gram in grams:
+        for person_key in index["blocks"].get(gram, ()):
+            shared[person_key] = shared.get(person_key, 0) + 1
+
+    scored = []
+    for person_key, common in shared.items():
+        known = index["grams"][person_key]
+        score = common / len(grams | known)
+        # "EMMANUEL MACRON" against "MACRON": every word of a known spelling
+        # appears in the incoming one.
+        if any(known_tokens <= tokens for known_tokens in index["tokens"][person_key]):
+            score = max(score, CANDIDATE_MATCH_THRESHOLD)
+        if score >= CANDIDATE_MATCH_THRESHOLD:
+            scored.append((score, person_key))
+    if not scored:
+        return None
+    scored.sort(reverse=True)
+    if len(scored) > 1 and scored[0][0] == scored[1][0]:
+        # Two persons fit equally well: a new person, to be settled with an
+        # override entry.
+        print(f"[warn] ambiguous candidate name {key}: {scored[0][1]} / {scored[1][1]}")
+        return None
+    return scored[0][1]
+
+
+def resolve_person(index, name, year=None):
+    key = name_key(name)
+    compact = _compact(key)
+    cached = index["resolved"].get((year, compact))
+    if cached is not None:
+        return cached
+
+    override = index["overrides"].get((year, compact)) or index["overrides"].get((None, compact))
+    if override:
+        person_key, display_name = override
+        if person_key not in index["persons"]:
+            add_person(index, person_key, None)
+        resolved = (person_key, display_name or person_key)
+    else:
+        person_key = index["exact"].get(compact) or _match(index, key)
+        if person_key is None:
+            person_key = key
+            add_person(index, person_key, None)
+        resolved = (person_key, str(name))
+    index["resolved"][(year, compact)] = resolved
+    return resolved
+
+
+def load_index(cur, overrides=None):
+    index = new_index(overrides)
+    cur.execute(
+        """
+        SELECT candidate_id, candidate_name, person_key
+        FROM candidate
+        ORDER BY person_key IS NULL, candidate_id
+        """
+    )
+    for candidate_id, candidate_name, person_key in cur.fetchall():
+        # Rows loaded before the index existed have no person key yet; their
+        # normalised name stands in for it.
+        key = person_key or name_key(candidate_name)
+        if key not in index["persons"]:
+            add_person(index, key, candidate_id, candidate_name)
+    cur.execute("SELECT alias_key, year, candidate_id FROM candidate_alias")
+    aliases = {(year, alias_key): candidate_id for alias_key, year, candidate_id in cur.fetchall()}
+    return index, aliases
+
+
+def resolve_candidates(cur, names_by_year):
+    index, aliases = load_index(cur)
+
+    candidate_ids = {}
+    new_aliases = []
+    for year, name in sorted(names_by_year):
+        compact = _compact(name_key(name))
+        # Names seen in an earlier load resolve with one dict lookup.
+        candidate_id = aliases.get((int(year), compact))
+        if candidate_id is None:
+            person_key, display_name = resolve_person(index, name, int(year))
+            candidate_id = index["persons"].get(person_key)
+            if candidate_id is None:
+                cur.execute(
+                    """
+                    INSERT INTO candidate (candidate_name, person_key)
+                    VALUES (%s, %s)
+                    ON CONFLICT (person_key) WHERE person_key IS NOT NULL
+                    DO UPDATE SET person_key = EXCLUDED.person_key
+                    RETURNING candidate_id
+                    """,
+                    (display_name, person_key),
+                )
+                candidate_id = cur.fetchone()[0]
+                index["persons"][person_key] = candidate_id
+            aliases[(int(year), compact)] = candidate_id
+            new_aliases.append((compact, int(year), candidate_id, person_key))
+        candidate_ids[(int(year), name)] = candidate_id
+
+    if new_aliases:
+        cur.executemany(
+            """
+            INSERT INTO candidate_alias (alias_key, year, candidate_id)
+            VALUES (%s, %s, %s)
+            ON CONFLICT (alias_key, year) DO UPDATE SET candidate_id = EXCLUDED.candidate_id
+            """,
+            [(compact, year, candidate_id) for compact, year, candidate_id, _ in new_aliases],
+        )
+        # Legacy rows matched by name get their person key on first use.
+        cur.executemany(
+            """
+            UPDATE candidate SET person_key = %s
+            WHERE candidate_id = %s AND person_key IS NULL
+              AND NOT EXISTS (SELECT 1 FROM candidate WHERE person_key = %s)
+            """,
+            [
+                (person_key, candidate_id, person_key)
+                for _, _, candidate_id, person_key in new_aliases
+            ],
+        )
+        print(f"[candidates] new aliases={len(new_aliases)} persons={len(index['persons'])}")
+    return candidate_ids
+
+
+def rebuild_aliases():
+    # Drops every stored alias so the next load re-resolves names, e.g. after
+    # editing the override file.
+    ensure_schema()
+    conn = get_conn()
+    try:
+        with conn:
+            with conn.cursor() as cur:
+                cur.execute("DELETE FROM candidate_alias")
+    finally:
+        conn.close()
+
+
+def main():
+    rebuild_aliases()
+    print("[done] candidate aliases cleared; they are rebuilt on the next election load.")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,269 @@
+from __future__ import annotations
+
+import argparse
+import fcntl
+import fnmatch
+import hashlib
+import json
+import os
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+
+import pandas as pd
+
+from .frames import coerce_frame
+
+CHECKPOINT_DIR = Path(os.getenv("ETL_CHECKPOINT_DIR", "data/processed/checkpoints"))
+CHECKPOINTS_ENABLED = os.getenv("ETL_CHECKPOINTS", "true").lower() in {"1", "true", "yes"}
+LEDGER_NAME = "ledger.json"
+
+def fingerprint(*parts):
+    payload = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def frame_fingerprint(frame, *parts):
+    digest = hashlib.sha256()
+    digest.update(pd.util.hash_pandas_object(frame, index=False).to_numpy().tobytes())
+    digest.update(fingerprint(list(frame.columns), *parts).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _now():
+    return datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+
+@contextmanager
+def _ledger():
+    # Source adapters record their units from worker processes: every
+    # read-modify-write of the ledger holds an exclusive file lock.
+    CHECKPOINT_DIR.mkdir(parents=True, exist_ok=True)
+    path = CHECKPOINT_DIR / LEDGER_NAME
+    with open(CHECKPOINT_DIR / ".lock", "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        ledger = json.loads(path.read_text(encoding="utf-8")) if path.exists() else {}
+        yield ledger
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.part")
+        tmp_path.write_text(json.dumps(ledger, indent=1, sort_keys=True), encoding="utf-8")
+        os.replace(tmp_path, path)
+
+
+def completed(pipeline, unit, unit_fingerprint):
+    if not CHECKPOINTS_ENABLED:
+        return None
+    with _ledger() as ledger:
+        entry = ledger.get(pipeline, {}).get(unit)
+    if entry is None or entry["fingerprint"] != unit_fingerprint:
+        return None
+    if entry.get("output") and not Path(entry["output"]).exists():
+        return None
+    return entry
+
+
+def record(pipeline, unit, unit_fingerprint, rows=None, output=None, **details):
+    if not CHECKPOINTS_ENABLED:
+        return
+    output = str(output) if output else None
+    with _ledger() as ledger:
+        previous = ledger.setdefault(pipeline, {}).get(unit) or {}
+        stale = previous.get("output")
+        if stale and stale != output and previous.get("owned"):
+            Path(stale).unlink(missing_ok=True)
+        ledger[pipeline][unit] = {
+            "fingerprint": unit_fingerprint,
+            "completed_at": _now(),
+            "rows": rows,
+            "output": output,
+            **details,
+        }
+
+
+def frame_unit(pipeline, unit, unit_fingerprint, build, dtypes):
+    # Runs build() unless the same unit already completed with the same
+    # input fingerprint; its frame is kept as Parquet for the next attempt.
+    entry = completed(pipeline, unit, unit_fingerprint)
+    if entry is not None:
+        print(f"[checkpoint] pipeline={pipeline} unit={unit} status=resumed rows={entry['rows']}")
+        return coerce_frame(pd.read_parquet(entry["output"]), dtypes)
+
+    started = time.perf_counter()
+    frame = build()
+    if CHECKPOINTS_ENABLED:
+        safe_unit = unit.replace(":", "_").replace("/", "_")
+        output = CHECKPOINT_DIR / pipeline / f"{safe_unit}-{unit_fingerprint[:12]}.parquet"
+        output.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = output.with_name(f"{output.name}.{os.getpid()}.part")
+        frame.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, output)
+        record(
+            pipeline,
+            unit,
+            unit_fingerprint,
+            rows=int(len(frame)),
+            output=output,
+            owned=True,
+            seconds=round(time.perf_counter() - started, 3),
+        )
+    return frame
+
+
+# Load units live in the warehouse (etl_checkpoint, sql/schema.sql), written
+# by the loading transaction itself: a unit is complete exactly when its rows
+# are committed, and a reset database forgets them along with the data.
+def loaded(cur, pipeline, unit, unit_fingerprint):
+    # Call after taking the unit's lock, in the transaction that would load it.
+    if not CHECKPOINTS_ENABLED:
+        return False
+    cur.execute(
+        "SELECT fingerprint FROM etl_checkpoint WHERE pipeline = %s AND unit = %s",
+        (pipeline, unit),
+    )
+    row = cur.fetchone()
+    return row is not None and row[0] == unit_fingerprint
+
+
+def record_loaded(cur, pipeline, unit, unit_fingerprint, rows=None):
+    if not CHECKPOINTS_ENABLED:
+        return
+    cur.execute(
+        """
+        INSERT INTO etl_checkpoint (pipeline, unit, fingerprint, rows)
+        VALUES (%s, %s, %s, %s)
+        ON CONFLICT (pipeline, unit) DO UPDATE
+        SET fingerprint = EXCLUDED.fingerprint, rows = EXCLUDED.rows, completed_at = now()
+        """,
+        (pipeline, unit, unit_fingerprint, rows),
+    )
+
+
+def _database_units(pipeline=None, delete_patterns=None):
+    # Lists the load units recorded in the warehouse; with delete_patterns,
+    # deletes the matching ones and returns those instead.
+    from .db import ensure_schema, get_conn
+
+    try:
+        ensure_schema()
+        conn = get_conn()
+    except Exception as exc:
+        print(f"[warn] load checkpoints unavailable: {exc}")
+        return []
+    try:
+        with conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    """
+                    SELECT pipeline, unit, fingerprint, rows, completed_at::text
+                    FROM etl_checkpoint
+                    WHERE %s::text IS NULL OR pipeline = %s
+                    ORDER BY pipeline, unit
+                    """,
+                    (pipeline, pipeline),
+                )
+                rows = cur.fetchall()
+                if delete_patterns is None:
+                    return rows
+                rows = [row for row in rows if _matches(row[1], delete_patterns)]
+                cur.executemany(
+                    "DELETE FROM etl_checkpoint WHERE pipeline = %s AND unit = %s",
+                    [(name, unit) for name, unit, *_ in rows],
+                )
+                return rows
+    finally:
+        conn.close()
+
+
+def checkpoint_status(pipeline=None, include_database=True):
+    units = []
+    with _ledger() as ledger:
+        for name, entries in sorted(ledger.items()):
+            if pipeline and name != pipeline:
+                continue
+            for unit, entry in sorted(entries.items()):
+                units.append(
+                    {
+                        "pipeline": name,
+                        "unit": unit,
+                        "store": "files",
+                        "fingerprint": entry["fingerprint"][:12],
+                        "rows": entry.get("rows"),
+                        "completed_at": entry["completed_at"],
+                    }
+                )
+    rows = _database_units(pipeline) if include_database else []
+    for name, unit, unit_fingerprint, row_count, completed_at in rows:
+        units.append(
+            {
+                "pipeline": name,
+                "unit": unit,
+                "store": "database",
+                "fingerprint": unit_fingerprint[:12],
+                "rows": row_count,
+                "completed_at": completed_at,
+            }
+        )
+    return units
+
+
+def _matches(unit, patterns):
+    return not patterns or any(fnmatch.fnmatch(unit, pattern) for pattern in patterns)
+
+
+def clear_checkpoints(pipeline=None, patterns=None, include_database=True):
+    # Forgets the matching units and drops what they produced, so the next run
+    # redoes them: Parquet outputs, parsed source files and cached downloads.
+    from .cache import forget_url
+
+    cleared = []
+    with _ledger() as ledger:
+        for name in list(ledger):
+            if pipeline and name != pipeline:
+                continue
+            for unit in [u for u in ledger[name] if _matches(u, patterns)]:
+                entry = ledger[name].pop(unit)
+                if entry.get("output"):
+                    Path(entry["output"]).unlink(missing_ok=True)
+                if entry.get("url"):
+                    forget_url(entry["url"])
+                cleared.append((name, unit))
+            if not ledger[name]:
+                del ledger[name]
+
+    if include_database:
+        for name, unit, *_ in _database_units(pipeline, delete_patterns=patterns or []):
+            cleared.append((name, unit))
+    print(f"[checkpoint] cleared units={len(cleared)}")
+    return cleared
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Points de reprise des runs ETL.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    status_parser = commands.add_parser("status", help="unites terminees et leur empreinte")
+    clear_parser = commands.add_parser("clear", help="oublie des unites pour les refaire")
+    for command_parser in (status_parser, clear_parser):
+        command_parser.add_argument("--pipeline", default=None)
+        command_parser.add_argument(
+            "--files-only", action="store_true", help="sans lire les unites de chargement en base"
+        )
+    clear_parser.add_argument(
+        "units", nargs="*", help="motifs glob sur les unites (p. ex. 'load:*2017*')"
+    )
+
+    args = parser.parse_args(argv)
+    include_database = not args.files_only
+    if args.command == "status":
+        for unit in checkpoint_status(args.pipeline, include_database):
+            print(
+                f"pipeline={unit['pipeline']} unit={unit['unit']} store={unit['store']} "
+                f"rows={unit['rows']} fingerprint={unit['fingerprint']} "
+                f"completed_at={unit['completed_at']}"
+            )
+    else:
+        clear_checkpoints(args.pipeline, args.units, include_database)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
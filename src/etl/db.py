@@ -1,5 +1,23 @@
+import io
 import os
+import threading
+from pathlib import Path
+
 import psycopg2
+import psycopg2.pool
+
+from . import embedded
+
+# postgres: the Docker warehouse; embedded: an in-process columnar store
+# (src/etl/embedded.py) that needs no service.
+DB_BACKEND = os.getenv("DB_BACKEND", "postgres").lower()
+SCHEMA_PATH = Path(__file__).resolve().parents[2] / "sql" / "schema.sql"
+SCHEMA_LOCK_NAMESPACE = 7299
+
+_POOL = None
+_POOL_LOCK = threading.Lock()
+_SCHEMA = {"applied": False}
+_SCHEMA_LOCK = threading.Lock()
 
 def _get_env(name, default=None, required=False):
     value = os.getenv(name, default)
@@ -7,11 +25,101 @@ def _get_env(name, default=None, required=False):
         raise RuntimeError(f"Missing env var: {name}")
     return value
 
+def _conn_kwargs():
+    return {
+        "host": _get_env("DB_HOST", "localhost"),
+        "port": _get_env("DB_PORT", "5432"),
+        "dbname": _get_env("DB_NAME", "mspr_electio"),
+        "user": _get_env("DB_USER", "mspr"),
+        "password": _get_env("DB_PASSWORD", required=True),
+    }
+
 def get_conn():
-    return psycopg2.connect(
-        host=_get_env("DB_HOST", "localhost"),
-        port=_get_env("DB_PORT", "5432"),
-        dbname=_get_env("DB_NAME", "mspr_electio"),
-        user=_get_env("DB_USER", "mspr"),
-        password=_get_env("DB_PASSWORD", required=True),
+    if DB_BACKEND == "embedded":
+        return embedded.connect()
+    return psycopg2.connect(**_conn_kwargs())
+
+def pool_max_size():
+    return int(_get_env("DB_POOL_MAX", "8"))
+
+def get_pool():
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is None and DB_BACKEND == "embedded":
+            _POOL = embedded.EmbeddedPool()
+        elif _POOL is None:
+            _POOL = psycopg2.pool.ThreadedConnectionPool(
+                int(_get_env("DB_POOL_MIN", "1")),
+                pool_max_size(),
+                **_conn_kwargs(),
+            )
+        return _POOL
+
+def close_pool():
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is not None:
+            _POOL.closeall()
+            _POOL = None
+
+def ensure_schema():
+    # sql/schema.sql is the only definition of the warehouse tables. Writers
+    # call this before opening their own transaction: it applies the file
+    # once per process, in a transaction of its own, serialised across
+    # processes, so parallel loads never run DDL.
+    with _SCHEMA_LOCK:
+        if _SCHEMA["applied"]:
+            return
+        if DB_BACKEND == "embedded":
+            embedded.apply_schema()
+        else:
+            conn = psycopg2.connect(**_conn_kwargs())
+            try:
+                with conn:
+                    with conn.cursor() as cur:
+                        advisory_xact_lock(cur, SCHEMA_LOCK_NAMESPACE, 0)
+                        cur.execute(SCHEMA_PATH.read_text(encoding="utf-8"))
+            finally:
+                conn.close()
+        _SCHEMA["applied"] = True
+
+def bump_load_version(cur, source):
+    # Runs inside the loading transaction, so readers see the new stamp
+    # exactly when the new rows become visible. The table comes from
+    # ensure_schema, run before the transaction.
+    cur.execute(
+        """
+        UPDATE etl_load_version
+        SET version = version + 1, source = %s, updated_at = now()
+        RETURNING version
+        """,
+        (source,),
     )
+    return cur.fetchone()[0]
+
+def fetch_load_version(cur):
+    cur.execute("SELECT to_regclass('etl_load_version')")
+    if cur.fetchone()[0] is None:
+        return 0
+    cur.execute("SELECT version FROM etl_load_version")
+    row = cur.fetchone()
+    return row[0] if row else 0
+
+def copy_frame(cur, table, columns, frame):
+    if hasattr(cur, "insert_frame"):
+        return cur.insert_frame(table, columns, frame)
+    # Bulk load through COPY ... FROM STDIN; empty CSV fields are NULL.
+    buffer = io.StringIO()
+    frame[columns].to_csv(buffer, header=False, index=False, na_rep="")
+    buffer.seek(0)
+    cur.copy_expert(
+        f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)",
+        buffer,
+    )
+    return len(frame)
+
+def advisory_xact_lock(cur, namespace, key):
+    # Held until the surrounding transaction ends.
+    if hasattr(cur, "advisory_lock"):
+        return cur.advisory_lock(namespace, key)
+    cur.execute("SELECT pg_advisory_xact_lock(%s, %s)", (namespace, key))
@@ -0,0 +1,466 @@
+from __future__ import annotations
+
+import argparse
+import atexit
+import json
+import os
+import re
+import threading
+from functools import lru_cache
+from pathlib import Path
+
+EMBEDDED_PATH = Path(os.getenv("EMBEDDED_DB_PATH", "data/warehouse/mspr.duckdb"))
+# Every table is mirrored there as <table>.parquet; an empty store is rebuilt
+# from it, so the directory is the portable form of the warehouse.
+EMBEDDED_PARQUET_DIR = Path(os.getenv("EMBEDDED_PARQUET_DIR", "data/warehouse/parquet"))
+EMBEDDED_PARQUET_SNAPSHOTS = os.getenv("EMBEDDED_PARQUET_SNAPSHOTS", "true").lower() in {
+    "1",
+    "true",
+    "yes",
+}
+# 0 lets the engine use every core.
+EMBEDDED_THREADS = int(os.getenv("EMBEDDED_THREADS", "0"))
+SCHEMA_PATH = Path(__file__).resolve().parents[2] / "sql" / "schema.sql"
+
+_DATABASE = {"conn": None}
+_DATABASE_LOCK = threading.Lock()
+# One transaction at a time in the process: the engine aborts concurrent
+# writers on conflict (e.g. two election loads bumping etl_load_version),
+# where Postgres would make the second one wait.
+_TRANSACTION_LOCK = threading.RLock()
+_DIRTY_TABLES = set()
+
+_REWRITES = [
+    # Postgres-only spellings, rewritten once per distinct statement.
+    (
+        re.compile(r"to_regclass\('(\w+)'\)"),
+        r"(SELECT table_name FROM information_schema.tables WHERE table_name = '\1' LIMIT 1)",
+    ),
+    (
+        re.compile(
+            r"unnest\((%s::\w+\[\]),\s*(%s::\w+\[\])\)\s+AS\s+(\w+)\s*\((\w+),\s*(\w+)\)",
+            re.IGNORECASE,
+        ),
+        r"(SELECT unnest(\1) AS \4, unnest(\2) AS \5) AS \3",
+    ),
+    (
+        re.compile(r"CREATE TEMP TABLE (\w+)\s*\(LIKE (\w+) INCLUDING DEFAULTS\)", re.IGNORECASE),
+        r"CREATE TEMP TABLE \1 AS SELECT * FROM \2 LIMIT 0",
+    ),
+    (re.compile(r"\)\s*ON COMMIT DROP", re.IGNORECASE), ")"),
+    (re.compile(r"LIMIT 0\s*ON COMMIT DROP", re.IGNORECASE), "LIMIT 0"),
+    # No partial indexes: NULL keys never collide in a unique index anyway.
+    (re.compile(r"(ON \w+ \([\w, ]+\))\s*WHERE \w+ IS NOT NULL", re.IGNORECASE), r"\1"),
+    (re.compile(r"(ON CONFLICT \([\w, ]+\))\s*WHERE \w+ IS NOT NULL", re.IGNORECASE), r"\1"),
+    # The engine refuses to update a row another table references, which
+    # every upsert on a dimension does: keys are not declared there.
+    (re.compile(r"\s+REFERENCES \w+ \(\w+\)", re.IGNORECASE), ""),
+    # Time zone aware values would need pytz on the way out.
+    (re.compile(r"\btimestamptz\b", re.IGNORECASE), "timestamp"),
+    # Unbounded numeric would default to 3 decimals.
+    (re.compile(r"\bnumeric\b(?!\s*\()", re.IGNORECASE), "double"),
+]
+_PLACEHOLDER = re.compile(r"%([s%])")
+_WRITE = re.compile(
+    r"^\s*(?:INSERT INTO|UPDATE|DELETE FROM|ALTER TABLE|"
+    r"CREATE TABLE(?: IF NOT EXISTS)?)\s+(\w+)",
+    re.IGNORECASE,
+)
+_DML = re.compile(r"^\s*(?:INSERT|UPDATE|DELETE)\b", re.IGNORECASE)
+_COMMIT_DROP = re.compile(r"^\s*CREATE TEMP TABLE (\w+)[\s\S]*ON COMMIT DROP", re.IGNORECASE)
+
+
+@lru_cache(maxsize=1024)
+def translate(sql, with_params=True):
+    for pattern, replacement in _REWRITES:
+        sql = pattern.sub(replacement, sql)
+    if with_params:
+        # Same rule as psycopg2: %s is a parameter and %% a literal percent
+        # only when parameters are passed.
+        sql = _PLACEHOLDER.sub(lambda match: "?" if match.group(1) == "s" else "%", sql)
+    return sql
+
+
+class EmbeddedCursor:
+    # The subset of the psycopg2 cursor the pipeline uses. Named cursors
+    # stream their rows; the others are fetched eagerly like psycopg2 does.
+
+    def __init__(self, connection, name=None):
+        self.connection = connection
+        self.name = name
+        self.itersize = 2000
+        self.rowcount = -1
+        self.description = None
+        self._rows = []
+        self._position = 0
+        self._result = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __iter__(self):
+        while True:
+            rows = self.fetchmany(self.itersize)
+            if not rows:
+                return
+            yield from rows
+
+    def close(self):
+        self._rows = []
+        self._result = None
+
+    def execute(self, sql, params=None):
+        statement = self.connection.prepare(sql, params is not None)
+        result = self.connection.raw.execute(statement, params)
+        self._set_result(sql, result)
+
+    def executemany(self, sql, seq_of_params):
+        seq_of_params = list(seq_of_params)
+        if not seq_of_params:
+            self.rowcount = 0
+            return
+        statement = self.connection.prepare(sql, True)
+        self.connection.raw.executemany(statement, seq_of_params)
+        self.rowcount = len(seq_of_params)
+        self.description = None
+        self._rows = []
+
+    def _set_result(self, sql, result):
+        self.description = result.description
+        self._position = 0
+        if self.name:
+            self._result = result
+            self._rows = []
+            self.rowcount = -1
+            return
+        rows = result.fetchall() if result.description else []
+        if _DML.match(sql) and "RETURNING" not in sql.upper():
+            # DML answers with a single count row.
+            self.rowcount = rows[0][0] if rows else 0
+            self._rows = []
+        else:
+            self.rowcount = len(rows)
+            self._rows = rows
+
+    def fetchone(self):
+        rows = self.fetchmany(1)
+        return rows[0] if rows else None
+
+    def fetchmany(self, size=None):
+        size = size or self.itersize
+        if self._result is not None:
+            return self._result.fetchmany(size)
+        rows = self._rows[self._position : self._position + size]
+        self._position += len(rows)
+        return rows
+
+    def fetchall(self):
+        if self._result is not None:
+            return self._result.fetchall()
+        rows = self._rows[self._position :]
+        self._position = len(self._rows)
+        return rows
+
+    def copy_expert(self, sql, file):
+        raise RuntimeError("COPY ... FROM STDIN is not available on the embedded backend")
+
+    def insert_frame(self, table, columns, frame):
+        # db.copy_frame on this backend: the frame is scanned in place.
+        raw = self.connection.raw
+        self.connection.prepare(f"INSERT INTO {table}", False)
+        types = dict(
+            raw.execute(
+                "SELECT column_name, data_type FROM information_schema.columns "
+                "WHERE table_name = ?",
+                [table],
+            ).fetchall()
+        )
+        select = []
+        for column in columns:
+            sample = frame[column].iloc[0] if len(frame) else None
+            if types.get(column, "").endswith("[]") and isinstance(sample, str):
+                # Postgres array literals, as written for COPY.
+                select.append(
+                    f"CASE WHEN {column} = '{{}}' THEN [] "
+                    f"ELSE CAST(string_split(trim({column}, '{{}}'), ',') AS {types[column]}) END"
+                )
+            else:
+                select.append(column)
+        view = f"frame_{id(frame):x}"
+        raw.register(view, frame[columns])
+        try:
+            raw.execute(
+                f"INSERT INTO {table} ({', '.join(columns)}) SELECT {', '.join(select)} FROM {view}"
+            )
+        finally:
+            raw.unregister(view)
+        return len(frame)
+
+    def advisory_lock(self, namespace, key):
+        # Transactions already run one at a time (see _TRANSACTION_LOCK).
+        self.connection.prepare("SELECT 1", False)
+
+
+class EmbeddedConnection:
+    # psycopg2 semantics: the first statement opens a transaction, which
+    # `with conn:` commits or rolls back; close() discards an open one.
+
+    def __init__(self, raw):
+        self.raw = raw
+        self.autocommit = False
+        self.closed = False
+        self._in_transaction = False
+        self._commit_drops = []
+        self._dirty = set()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.rollback()
+
+    def cursor(self, name=None):
+        return EmbeddedCursor(self, name)
+
+    def prepare(self, sql, with_params):
+        if not self._in_transaction and not self.autocommit:
+            _TRANSACTION_LOCK.acquire()
+            try:
+                self.raw.execute("BEGIN TRANSACTION")
+            except Exception:
+                _TRANSACTION_LOCK.release()
+                raise
+            self._in_transaction = True
+        written = _WRITE.match(sql)
+        if written:
+            self._dirty.add(written.group(1).lower())
+        dropped = _COMMIT_DROP.match(sql)
+        if dropped:
+            self._commit_drops.append(dropped.group(1))
+        return translate(sql, with_params)
+
+    def commit(self):
+        self._end("COMMIT")
+
+    def rollback(self):
+        self._end("ROLLBACK")
+
+    def _end(self, statement):
+        if not self._in_transaction:
+            return
+        try:
+            self.raw.execute(statement)
+            if statement == "COMMIT":
+                _DIRTY_TABLES.update(self._dirty)
+        finally:
+            self._in_transaction = False
+            self._dirty.clear()
+            for table in self._commit_drops:
+                self.raw.execute(f"DROP TABLE IF EXISTS {table}")
+            self._commit_drops.clear()
+            _TRANSACTION_LOCK.release()
+
+    def close(self):
+        if self.closed:
+            return
+        self.rollback()
+        self.raw.close()
+        self.closed = True
+
+
+class EmbeddedPool:
+    # Stands in for psycopg2's ThreadedConnectionPool: connections are cheap
+    # cursors over the shared in-process database.
+
+    def __init__(self):
+        self._idle = []
+        self._lock = threading.Lock()
+
+    def getconn(self):
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()
+        return connect()
+
+    def putconn(self, conn, close=False):
+        conn.rollback()
+        if close or conn.closed:
+            conn.close()
+            return
+        with self._lock:
+            self._idle.append(conn)
+
+    def closeall(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+
+
+def _schema_sql():
+    lines = SCHEMA_PATH.read_text(encoding="utf-8").splitlines()
+    return "\n".join(line for line in lines if not line.strip().startswith("--"))
+
+
+def _serial_columns():
+    # {table: column} for the serial keys of sql/schema.sql.
+    return {
+        table: column
+        for table, column in re.findall(
+            r"CREATE TABLE IF NOT EXISTS (\w+) \(\s*(\w+) serial PRIMARY KEY", _schema_sql()
+        )
+    }
+
+
+def _schema_statements(sequence_starts):
+    serials = _serial_columns()
+    statements = []
+    for statement in _schema_sql().split(";"):
+        statement = statement.strip()
+        if not statement:
+            continue
+        table = re.match(r"CREATE TABLE IF NOT EXISTS (\w+)", statement)
+        if table and table.group(1) in serials:
+            column = serials[table.group(1)]
+            sequence = f"{table.group(1)}_{column}_seq"
+            statements.append(
+                f"CREATE SEQUENCE IF NOT EXISTS {sequence} START {sequence_starts.get(sequence, 1)}"
+            )
+            statement = statement.replace(
+                f"{column} serial PRIMARY KEY",
+                f"{column} integer PRIMARY KEY DEFAULT nextval('{sequence}')",
+            )
+        statements.append(translate(statement, with_params=False))
+    return statements
+
+
+def _bootstrap(raw):
+    # A new store gets sql/schema.sql, then whatever snapshots exist; the
+    # sequences restart past the restored keys.
+    snapshots = sorted(EMBEDDED_PARQUET_DIR.glob("*.parquet"))
+    sequence_starts = {}
+    for table, column in _serial_columns().items():
+        path = EMBEDDED_PARQUET_DIR / f"{table}.parquet"
+        if path.exists():
+            top = raw.execute(f"SELECT max({column}) FROM '{path}'").fetchone()[0]
+            sequence_starts[f"{table}_{column}_seq"] = (top or 0) + 1
+    for statement in _schema_statements(sequence_starts):
+        raw.execute(statement)
+
+    for path in snapshots:
+        table = path.stem
+        exists = raw.execute(
+            "SELECT count(*) FROM information_schema.tables WHERE table_name = ?", [table]
+        ).fetchone()[0]
+        if exists:
+            raw.execute(f"DELETE FROM {table}")
+            raw.execute(f"INSERT INTO {table} BY NAME SELECT * FROM '{path}'")
+        else:
+            raw.execute(f"CREATE TABLE {table} AS SELECT * FROM '{path}'")
+    if snapshots:
+        print(f"[embedded] restored {len(snapshots)} tables from {EMBEDDED_PARQUET_DIR}")
+
+
+def apply_schema():
+    # Idempotent, so a store created before a table joined sql/schema.sql
+    # gets it on its next run.
+    raw = _database().cursor()
+    try:
+        with _TRANSACTION_LOCK:
+            for statement in _schema_statements({}):
+                raw.execute(statement)
+    finally:
+        raw.close()
+
+
+def _database():
+    with _DATABASE_LOCK:
+        if _DATABASE["conn"] is None:
+            try:
+                import duckdb
+            except ModuleNotFoundError as exc:
+                raise RuntimeError("DB_BACKEND=embedded needs the duckdb package") from exc
+            new = not EMBEDDED_PATH.exists()
+            EMBEDDED_PATH.parent.mkdir(parents=True, exist_ok=True)
+            config = {"threads": EMBEDDED_THREADS} if EMBEDDED_THREADS > 0 else {}
+            raw = duckdb.connect(str(EMBEDDED_PATH), config=config)
+            if new:
+                _bootstrap(raw)
+            _DATABASE["conn"] = raw
+            atexit.register(write_snapshots)
+        return _DATABASE["conn"]
+
+
+def connect():
+    return EmbeddedConnection(_database().cursor())
+
+
+def write_snapshots(tables=None):
+    # Tables written since the last snapshot, or the given ones; each file
+    # is replaced atomically.
+    if _DATABASE["conn"] is None or not EMBEDDED_PARQUET_SNAPSHOTS:
+        return []
+    raw = _database().cursor()
+    existing = {
+        row[0]
+        for row in raw.execute(
+            "SELECT table_name FROM duckdb_tables() WHERE schema_name = 'main' AND NOT temporary"
+        ).fetchall()
+    }
+    with _TRANSACTION_LOCK:
+        pending = set(tables) if tables is not None else set(_DIRTY_TABLES)
+        _DIRTY_TABLES.difference_update(pending)
+    written = []
+    EMBEDDED_PARQUET_DIR.mkdir(parents=True, exist_ok=True)
+    for table in sorted(pending & existing):
+        path = EMBEDDED_PARQUET_DIR / f"{table}.parquet"
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.part")
+        raw.execute(f"COPY {table} TO '{tmp_path}' (FORMAT parquet, COMPRESSION zstd)")
+        os.replace(tmp_path, path)
+        written.append(table)
+    raw.close()
+    if written:
+        print(f"[embedded] parquet snapshots: {', '.join(written)}")
+    return written
+
+
+def store_status():
+    raw = _database().cursor()
+    tables = [
+        row[0]
+        for row in raw.execute(
+            "SELECT table_name FROM duckdb_tables() "
+            "WHERE schema_name = 'main' AND NOT temporary ORDER BY table_name"
+        ).fetchall()
+    ]
+    counts = {table: raw.execute(f"SELECT count(*) FROM {table}").fetchone()[0] for table in tables}
+    raw.close()
+    return {
+        "path": str(EMBEDDED_PATH),
+        "parquet_dir": str(EMBEDDED_PARQUET_DIR),
+        "tables": counts,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Entrepot embarque (DuckDB + Parquet).")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("status", help="tables et nombre de lignes de l'entrepot")
+    commands.add_parser("snapshot", help="reecrit les fichiers Parquet de toutes les tables")
+
+    args = parser.parse_args(argv)
+    if args.command == "status":
+        print(json.dumps(store_status(), indent=2))
+    else:
+        write_snapshots(store_status()["tables"])
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
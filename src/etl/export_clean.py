@@ -0,0 +1,278 @@
+from __future__ import annotations
+
+import csv
+import gzip
+import hashlib
+import json
+import os
+import shutil
+from datetime import datetime, timezone
+from pathlib import Path
+
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from .db import get_conn
+
+CLEAN_DIR = Path(os.getenv("CLEAN_DATA_DIR", "data/clean"))
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "50000"))
+MANIFEST_FILENAME = "manifest.json"
+PARTITION_COLUMNS = ("year", "dept_code")
+PARTITION_SCHEMA = pa.schema([("year", pa.int16()), ("dept_code", pa.string())])
+
+# Each dataset is streamed ordered by its partition columns, so only one
+# Parquet writer is open at a time and memory stays at one fetch batch.
+EXPORT_DATASETS = [
+    {
+        "name": "election_result",
+        "query": """
+            SELECT
+                EXTRACT(YEAR FROM e.election_date)::int AS year,
+                gc.dept_code::text AS dept_code,
+                d.dept_name,
+                er.insee_code::text AS insee_code,
+                gc.commune_name,
+                e.election_type,
+                e.election_date,
+                e.round,
+                e.scope,
+                c.candidate_name,
+                c.party_code,
+                c.party_name,
+                er.registered,
+                er.votes_cast,
+                er.votes_valid,
+                er.votes,
+                er.vote_share::float8 AS vote_share
+            FROM election_result er
+            JOIN election e ON e.election_id = er.election_id
+            JOIN candidate c ON c.candidate_id = er.candidate_id
+            JOIN geo_commune gc ON gc.insee_code = er.insee_code
+            JOIN geo_department d ON d.dept_code = gc.dept_code
+            ORDER BY year, gc.dept_code, er.insee_code, e.round, c.candidate_name
+        """,
+        "schema": pa.schema(
+            [
+                ("year", pa.int16()),
+                ("dept_code", pa.string()),
+                ("dept_name", pa.string()),
+                ("insee_code", pa.string()),
+                ("commune_name", pa.string()),
+                ("election_type", pa.string()),
+                ("election_date", pa.date32()),
+                ("round", pa.int16()),
+                ("scope", pa.string()),
+                ("candidate_name", pa.string()),
+                ("party_code", pa.string()),
+                ("party_name", pa.string()),
+                ("registered", pa.int32()),
+                ("votes_cast", pa.int32()),
+                ("votes_valid", pa.int32()),
+                ("votes", pa.int32()),
+                ("vote_share", pa.float64()),
+            ]
+        ),
+    },
+    {
+        "name": "indicator_value",
+        "query": """
+            SELECT
+                iv.year,
+                gc.dept_code::text AS dept_code,
+                d.dept_name,
+                iv.insee_code::text AS insee_code,
+                gc.commune_name,
+                i.indicator_code,
+                i.indicator_name,
+                i.unit,
+                iv.value::float8 AS value,
+                iv.source_file
+            FROM indicator_value iv
+            JOIN indicator i ON i.indicator_id = iv.indicator_id
+            JOIN geo_commune gc ON gc.insee_code = iv.insee_code
+            JOIN geo_department d ON d.dept_code = gc.dept_code
+            ORDER BY iv.year, gc.dept_code, iv.insee_code, i.indicator_code
+        """,
+        "schema": pa.schema(
+            [
+                ("year", pa.int16()),
+                ("dept_code", pa.string()),
+                ("dept_name", pa.string()),
+                ("insee_code", pa.string()),
+                ("commune_name", pa.string()),
+                ("indicator_code", pa.string()),
+                ("indicator_name", pa.string()),
+                ("unit", pa.string()),
+                ("value", pa.float64()),
+                ("source_file", pa.string()),
+            ]
+        ),
+    },
+]
+
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as handle:
+        for block in iter(lambda: handle.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _file_entry(path, root, rows):
+    return {
+        "path": path.relative_to(root).as_posix(),
+        "rows": rows,
+        "bytes": path.stat().st_size,
+        "sha256": _sha256(path),
+    }
+
+
+def _iter_batches(conn, dataset):
+    # A named cursor keeps the result set on the server; rows come over in
+    # EXPORT_BATCH_SIZE slices instead of being materialized client-side.
+    with conn.cursor(name=f"export_{dataset['name']}") as cur:
+        cur.itersize = EXPORT_BATCH_SIZE
+        cur.execute(dataset["query"])
+        while True:
+            rows = cur.fetchmany(EXPORT_BATCH_SIZE)
+            if not rows:
+                break
+            yield rows
+
+
+def _partition_runs(rows, key_indexes):
+    start = 0
+    start_key = tuple(rows[0][k] for k in key_indexes)
+    for i in range(1, len(rows)):
+        key = tuple(rows[i][k] for k in key_indexes)
+        if key != start_key:
+            yield start_key, rows[start:i]
+            start, start_key = i, key
+    yield start_key, rows[start:]
+
+
+def rows_to_table(rows, schema):
+    columns = list(zip(*rows)) if rows else [()] * len(schema)
+    return pa.Table.from_arrays(
+        [pa.array(column, type=field.type) for column, field in zip(columns, schema)],
+        schema=schema,
+    )
+
+
+def export_dataset(conn, dataset, root):
+    schema = dataset["schema"]
+    key_indexes = [schema.get_field_index(column) for column in PARTITION_COLUMNS]
+    file_schema = pa.schema([field for field in schema if field.name not in PARTITION_COLUMNS])
+    dataset_dir = root / dataset["name"]
+    csv_path = root / f"{dataset['name']}.csv.gz"
+
+    files = []
+    writer = None
+    writer_path = None
+    writer_key = None
+    writer_rows = 0
+    total_rows = 0
+
+    def close_writer():
+        if writer is not None:
+            writer.close()
+            files.append(_file_entry(writer_path, root, writer_rows))
+
+    with gzip.open(csv_path, "wt", encoding="utf-8", newline="", compresslevel=6) as csv_handle:
+        csv_writer = csv.writer(csv_handle)
+        csv_writer.writerow(schema.names)
+
+        for rows in _iter_batches(conn, dataset):
+            csv_writer.writerows(rows)
+            total_rows += len(rows)
+            for key, run in _partition_runs(rows, key_indexes):
+                if key != writer_key:
+                    close_writer()
+                    year, dept_code = key
+                    partition_dir = dataset_dir / f"year={year}" / f"dept_code={dept_code}"
+                    partition_dir.mkdir(parents=True, exist_ok=True)
+                    writer_path = partition_dir / "part-0.parquet"
+                    writer = pq.ParquetWriter(writer_path, file_schema, compression="zstd")
+                    writer_key = key
+                    writer_rows = 0
+                table = rows_to_table(run, schema).drop_columns(list(PARTITION_COLUMNS))
+                writer.write_table(table)
+                writer_rows += len(run)
+
+        close_writer()
+
+    files.append(_file_entry(csv_path, root, total_rows))
+    print(f"[export] dataset={dataset['name']} rows={total_rows} partitions={len(files) - 1}")
+    return {"rows": total_rows, "files": files}
+
+
+def export_clean_dataset(output_dir=None):
+    output_dir = Path(output_dir) if output_dir is not None else CLEAN_DIR
+    output_dir.mkdir(parents=True, exist_ok=True)
+    staging_dir = output_dir / ".staging"
+    if staging_dir.exists():
+        shutil.rmtree(staging_dir)
+    staging_dir.mkdir(parents=True)
+
+    manifest = {
+        "generated_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "partitioning": list(PARTITION_COLUMNS),
+        "datasets": {},
+    }
+
+    conn = get_conn()
+    try:
+        with conn:
+            for dataset in EXPORT_DATASETS:
+                manifest["datasets"][dataset["name"]] = export_dataset(conn, dataset, staging_dir)
+    finally:
+        conn.close()
+
+    (staging_dir / MANIFEST_FILENAME).write_text(json.dumps(manifest, indent=1), encoding="utf-8")
+
+    # Swap the finished export in so readers never see a half-written tree.
+    for dataset in EXPORT_DATASETS:
+        for name in (dataset["name"], f"{dataset['name']}.csv.gz"):
+            target = output_dir / name
+            if target.is_dir():
+                shutil.rmtree(target)
+            elif target.exists():
+                target.unlink()
+            if (staging_dir / name).exists():
+                (staging_dir / name).rename(target)
+    (staging_dir / MANIFEST_FILENAME).replace(output_dir / MANIFEST_FILENAME)
+    shutil.rmtree(staging_dir)
+    return output_dir / MANIFEST_FILENAME
+
+
+def read_clean_dataset(name, year=None, dept_code=None, columns=None, root=None):
+    root = Path(root) if root is not None else CLEAN_DIR
+    dataset = ds.dataset(
+        root / name,
+        format="parquet",
+        partitioning=ds.partitioning(PARTITION_SCHEMA, flavor="hive"),
+    )
+    expression = None
+    if year is not None:
+        expression = ds.field("year") == year
+    if dept_code is not None:
+        dept_filter = ds.field("dept_code") == dept_code
+        expression = dept_filter if expression is None else expression & dept_filter
+    return dataset.to_table(columns=columns, filter=expression).to_pandas()
+
+
+def run_export_pipeline():
+    manifest_path = export_clean_dataset()
+    print(f"[done] jeu de donnees nettoye exporte: {manifest_path}")
+    return str(manifest_path)
+
+
+def main():
+    run_export_pipeline()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
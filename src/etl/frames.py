@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+import sys
+
+import pandas as pd
+
+# Compact in-memory layout for the frames handed from transform to load.
+# Codes and names repeat across every row, so they live as categoricals;
+# counts fit in nullable int32; shares are rounded to 6 decimals upstream and
+# the database stores them as numeric(6,5), so float32 is enough for them.
+# Indicator values keep float64 because ODD_DEP carries amounts (EUR, counts)
+# that float32 would truncate.
+RESULT_DTYPES = {
+    "election_type": "category",
+    "election_date": "category",
+    "round": "int16",
+    "scope": "category",
+    "year": "int16",
+    "dept_code": "category",
+    "dept_name": "category",
+    "candidate_name": "category",
+    "registered": "Int32",
+    "votes_cast": "Int32",
+    "votes_valid": "Int32",
+    "votes": "Int32",
+    "vote_share": "float32",
+    "turnout_rate": "float32",
+}
+
+# One election = one (type, date, round, scope), as in the election table.
+ELECTION_KEY_COLUMNS = ["election_type", "election_date", "round", "scope"]
+
+INDICATOR_DTYPES = {
+    "indicator_code": "category",
+    "insee_code": "category",
+    "year": "int16",
+    "value": "float64",
+    "source_file": "category",
+}
+
+
+def intern_text(value):
+    if value is None or (isinstance(value, float) and pd.isna(value)):
+        return None
+    return sys.intern(str(value))
+
+
+def _coerce_column(series, dtype):
+    if dtype == "category":
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            return series.cat.remove_unused_categories()
+        return series.astype("category")
+    if dtype in {"Int32", "Int16"}:
+        return pd.to_numeric(series, errors="coerce").round().astype(dtype)
+    return pd.to_numeric(series, errors="coerce").astype(dtype)
+
+
+def coerce_frame(df, dtypes):
+    data = {}
+    for column, dtype in dtypes.items():
+        if column in df.columns:
+            data[column] = _coerce_column(df[column], dtype)
+        else:
+            data[column] = pd.Series([None] * len(df), index=df.index, dtype=object).astype(dtype)
+    return pd.DataFrame(data, index=df.index)
+
+
+def empty_frame(dtypes):
+    return pd.DataFrame({column: pd.Series(dtype=dtype) for column, dtype in dtypes.items()})
+
+
+def frame_from_records(records, dtypes):
+    if not records:
+        return empty_frame(dtypes)
+    columns = {column: [] for column in dtypes}
+    for record in records:
+        for column, values in columns.items():
+            values.append(record.get(column))
+    data = {}
+    for column, dtype in dtypes.items():
+        values = columns[column]
+        if dtype == "category":
+            data[column] = pd.Categorical([intern_text(v) for v in values])
+        else:
+            data[column] = _coerce_column(pd.Series(values, dtype=object), dtype).array
+    return pd.DataFrame(data)
+
+
+def concat_frames(frames, dtypes):
+    frames = [frame for frame in frames if not frame.empty]
+    if not frames:
+        return empty_frame(dtypes)
+    # Categories differ from one source frame to the next; union them instead
+    # of letting concat fall back to object columns.
+    data = {}
+    for column, dtype in dtypes.items():
+        if dtype == "category":
+            data[column] = pd.api.types.union_categoricals(
+                [frame[column].astype("category") for frame in frames], ignore_order=True
+            )
+        else:
+            data[column] = pd.concat([frame[column] for frame in frames], ignore_index=True).astype(
+                dtype
+            )
+    return pd.DataFrame(data)
+
+
+def memory_report(df, name="frame"):
+    usage = df.memory_usage(index=False, deep=True)
+    report = pd.DataFrame(
+        {
+            "column": usage.index,
+            "dtype": [str(df[column].dtype) for column in usage.index],
+            "bytes": usage.to_numpy(),
+        }
+    )
+    report["share"] = (report["bytes"] / max(int(report["bytes"].sum()), 1)).round(4)
+    report.attrs["name"] = name
+    return report
+
+
+def print_memory_report(df, name="frame"):
+    report = memory_report(df, name)
+    total = int(report["bytes"].sum())
+    print(f"[memory] frame={name} rows={len(df)} bytes={total}")
+    for row in report.itertuples(index=False):
+        print(
+            f"[memory]   {row.column:<16} {row.dtype:<10} "
+            f"bytes={int(row.bytes)} share={row.share}"
+        )
+    return report
@@ -0,0 +1,156 @@
+from __future__ import annotations
+
+REGION_BY_DEPT_CODE = {}
+DEPT_NAME_BY_CODE = {}
+
+_REGIONS = {
+    "Auvergne-Rhone-Alpes": {
+        "01": "Ain",
+        "03": "Allier",
+        "07": "Ardeche",
+        "15": "Cantal",
+        "26": "Drome",
+        "38": "Isere",
+        "42": "Loire",
+        "43": "Haute-Loire",
+        "63": "Puy-de-Dome",
+        "69": "Rhone",
+        "73": "Savoie",
+        "74": "Haute-Savoie",
+    },
+    "Bourgogne-Franche-Comte": {
+        "21": "Cote-d'Or",
+        "25": "Doubs",
+        "39": "Jura",
+        "58": "Nievre",
+        "70": "Haute-Saone",
+        "71": "Saone-et-Loire",
+        "89": "Yonne",
+        "90": "Territoire de Belfort",
+    },
+    "Bretagne": {
+        "22": "Cotes-d'Armor",
+        "29": "Finistere",
+        "35": "Ille-et-Vilaine",
+        "56": "Morbihan",
+    },
+    "Centre-Val de Loire": {
+        "18": "Cher",
+        "28": "Eure-et-Loir",
+        "36": "Indre",
+        "37": "Indre-et-Loire",
+        "41": "Loir-et-Cher",
+        "45": "Loiret",
+    },
+    "Corse": {
+        "2A": "Corse-du-Sud",
+        "2B": "Haute-Corse",
+    },
+    "Grand Est": {
+        "08": "Ardennes",
+        "10": "Aube",
+        "51": "Marne",
+        "52": "Haute-Marne",
+        "54": "Meurthe-et-Moselle",
+        "55": "Meuse",
+        "57": "Moselle",
+        "67": "Bas-Rhin",
+        "68": "Haut-Rhin",
+        "88": "Vosges",
+    },
+    "Hauts-de-France": {
+        "02": "Aisne",
+        "59": "Nord",
+        "60": "Oise",
+        "62": "Pas-de-Calais",
+        "80": "Somme",
+    },
+    "Ile-de-France": {
+        "75": "Paris",
+        "77": "Seine-et-Marne",
+        "78": "Yvelines",
+        "91": "Essonne",
+        "92": "Hauts-de-Seine",
+        "93": "Seine-Saint-Denis",
+        "94": "Val-de-Marne",
+        "95": "Val-d'Oise",
+    },
+    "Normandie": {
+        "14": "Calvados",
+        "27": "Eure",
+        "50": "Manche",
+        "61": "Orne",
+        "76": "Seine-Maritime",
+    },
+    "Nouvelle-Aquitaine": {
+        "16": "Charente",
+        "17": "Charente-Maritime",
+        "19": "Correze",
+        "23": "Creuse",
+        "24": "Dordogne",
+        "33": "Gironde",
+        "40": "Landes",
+        "47": "Lot-et-Garonne",
+        "64": "Pyrenees-Atlantiques",
+        "79": "Deux-Sevres",
+        "86": "Vienne",
+        "87": "Haute-Vienne",
+    },
+    "Occitanie": {
+        "09": "Ariege",
+        "11": "Aude",
+        "12": "Aveyron",
+        "30": "Gard",
+        "31": "Haute-Garonne",
+        "32": "Gers",
+        "34": "Herault",
+        "46": "Lot",
+        "48": "Lozere",
+        "65": "Hautes-Pyrenees",
+        "66": "Pyrenees-Orientales",
+        "81": "Tarn",
+        "82": "Tarn-et-Garonne",
+    },
+    "Pays de la Loire": {
+        "44": "Loire-Atlantique",
+        "49": "Maine-et-Loire",
+        "53": "Mayenne",
+        "72": "Sarthe",
+        "85": "Vendee",
+    },
+    "Provence-Alpes-Cote d'Azur": {
+        "04": "Alpes-de-Haute-Provence",
+        "05": "Hautes-Alpes",
+        "06": "Alpes-Maritimes",
+        "13": "Bouches-du-Rhone",
+        "83": "Var",
+        "84": "Vaucluse",
+    },
+    "Guadeloupe": {"971": "Guadeloupe"},
+    "Martinique": {"972": "Martinique"},
+    "Guyane": {"973": "Guyane"},
+    "La Reunion": {"974": "La Reunion"},
+    "Mayotte": {"976": "Mayotte"},
+}
+
+for _region, _departments in _REGIONS.items():
+    for _code, _name in _departments.items():
+        DEPT_NAME_BY_CODE[_code] = _name
+        REGION_BY_DEPT_CODE[_code] = _region
+
+ALL_DEPT_CODES = tuple(sorted(DEPT_NAME_BY_CODE))
+REGIONS = tuple(_REGIONS)
+
+
+def dept_insee_code(dept_code):
+    # Department-level rows use a pseudo commune code: "75" -> "75000",
+    # overseas "971" -> "97100", so the code always fits char(5).
+    return f"{dept_code}{'0' * (5 - len(dept_code))}"
+
+
+def dept_codes_by_region(dept_codes=None):
+    selected = set(dept_codes) if dept_codes is not None else set(ALL_DEPT_CODES)
+    grouped = {}
+    for code in sorted(selected):
+        grouped.setdefault(REGION_BY_DEPT_CODE.get(code, "Autre"), []).append(code)
+    return grouped
@@ -0,0 +1,513 @@
+from __future__ import annotations
+
+import argparse
+import csv
+import fnmatch
+import hashlib
+import os
+import time
+from pathlib import Path
+
+import pandas as pd
+
+from . import run_etl
+from .blocs import refresh_bloc_rollups
+from .candidates import resolve_candidates
+from .db import (
+    advisory_xact_lock,
+    bump_load_version,
+    copy_frame,
+    ensure_schema,
+    get_conn,
+)
+from .geo import dept_insee_code
+from .sources import select_sources
+from .spatial import SPATIAL_LAGS_ENABLED, has_neighbors, refresh_election_lags
+from .stats import STATS_ENABLED, refresh_indicator_vote_stats
+
+# A directory of partial bureau files, or a single file that keeps growing.
+LIVE_FEED_PATH = Path(os.getenv("LIVE_FEED_PATH", "data/raw/live"))
+LIVE_FEED_PATTERN = os.getenv("LIVE_FEED_PATTERN", "*.txt")
+LIVE_POLL_SECONDS = float(os.getenv("LIVE_POLL_SECONDS", "2"))
+LIVE_REFRESH_BLOCS = os.getenv("LIVE_REFRESH_BLOCS", "true").lower() in {"1", "true", "yes"}
+
+BUREAU_COLUMNS = [
+    "election_id",
+    "bureau_key",
+    "insee_code",
+    "row_hash",
+    "registered",
+    "votes_cast",
+    "votes_valid",
+    "candidate_ids",
+    "votes",
+]
+
+UPSERT_BUREAUS = """
+    INSERT INTO live_bureau AS lb ({columns})
+    SELECT {columns} FROM live_bureau_stage
+    ON CONFLICT (election_id, bureau_key) DO UPDATE
+    SET row_hash = EXCLUDED.row_hash,
+        registered = EXCLUDED.registered,
+        votes_cast = EXCLUDED.votes_cast,
+        votes_valid = EXCLUDED.votes_valid,
+        candidate_ids = EXCLUDED.candidate_ids,
+        votes = EXCLUDED.votes,
+        updated_at = now()
+""".format(columns=", ".join(BUREAU_COLUMNS))
+
+UPSERT_RESULTS = """
+    INSERT INTO election_result ({columns})
+    SELECT {columns} FROM live_result_stage
+    ON CONFLICT (election_id, insee_code, candidate_id) DO UPDATE
+    SET registered = EXCLUDED.registered,
+        votes_cast = EXCLUDED.votes_cast,
+        votes_valid = EXCLUDED.votes_valid,
+        votes = EXCLUDED.votes,
+        vote_share = EXCLUDED.vote_share
+""".format(columns=", ".join(run_etl.ELECTION_RESULT_COLUMNS))
+
+UPSERT_FILE = """
+    INSERT INTO live_feed_file
+      (election_id, path, inode, file_offset, size, mtime_ns, header)
+    VALUES (%s, %s, %s, %s, %s, %s, %s)
+    ON CONFLICT (election_id, path) DO UPDATE
+    SET inode = EXCLUDED.inode,
+        file_offset = EXCLUDED.file_offset,
+        size = EXCLUDED.size,
+        mtime_ns = EXCLUDED.mtime_ns,
+        header = EXCLUDED.header
+"""
+
+
+def _commune_insee(dept_code, commune_code):
+    commune_code = commune_code.strip().zfill(3)
+    if len(dept_code) == 3:
+        return f"{dept_code}{commune_code[-2:]}"
+    return f"{dept_code}{commune_code[-3:]}"
+
+
+def _row_hash(totals, votes):
+    payload = repr((totals, sorted(votes.items())))
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def new_state(source, election_id):
+    return {
+        "source": source,
+        "key": (
+            source["election_type"],
+            source["election_date"],
+            int(source["round"]),
+            source["scope"],
+        ),
+        "election_id": election_id,
+        "year": int(str(source["election_date"])[:4]),
+        # bureau_key -> (row_hash, insee_code, totals, {candidate_id: votes})
+        "bureaus": {},
+        # Running commune and department aggregates, keyed by insee code.
+        "totals": {},
+        "votes": {},
+        "candidate_ids": {},
+        "communes": set(),
+        "files": {},
+    }
+
+
+def _add_bureau(totals, votes, unit, bureau_totals, bureau_votes, sign):
+    current = totals.setdefault(unit, [0, 0, 0])
+    for i, value in enumerate(bureau_totals):
+        current[i] += sign * value
+    unit_votes = votes.setdefault(unit, {})
+    for candidate_id, count in bureau_votes.items():
+        unit_votes[candidate_id] = unit_votes.get(candidate_id, 0) + sign * count
+
+
+def load_state(cur, source):
+    run_etl._ensure_votes_nullable(cur)
+    run_etl._ensure_target_geo(cur)
+    election_id = run_etl._get_or_create_election(
+        cur,
+        source["election_type"],
+        source["election_date"],
+        int(source["round"]),
+        source["scope"],
+    )
+    state = new_state(source, election_id)
+
+    # A restart picks up where the previous process stopped: bureaus already
+    # applied are known by their hash and are not applied twice.
+    cur.execute(
+        """
+        SELECT bureau_key, insee_code, row_hash, registered, votes_cast, votes_valid,
+               candidate_ids, votes
+        FROM live_bureau
+        WHERE election_id = %s
+        """,
+        (election_id,),
+    )
+    for bureau_key, insee_code, row_hash, *bureau_totals, candidate_ids, votes in cur.fetchall():
+        bureau_votes = dict(zip(candidate_ids, votes))
+        state["bureaus"][bureau_key] = (row_hash, insee_code, tuple(bureau_totals), bureau_votes)
+        state["communes"].add(insee_code)
+        dept_unit = dept_insee_code(bureau_key.split("|")[0])
+        for unit in (insee_code, dept_unit):
+            _add_bureau(state["totals"], state["votes"], unit, bureau_totals, bureau_votes, 1)
+
+    # Read positions are committed with the bureaus, so a restart resumes
+    # each file where it stopped instead of replaying it.
+    delimiter = (source.get("options") or {}).get("delimiter", ";")
+    cur.execute(
+        """
+        SELECT path, inode, file_offset, size, mtime_ns, header
+        FROM live_feed_file
+        WHERE election_id = %s
+        """,
+        (election_id,),
+    )
+    for path, inode, offset, size, mtime_ns, header in cur.fetchall():
+        state["files"][Path(path)] = {
+            "inode": inode,
+            "offset": offset,
+            "header": next(csv.reader([header], delimiter=delimiter)) if header else None,
+            "stamp": (inode, size, mtime_ns),
+        }
+    print(
+        f"[live] election={state['key'][0]} date={state['key'][1]} round={state['key'][2]} "
+        f"election_id={election_id} bureaus={len(state['bureaus'])}"
+    )
+    return state
+
+
+def _feed_files(feed):
+    # Absolute paths: they key the read positions kept in live_feed_file.
+    feed = Path(feed).resolve()
+    if feed.is_file():
+        return [feed]
+    if not feed.is_dir():
+        return []
+    return sorted(
+        path
+        for path in feed.iterdir()
+        if path.is_file() and fnmatch.fnmatch(path.name, LIVE_FEED_PATTERN)
+    )
+
+
+def _read_new_lines(state, path):
+    # Only what was appended since the last poll is read; a file replaced by
+    # a new one (another inode) is read again from the start and its
+    # unchanged bureaus are skipped on their hash.
+    options = state["source"].get("options") or {}
+    stat = path.stat()
+    seen = state["files"].get(path)
+    if seen and seen["stamp"] == (stat.st_ino, stat.st_size, stat.st_mtime_ns):
+        return None, None
+    append = seen is not None and seen["inode"] == stat.st_ino and stat.st_size >= seen["offset"]
+
+    with path.open("rb") as handle:
+        handle.seek(seen["offset"] if append else 0)
+        data = handle.read()
+    # A line still being written is left for the next poll.
+    complete = data[: data.rfind(b"\n") + 1]
+    lines = complete.decode(options.get("encoding", "latin-1"), errors="replace").splitlines()
+
+    header = seen["header"] if append else None
+    if header is None and lines:
+        header = next(csv.reader(lines[:1], delimiter=options.get("delimiter", ";")))
+        lines = lines[1:]
+    pending = {
+        "inode": stat.st_ino,
+        "offset": (seen["offset"] if append else 0) + len(complete),
+        "header": header,
+        "stamp": (stat.st_ino, stat.st_size, stat.st_mtime_ns),
+    }
+    return pending, lines
+
+
+def _parse_bureaus(state, header, lines):
+    options = state["source"].get("options") or {}
+    layout = run_etl._interior_layout(state["source"], header)
+    idx_by_name = layout["idx_by_name"]
+    commune_idx = idx_by_name.get("codedelacommune")
+    commune_name_idx = idx_by_name.get("libelledelacommune")
+    if commune_idx is None:
+        raise RuntimeError(f"Live feed for {state['source']['id']} has no commune column.")
+
+    rows_per_candidate = bool(options.get("rows_per_candidate"))
+    bureaus = {}
+    for row in csv.reader(lines, delimiter=options.get("delimiter", ";")):
+        parsed = run_etl._interior_row(layout, row)
+        if parsed is None:
+            continue
+        dept_code, unit_key, totals, votes = parsed
+        bureau_key = "|".join(unit_key)
+        if rows_per_candidate and bureau_key in bureaus:
+            # Long layouts, one row per candidate: totals repeat, votes add up.
+            known_votes = bureaus[bureau_key]["votes"]
+            for name, count in votes.items():
+                known_votes[name] = known_votes.get(name, 0) + count
+            continue
+        # Wide layout, one row per bureau: a later line for the same bureau
+        # is a correction and replaces the earlier one.
+        bureaus[bureau_key] = {
+            "dept_code": dept_code,
+            "insee_code": _commune_insee(dept_code, row[commune_idx]),
+            "commune_name": row[commune_name_idx].strip() if commune_name_idx is not None else "",
+            "totals": totals,
+            "votes": votes,
+        }
+    return bureaus
+
+
+def poll_feed(state, feed=None):
+    pending_files = {}
+    bureaus = {}
+    for path in _feed_files(feed or LIVE_FEED_PATH):
+        pending, lines = _read_new_lines(state, path)
+        if pending is None:
+            continue
+        pending_files[path] = pending
+        if lines and pending["header"]:
+            bureaus.update(_parse_bureaus(state, pending["header"], lines))
+    return pending_files, bureaus
+
+
+def _result_rows(state, units, totals, votes):
+    records = []
+    for unit in sorted(units):
+        registered, votes_cast, votes_valid = totals[unit]
+        for candidate_id, count in sorted(votes[unit].items()):
+            records.append(
+                (
+                    state["election_id"],
+                    unit,
+                    candidate_id,
+                    registered,
+                    votes_cast,
+                    votes_valid,
+                    count,
+                    round(count / votes_valid, 5) if votes_valid else None,
+                )
+            )
+    return pd.DataFrame.from_records(records, columns=run_etl.ELECTION_RESULT_COLUMNS)
+
+
+def _save_files(cur, state, files):
+    delimiter = (state["source"].get("options") or {}).get("delimiter", ";")
+    cur.executemany(
+        UPSERT_FILE,
+        [
+            (
+                state["election_id"],
+                str(path),
+                seen["inode"],
+                seen["offset"],
+                seen["stamp"][1],
+                seen["stamp"][2],
+                delimiter.join(seen["header"]) if seen["header"] else None,
+            )
+            for path, seen in sorted(files.items())
+        ],
+    )
+
+
+def apply_batch(conn, state, bureaus, files=None):
+    changed = {}
+    for bureau_key, bureau in bureaus.items():
+        row_hash = _row_hash(bureau["totals"], bureau["votes"])
+        known = state["bureaus"].get(bureau_key)
+        if known is None or known[0] != row_hash:
+            changed[bureau_key] = dict(bureau, row_hash=row_hash)
+    if not changed:
+        if files:
+            with conn:
+                with conn.cursor() as cur:
+                    _save_files(cur, state, files)
+        return 0, 0
+
+    election_type, election_date, round_no, _ = state["key"]
+    with conn:
+        with conn.cursor() as cur:
+            # Same lock as the batch loader: a reload of this election waits.
+            advisory_xact_lock(cur, run_etl.ELECTION_LOCK_NAMESPACE, state["election_id"])
+
+            candidate_ids = dict(state["candidate_ids"])
+            new_names = {
+                name
+                for bureau in changed.values()
+                for name in bureau["votes"]
+                if name not in candidate_ids
+            }
+            if new_names:
+                resolved = resolve_candidates(cur, {(state["year"], name) for name in new_names})
+                candidate_ids.update({name: cid for (_, name), cid in resolved.items()})
+
+            new_communes = {
+                bureau["insee_code"]: (bureau["commune_name"], bureau["dept_code"])
+                for bureau in changed.values()
+                if bureau["insee_code"] not in state["communes"]
+            }
+            if new_communes:
+                cur.executemany(
+                    """
+                    INSERT INTO geo_commune (insee_code, commune_name, dept_code)
+                    VALUES (%s, %s, %s)
+                    ON CONFLICT (insee_code) DO NOTHING
+                    """,
+                    [
+                        (insee_code, name or insee_code, dept_code)
+                        for insee_code, (name, dept_code) in sorted(new_communes.items())
+                    ],
+                )
+
+            # Deltas: the previous version of each changed bureau is taken
+            # out of its commune and department, the new one added in. Only
+            # the units touched are copied and rewritten.
+            touched = set()
+            bureau_rows = {}
+            for bureau_key, bureau in changed.items():
+                touched.update((bureau["insee_code"], dept_insee_code(bureau["dept_code"])))
+                known = state["bureaus"].get(bureau_key)
+                if known is not None:
+                    touched.add(known[1])
+                bureau_rows[bureau_key] = (
+                    bureau["row_hash"],
+                    bureau["insee_code"],
+                    bureau["totals"],
+                    {candidate_ids[name]: count for name, count in bureau["votes"].items()},
+                )
+            totals = {unit: list(state["totals"].get(unit, [0, 0, 0])) for unit in touched}
+            votes = {unit: dict(state["votes"].get(unit, {})) for unit in touched}
+            for bureau_key, (_, insee_code, bureau_totals, bureau_votes) in bureau_rows.items():
+                dept_unit = dept_insee_code(bureau_key.split("|")[0])
+                known = state["bureaus"].get(bureau_key)
+                if known is not None:
+                    for unit in (known[1], dept_unit):
+                        _add_bureau(totals, votes, unit, known[2], known[3], -1)
+                for unit in (insee_code, dept_unit):
+                    _add_bureau(totals, votes, unit, bureau_totals, bureau_votes, 1)
+
+            stage = pd.DataFrame.from_records(
+                [
+                    (
+                        state["election_id"],
+                        bureau_key,
+                        insee_code,
+                        row_hash,
+                        *bureau_totals,
+                        "{" + ",".join(str(cid) for cid in bureau_votes) + "}",
+                        "{" + ",".join(str(count) for count in bureau_votes.values()) + "}",
+                    )
+                    for bureau_key, (row_hash, insee_code, bureau_totals, bureau_votes) in sorted(
+                        bureau_rows.items()
+                    )
+                ],
+                columns=BUREAU_COLUMNS,
+            )
+            cur.execute(
+                "CREATE TEMP TABLE live_bureau_stage "
+                "(LIKE live_bureau INCLUDING DEFAULTS) ON COMMIT DROP"
+            )
+            copy_frame(cur, "live_bureau_stage", BUREAU_COLUMNS, stage)
+            cur.execute(UPSERT_BUREAUS)
+
+            results = _result_rows(state, touched, totals, votes)
+            cur.execute(
+                "CREATE TEMP TABLE live_result_stage "
+                "(LIKE election_result INCLUDING DEFAULTS) ON COMMIT DROP"
+            )
+            copy_frame(cur, "live_result_stage", run_etl.ELECTION_RESULT_COLUMNS, results)
+            cur.execute(UPSERT_RESULTS)
+
+            if LIVE_REFRESH_BLOCS:
+                refresh_bloc_rollups(cur, [state["election_id"]])
+            if files:
+                _save_files(cur, state, files)
+            bump_load_version(cur, f"election_results:{election_type}:{election_date}:t{round_no}")
+
+    # The in-memory state only moves once the transaction has committed.
+    state["bureaus"].update(bureau_rows)
+    state["totals"].update(totals)
+    state["votes"].update(votes)
+    state["candidate_ids"] = candidate_ids
+    state["communes"].update(new_communes)
+    return len(changed), len(results)
+
+
+def finalize_live(conn, state):
+    # Spatial lags and correlations are too slow to follow every batch; they
+    # run once the count is over.
+    with conn:
+        with conn.cursor() as cur:
+            if SPATIAL_LAGS_ENABLED and has_neighbors(cur):
+                refresh_election_lags(cur, [state["election_id"]])
+            if STATS_ENABLED:
+                refresh_indicator_vote_stats(cur, [state["election_id"]])
+            bump_load_version(cur, "election_results")
+
+
+def run_live(source_id, feed=None, once=False, finalize=False, poll_seconds=None):
+    source = select_sources([source_id], parsers=run_etl.ELECTION_PARSERS)[0]
+    if source["parser"] != "interior_blocks":
+        raise RuntimeError(
+            f"Live mode reads bureau files in the interior_blocks layout, "
+            f"not {source['parser']!r} ({source_id})."
+        )
+    poll_seconds = LIVE_POLL_SECONDS if poll_seconds is None else poll_seconds
+
+    ensure_schema()
+    conn = get_conn()
+    state = None
+    try:
+        with conn:
+            with conn.cursor() as cur:
+                state = load_state(cur, source)
+        while True:
+            started = time.perf_counter()
+            try:
+                pending_files, bureaus = poll_feed(state, feed)
+                changed, rows = apply_batch(conn, state, bureaus, pending_files)
+            except Exception as exc:
+                if once:
+                    raise
+                # A half-written or malformed file must not end the night:
+                # nothing was committed, the same files are read again.
+                print(f"[warn] live batch failed, retrying on next poll: {exc}")
+            else:
+                state["files"].update(pending_files)
+                if changed:
+                    print(
+                        f"[live] bureaus={changed} result_rows={rows} "
+                        f"total_bureaus={len(state['bureaus'])} "
+                        f"seconds={time.perf_counter() - started:.2f}"
+                    )
+            if once:
+                break
+            time.sleep(max(0.0, poll_seconds - (time.perf_counter() - started)))
+    except KeyboardInterrupt:
+        print("[live] stopped")
+    finally:
+        try:
+            if finalize and state is not None:
+                finalize_live(conn, state)
+        finally:
+            conn.close()
+    return state
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Ingestion en direct des resultats par bureau.")
+    parser.add_argument("source", help="id de l'adaptateur (parseur interior_blocks)")
+    parser.add_argument("--feed", default=None, help="repertoire ou fichier surveille")
+    parser.add_argument("--once", action="store_true", help="un seul passage puis arret")
+    parser.add_argument("--interval", type=float, default=None)
+    parser.add_argument(
+        "--finalize", action="store_true", help="decalages spatiaux et correlations a l'arret"
+    )
+    args = parser.parse_args(argv)
+    run_live(args.source, args.feed, args.once, args.finalize, args.interval)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,345 @@
+from __future__ import annotations
+
+import json
+import os
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from .frames import ELECTION_KEY_COLUMNS
+
+QUALITY_GATE_ENABLED = os.getenv("QUALITY_GATE", "true").lower() in {"1", "true", "yes"}
+QUALITY_REPORT_DIR = Path(os.getenv("QUALITY_REPORT_DIR", "data/processed/quality"))
+QUALITY_SAMPLE_SIZE = 5
+
+RESULT_KEY_COLUMNS = [*ELECTION_KEY_COLUMNS, "dept_code", "candidate_name"]
+INDICATOR_KEY_COLUMNS = ["indicator_code", "insee_code", "year"]
+
+# Severity decides what happens to offending rows:
+# - "fail": the run stops before anything is loaded,
+# - "quarantine": rows are dropped from the load and written next to the report,
+# - "warn": rows are only counted in the report.
+# Group checks stay at "warn": quarantining a group would drop a whole
+# department from the load for a single bad cell.
+RESULT_CHECKS = [
+    {
+        "name": "duplicate_result_key",
+        "kind": "duplicate",
+        "columns": RESULT_KEY_COLUMNS,
+        "severity": "fail",
+    },
+    {
+        "name": "missing_dept_or_candidate",
+        "kind": "not_null",
+        "columns": ["dept_code", "candidate_name"],
+        "severity": "fail",
+    },
+    {
+        "name": "missing_vote_share",
+        "kind": "not_null",
+        "columns": ["vote_share"],
+        "severity": "quarantine",
+    },
+    {
+        "name": "vote_share_bounds",
+        "kind": "between",
+        "column": "vote_share",
+        "min": 0,
+        "max": 1,
+        "severity": "quarantine",
+    },
+    {
+        "name": "turnout_rate_bounds",
+        "kind": "between",
+        "column": "turnout_rate",
+        "min": 0,
+        "max": 1,
+        "severity": "quarantine",
+    },
+    {
+        "name": "votes_le_votes_valid",
+        "kind": "less_equal",
+        "column": "votes",
+        "other": "votes_valid",
+        "severity": "quarantine",
+    },
+    {
+        "name": "votes_valid_le_votes_cast",
+        "kind": "less_equal",
+        "column": "votes_valid",
+        "other": "votes_cast",
+        "severity": "quarantine",
+    },
+    {
+        "name": "votes_cast_le_registered",
+        "kind": "less_equal",
+        "column": "votes_cast",
+        "other": "registered",
+        "severity": "quarantine",
+    },
+    {
+        "name": "vote_share_sum",
+        "kind": "group_sum_between",
+        "group": [*ELECTION_KEY_COLUMNS, "dept_code"],
+        "column": "vote_share",
+        "min": 0.98,
+        "max": 1.02,
+        "severity": "warn",
+    },
+]
+
+INDICATOR_CHECKS = [
+    {
+        "name": "duplicate_indicator_key",
+        "kind": "duplicate",
+        "columns": INDICATOR_KEY_COLUMNS,
+        "severity": "fail",
+    },
+    {
+        "name": "insee_code_format",
+        "kind": "pattern",
+        "column": "insee_code",
+        "pattern": r"[0-9][0-9AB][0-9]{3}",
+        "severity": "fail",
+    },
+    {
+        "name": "missing_value",
+        "kind": "not_null",
+        "columns": ["value"],
+        "severity": "quarantine",
+    },
+    {
+        "name": "year_bounds",
+        "kind": "between",
+        "column": "year",
+        "min": 1900,
+        "max": 2100,
+        "severity": "fail",
+    },
+    {
+        "name": "negative_value",
+        "kind": "between",
+        "column": "value",
+        "min": 0,
+        "max": None,
+        "severity": "warn",
+    },
+]
+
+
+def _numeric(df, column):
+    return pd.to_numeric(df[column], errors="coerce").astype("float64").to_numpy()
+
+
+def _mask_duplicate(df, check):
+    return df.duplicated(subset=check["columns"], keep=False).to_numpy()
+
+
+def _mask_not_null(df, check):
+    return df[check["columns"]].isna().any(axis=1).to_numpy()
+
+
+def _mask_between(df, check):
+    values = _numeric(df, check["column"])
+    mask = np.zeros(len(df), dtype=bool)
+    with np.errstate(invalid="ignore"):
+        if check.get("min") is not None:
+            mask |= values < check["min"]
+        if check.get("max") is not None:
+            mask |= values > check["max"]
+    if check.get("indicator_codes") and "indicator_code" in df.columns:
+        mask &= df["indicator_code"].isin(check["indicator_codes"]).to_numpy()
+    return mask
+
+
+def _mask_less_equal(df, check):
+    left = _numeric(df, check["column"])
+    right = _numeric(df, check["other"])
+    with np.errstate(invalid="ignore"):
+        return left > right
+
+
+def _mask_group_sum_between(df, check):
+    totals = (
+        pd.Series(_numeric(df, check["column"]), index=df.index)
+        .groupby([df[column] for column in check["group"]], observed=True, sort=False)
+        .transform("sum")
+        .to_numpy()
+    )
+    with np.errstate(invalid="ignore"):
+        return (totals < check["min"]) | (totals > check["max"])
+
+
+def _mask_pattern(df, check):
+    matches = df[check["column"]].astype("string").str.fullmatch(check["pattern"])
+    return ~matches.fillna(False).to_numpy(dtype=bool)
+
+
+MASK_BUILDERS = {
+    "duplicate": _mask_duplicate,
+    "not_null": _mask_not_null,
+    "between": _mask_between,
+    "less_equal": _mask_less_equal,
+    "group_sum_between": _mask_group_sum_between,
+    "pattern": _mask_pattern,
+}
+
+
+def evaluate_checks(df, checks):
+    masks = {}
+    for check in checks:
+        builder = MASK_BUILDERS.get(check["kind"])
+        if builder is None:
+            raise RuntimeError(f"Unknown quality check kind: {check['kind']}")
+        masks[check["name"]] = np.asarray(builder(df, check), dtype=bool)
+    return masks
+
+
+def _sample_rows(df, mask, checks_columns):
+    columns = [column for column in checks_columns if column in df.columns]
+    sample = df.loc[mask, columns].head(QUALITY_SAMPLE_SIZE)
+    return json.loads(sample.to_json(orient="records"))
+
+
+def _report_entry(df, check, mask, key_columns):
+    columns = list(key_columns) + list(check.get("columns", []))
+    columns += [check[key] for key in ("column", "other") if key in check]
+    columns += list(check.get("group", []))
+    return {
+        "name": check["name"],
+        "kind": check["kind"],
+        "severity": check["severity"],
+        "failed_rows": int(mask.sum()),
+        "sample": _sample_rows(df, mask, list(dict.fromkeys(columns))) if mask.any() else [],
+    }
+
+
+def _evaluate_gate(df, checks, key_columns):
+    masks = evaluate_checks(df, checks)
+    quarantine = np.zeros(len(df), dtype=bool)
+    failed = []
+    entries = []
+    for check in checks:
+        mask = masks[check["name"]]
+        entries.append(_report_entry(df, check, mask, key_columns))
+        if not mask.any():
+            continue
+        if check["severity"] == "fail":
+            failed.append(check["name"])
+        elif check["severity"] == "quarantine":
+            quarantine |= mask
+    return entries, quarantine, failed
+
+
+def _report_status(quarantined, failed):
+    if failed:
+        return "failed"
+    return "quarantined" if quarantined else "passed"
+
+
+def _write_report(name, rows, quarantined, failed, entries, report_dir):
+    report = {
+        "frame": name,
+        "generated_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "rows": int(rows),
+        "quarantined_rows": int(quarantined),
+        "status": _report_status(quarantined, failed),
+        "checks": entries,
+    }
+    report_dir.mkdir(parents=True, exist_ok=True)
+    report_path = report_dir / f"{name}_report.json"
+    report_path.write_text(json.dumps(report, indent=1, ensure_ascii=False), encoding="utf-8")
+    print(
+        f"[quality] frame={name} status={report['status']} rows={rows} quarantined={quarantined} "
+        f"failed_checks={len(failed)} report={report_path}"
+    )
+    if failed:
+        raise RuntimeError(
+            f"Quality gate failed for {name}: {', '.join(failed)} (see {report_path})."
+        )
+    return report_path
+
+
+def run_quality_gate(df, checks, name, key_columns=(), report_dir=None):
+    if not QUALITY_GATE_ENABLED or df.empty:
+        return df
+
+    report_dir = Path(report_dir) if report_dir is not None else QUALITY_REPORT_DIR
+    entries, quarantine, failed = _evaluate_gate(df, checks, key_columns)
+
+    report_dir.mkdir(parents=True, exist_ok=True)
+    quarantine_path = report_dir / f"{name}_quarantine.csv"
+    if quarantine.any():
+        df.loc[quarantine].to_csv(quarantine_path, index=False)
+    elif quarantine_path.exists():
+        quarantine_path.unlink()
+
+    _write_report(name, len(df), int(quarantine.sum()), failed, entries, report_dir)
+    if not quarantine.any():
+        return df
+    return df.loc[~quarantine].reset_index(drop=True)
+
+
+def run_partitioned_quality_gate(partitions, checks, name, key_columns=(), report_dir=None):
+    # Same gate over (key, frame) partitions, one at a time: checks must not
+    # span partitions (keys and groups include the partition columns). Yields
+    # the cleaned partitions, then writes one report for the whole frame and
+    # raises there if a "fail" check fired anywhere.
+    report_dir = Path(report_dir) if report_dir is not None else QUALITY_REPORT_DIR
+    report_dir.mkdir(parents=True, exist_ok=True)
+    quarantine_path = report_dir / f"{name}_quarantine.csv"
+    quarantine_path.unlink(missing_ok=True)
+
+    rows = 0
+    quarantined = 0
+    failed = []
+    merged = {}
+    for key, df in partitions:
+        if not QUALITY_GATE_ENABLED or df.empty:
+            yield key, df
+            continue
+        entries, quarantine, partition_failed = _evaluate_gate(df, checks, key_columns)
+        rows += len(df)
+        failed.extend(check for check in partition_failed if check not in failed)
+        for entry in entries:
+            total = merged.setdefault(entry["name"], {**entry, "failed_rows": 0, "sample": []})
+            total["failed_rows"] += entry["failed_rows"]
+            room = QUALITY_SAMPLE_SIZE - len(total["sample"])
+            total["sample"].extend(entry["sample"][:room])
+        if quarantine.any():
+            quarantined += int(quarantine.sum())
+            df.loc[quarantine].to_csv(
+                quarantine_path, mode="a", header=not quarantine_path.exists(), index=False
+            )
+            df = df.loc[~quarantine].reset_index(drop=True)
+        yield key, df
+
+    if QUALITY_GATE_ENABLED and rows:
+        entries = [merged[check["name"]] for check in checks if check["name"] in merged]
+        _write_report(name, rows, quarantined, failed, entries, report_dir)
+
+
+def validate_election_results(results_df, report_dir=None):
+    return run_quality_gate(
+        results_df, RESULT_CHECKS, "election_results", RESULT_KEY_COLUMNS, report_dir
+    )
+
+
+def validate_socio_indicator_values(values_df, report_dir=None):
+    return run_quality_gate(
+        values_df, INDICATOR_CHECKS, "socio_indicator_values", INDICATOR_KEY_COLUMNS, report_dir
+    )
+
+
+def validate_election_partitions(partitions, report_dir=None):
+    return run_partitioned_quality_gate(
+        partitions, RESULT_CHECKS, "election_results", RESULT_KEY_COLUMNS, report_dir
+    )
+
+
+def validate_socio_partitions(partitions, report_dir=None):
+    return run_partitioned_quality_gate(
+        partitions, INDICATOR_CHECKS, "socio_indicator_values", INDICATOR_KEY_COLUMNS, report_dir
+    )
@@ -1,18 +1,76 @@
 from __future__ import annotations
 
 import csv
-import hashlib
-import io
+import fnmatch
 import os
 import re
 import unicodedata
-import urllib.request
 import zipfile
-from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 import pandas as pd
 
-from .db import get_conn
+from . import checkpoints
+from .blocs import refresh_bloc_rollups
+from .cache import cached_download as _cached_download
+from .candidates import resolve_candidates
+from .db import (
+    advisory_xact_lock,
+    bump_load_version,
+    copy_frame,
+    ensure_schema,
+    get_conn,
+    get_pool,
+    pool_max_size,
+)
+from .frames import (
+    ELECTION_KEY_COLUMNS,
+    INDICATOR_DTYPES,
+    RESULT_DTYPES,
+    coerce_frame,
+    concat_frames,
+    empty_frame,
+    frame_from_records,
+    print_memory_report,
+)
+from .geo import DEPT_NAME_BY_CODE, dept_insee_code
+from .quality import (
+    INDICATOR_CHECKS,
+    QUALITY_GATE_ENABLED,
+    RESULT_CHECKS,
+    validate_election_partitions,
+    validate_election_results,
+    validate_socio_indicator_values,
+    validate_socio_partitions,
+)
+from .sources import prefetch as _prefetch_sources
+from .sources import (
+    ELECTION_PIPELINE,
+    PRESIDENTIAL_DATES_BY_YEAR,
+    SOURCE_WORKERS,
+    run_sources,
+    select_sources,
+)
+from .spatial import (
+    SPATIAL_LAGS_ENABLED,
+    has_neighbors,
+    refresh_election_lags,
+    refresh_indicator_lags,
+)
+from .spill import (
+    budget_workers,
+    close_spill,
+    open_spill,
+    out_of_core_enabled,
+    read_partition,
+    report_peak_rss,
+    spill_frame,
+    spill_partitions,
+    spill_summary,
+    write_partition,
+)
+from .stats import STATS_ENABLED, refresh_indicator_vote_stats
+from .xlsx_reader import read_sheet
 
 IDF_DEPARTMENTS = {
     "75": "Paris",
@@ -31,63 +89,6 @@ TARGET_DEPT_CODES = tuple(
     if code.strip()
 )
 
-ELECTION_DATE_BY_YEAR = {
-    1969: "1969-06-01",
-    1974: "1974-05-05",
-    1981: "1981-04-26",
-    1988: "1988-04-24",
-    1995: "1995-04-23",
-    2002: "2002-04-21",
-    2007: "2007-04-22",
-    2012: "2012-04-22",
-    2017: "2017-04-23",
-    2022: "2022-04-10",
-}
-
-FIRST_ROUND_XLSX_URL_BY_YEAR = {
-    1969: (
-        "https://static.data.gouv.fr/resources/election-presidentielle-1969-resultats-par-"
-        "departement/20220419-000314/france-politique.fr-presidentielle-1969.xlsx"
-    ),
-    1974: (
-        "https://static.data.gouv.fr/resources/election-presidentielle-1974-resultats-par-"
-        "departement/20160821-213008/France-politique.fr_Presidentielle_1974.xlsx"
-    ),
-    1981: (
-        "https://static.data.gouv.fr/resources/election-presidentielle-1981-resultats-par-"
-        "departement/20160821-213523/France-politique.fr_Presidentielle_1981.xlsx"
-    ),
-    1988: (
-        "https://static.data.gouv.fr/resources/election-presidentielle-1988-resultats-par-"
-        "departement/20160821-213723/France-politique.fr_Presidentielle_1988.xlsx"
-    ),
-    1995: (
-        "https://static.data.gouv.fr/resources/election-presidentielle-1995-resultats-par-"
-        "departement/20160821-213837/France-politique.fr_Presidentielle_1995.xlsx"
-    ),
-    2002: (
-        "https://static.data.gouv.fr/resources/election-presidentielle-2002-resultats-par-"
-        "departement/20160821-213930/France-politique.fr_Presidentielle_2002.xlsx"
-    ),
-    2007: (
-        "https://static.data.gouv.fr/resources/election-presidentielle-2007-resultats-par-"
-        "departement/20160821-214058/France-politique.fr_Presidentielle_2007.xlsx"
-    ),
-    2012: (
-        "https://static.data.gouv.fr/resources/election-presidentielle-2012-resultats-par-"
-        "departement/20160821-214241/France-politique.fr_Presidentielle_2012.xlsx"
-    ),
-    2022: (
-        "https://static.data.gouv.fr/resources/election-presidentielle-2012-resultats-par-"
-        "departement-1/20220414-215243/france-politique.fr-presidentielle-2022.xlsx"
-    ),
-}
-
-FIRST_ROUND_2017_BUREAU_TXT_URL = (
-    "https://static.data.gouv.fr/resources/election-presidentielle-des-23-avril-et-7-mai-"
-    "2017-resultats-definitifs-du-1er-tour-par-bureaux-de-vote/20170427-100955/PR17_BVot_T1_FE.txt"
-)
-
 ODD_DEP_ZIP_URL = "https://www.insee.fr/fr/statistiques/fichier/4505239/ODD_CSV.zip"
 ODD_DEP_FILENAME = "ODD_DEP.csv"
 SOCIO_SOURCE_LABEL = "INSEE - Indicateurs territoriaux de developpement durable (ODD_DEP)"
@@ -96,6 +97,25 @@ ALIGN_SOCIO_TO_ELECTION_YEARS = os.getenv("ALIGN_SOCIO_TO_ELECTION_YEARS", "true
     "true",
     "yes",
 }
+MEMORY_REPORT = os.getenv("ETL_MEMORY_REPORT", "false").lower() in {"1", "true", "yes"}
+# "specs" loads SOCIO_ECO_ODD_SPECS only; "catalog" loads every variable x
+# sous_champ pair of ODD_DEP, filtered by the allow/deny glob lists
+# (patterns match "variable" or "variable:sous_champ").
+SOCIO_CATALOG_MODE = os.getenv("SOCIO_CATALOG_MODE", "specs").lower()
+SOCIO_CATALOG_ALLOW = tuple(
+    p.strip() for p in os.getenv("SOCIO_CATALOG_ALLOW", "").split(",") if p.strip()
+)
+SOCIO_CATALOG_DENY = tuple(
+    p.strip() for p in os.getenv("SOCIO_CATALOG_DENY", "").split(",") if p.strip()
+)
+ODD_CHUNK_ROWS = int(os.getenv("ODD_CHUNK_ROWS", "20000"))
+LOAD_WORKERS = int(os.getenv("ETL_LOAD_WORKERS", "4"))
+SOCIO_PIPELINE = "socio_indicator_values"
+
+# Two-key advisory locks: (namespace, election_id) for per-election loads,
+# (namespace, 0) for the shared dimension setup.
+ELECTION_LOCK_NAMESPACE = 7301
+DIMENSION_LOCK_NAMESPACE = 7300
 
 SOCIO_ECO_ODD_SPECS = [
     {
@@ -135,8 +155,6 @@ SOCIO_ECO_ODD_SPECS = [
     },
 ]
 
-CACHE_DIR = Path("data/raw/data_gouv_cache")
-
 METADATA_COLUMNS_NORMALIZED = {
     "departement",
     "depnom",
@@ -167,18 +185,9 @@ def _normalize_text(value):
     return re.sub(r"[^a-z0-9]+", "", text)
 
 
-def _cached_download(url):
-    CACHE_DIR.mkdir(parents=True, exist_ok=True)
-    digest = hashlib.sha1(url.encode("utf-8")).hexdigest()[:12]
-    filename = url.rstrip("/").split("/")[-1]
-    local_path = CACHE_DIR / f"{digest}_{filename}"
-    if local_path.exists():
-        return local_path
-    urllib.request.urlretrieve(url, local_path)
-    return local_path
-
-
-DEPT_CODE_BY_NORMALIZED_NAME = {_normalize_text(name): code for code, name in IDF_DEPARTMENTS.items()}
+DEPT_CODE_BY_NORMALIZED_NAME = {
+    _normalize_text(name): code for code, name in DEPT_NAME_BY_CODE.items()
+}
 DEPT_CODE_BY_NORMALIZED_NAME.update(
     {
         _normalize_text("SEINE ET MARNE"): "77",
@@ -261,10 +270,60 @@ def _first_matching_column(columns, accepted_normalized_names):
     return None
 
 
-def _read_first_round_xlsx_by_department(year, url):
-    print(f"[extract] year={year} source=xlsx")
-    local_path = _cached_download(url)
-    df = pd.read_excel(local_path, sheet_name="Premier tour")
+def _plan_sheet_columns(header):
+    dept_code_col = _first_matching_column(header, {"depcode", "codedudepartement"})
+    dept_name_col = _first_matching_column(header, {"depnom", "departement", "libelledudepartement"})
+    count_cols = [
+        _first_matching_column(header, names)
+        for names in ({"inscrits", "ins"}, {"votants"}, {"exprimes", "exp"}, {"participation"})
+    ]
+
+    voix_columns = [col for col in header if col.upper().endswith("_VOIX")]
+    if voix_columns:
+        candidate_columns = voix_columns + [col for col in header if col.upper().endswith("_EXP")]
+    else:
+        # Older layouts only carry one percentage column per candidate.
+        candidate_columns = [
+            col
+            for col in header
+            if not col.startswith("Unnamed")
+            and _normalize_text(col) not in METADATA_COLUMNS_NORMALIZED
+        ]
+
+    columns = list(
+        dict.fromkeys(
+            col for col in [dept_code_col, dept_name_col, *count_cols, *candidate_columns] if col
+        )
+    )
+
+    def keep_row(record):
+        if dept_code_col:
+            return _normalize_dept_code(record[dept_code_col]) in TARGET_DEPT_CODES
+        if dept_name_col:
+            code = DEPT_CODE_BY_NORMALIZED_NAME.get(_normalize_text(record[dept_name_col]))
+            return code in TARGET_DEPT_CODES
+        return True
+
+    return columns, keep_row
+
+
+def _election_fields(source):
+    return {
+        "election_type": source["election_type"],
+        "election_date": source["election_date"],
+        "round": int(source["round"]),
+        "scope": source["scope"],
+        "year": int(source["election_date"][:4]),
+    }
+
+
+def _read_france_politique_xlsx(source, local_path):
+    options = source.get("options") or {}
+    sheet = options.get("sheet", "Premier tour")
+    year = int(source["election_date"][:4])
+    fields = _election_fields(source)
+    print(f"[extract] source={source['id']} format=xlsx sheet={sheet}")
+    df = read_sheet(local_path, sheet, _plan_sheet_columns)
     df.columns = [str(c).strip() for c in df.columns]
 
     dept_code_col = _first_matching_column(df.columns, {"depcode", "codedudepartement"})
@@ -283,11 +342,11 @@ def _read_first_round_xlsx_by_department(year, url):
         )
 
     if "dept_name" not in df.columns:
-        df["dept_name"] = df["dept_code"].map(IDF_DEPARTMENTS)
+        df["dept_name"] = df["dept_code"].map(DEPT_NAME_BY_CODE)
 
     df = df[df["dept_code"].isin(TARGET_DEPT_CODES)].copy()
     if df.empty:
-        return pd.DataFrame(columns=_result_columns())
+        return empty_frame(RESULT_DTYPES)
 
     registered_col = _first_matching_column(df.columns, {"inscrits", "ins"})
     votes_cast_col = _first_matching_column(df.columns, {"votants"})
@@ -299,7 +358,7 @@ def _read_first_round_xlsx_by_department(year, url):
     records = []
     for _, row in df.iterrows():
         dept_code = row["dept_code"]
-        dept_name = row.get("dept_name") or IDF_DEPARTMENTS.get(dept_code, dept_code)
+        dept_name = row.get("dept_name") or DEPT_NAME_BY_CODE.get(dept_code, dept_code)
 
         registered = _to_int(row.get(registered_col)) if registered_col else None
         votes_cast = _to_int(row.get(votes_cast_col)) if votes_cast_col else None
@@ -326,7 +385,7 @@ def _read_first_round_xlsx_by_department(year, url):
                     continue
                 records.append(
                     {
-                        "year": year,
+                        **fields,
                         "dept_code": dept_code,
                         "dept_name": dept_name,
                         "candidate_name": candidate_name,
@@ -358,7 +417,7 @@ def _read_first_round_xlsx_by_department(year, url):
 
             records.append(
                 {
-                    "year": year,
+                    **fields,
                     "dept_code": dept_code,
                     "dept_name": dept_name,
                     "candidate_name": candidate_name,
@@ -371,86 +430,133 @@ def _read_first_round_xlsx_by_department(year, url):
                 }
             )
 
-    result = pd.DataFrame.from_records(records)
-    if result.empty:
-        return pd.DataFrame(columns=_result_columns())
-    return result[_result_columns()]
+    return frame_from_records(records, RESULT_DTYPES)
 
 
-def _read_2017_first_round_from_bureau_txt(url):
-    print("[extract] year=2017 source=txt")
-    local_path = _cached_download(url)
-    content = local_path.read_text(encoding="latin-1", errors="replace")
+# Ministry of the Interior layout: a few fixed columns, then one block of
+# columns per candidate (panel number, sex, name, first name, votes, ...).
+# The same layout is used from bureau level up to department level; unit
+# totals are only counted once per (department, commune, bureau) present.
+INTERIOR_UNIT_COLUMNS = ("codedudepartement", "codedelacommune", "codedubvote")
 
-    reader = csv.reader(io.StringIO(content), delimiter=";")
-    header = next(reader, None)
-    if not header:
-        return pd.DataFrame(columns=_result_columns())
 
+def _interior_layout(source, header):
+    options = source.get("options") or {}
     normalized_header = [_normalize_text(h) for h in header]
     idx_by_name = {name: i for i, name in enumerate(normalized_header)}
 
+    block_start_name = options.get("block_start", "npanneau")
     required = [
         "codedudepartement",
         "libelledudepartement",
-        "codedelacommune",
-        "codedubvote",
         "inscrits",
         "votants",
         "exprimes",
-        "npanneau",
+        block_start_name,
     ]
     missing = [name for name in required if name not in idx_by_name]
     if missing:
-        raise RuntimeError(f"Unexpected 2017 TXT format, missing columns: {missing}")
+        raise RuntimeError(
+            f"Unexpected format for source {source['id']}, missing columns: {missing}"
+        )
 
-    candidate_start = idx_by_name["npanneau"]
-    chunk_size = 7
+    return {
+        "idx_by_name": idx_by_name,
+        "candidate_start": idx_by_name[block_start_name],
+        "chunk_size": int(options.get("block_size", 7)),
+        "name_offset": int(options.get("name_offset", 2)),
+        "votes_offset": int(options.get("votes_offset", 4)),
+        "unit_idx": [idx_by_name[name] for name in INTERIOR_UNIT_COLUMNS if name in idx_by_name],
+        # Raw label -> canonical name: a file repeats the same few labels on
+        # every row.
+        "names": {},
+    }
 
-    seen_bureaus = set()
-    totals_by_dept = {}
-    candidate_votes = {}
 
-    for row in reader:
-        if len(row) <= candidate_start:
-            continue
+def _interior_row(layout, row):
+    # One row of an Interior file: (dept_code, unit key, totals, candidate
+    # votes), or None for rows outside the target departments.
+    idx_by_name = layout["idx_by_name"]
+    candidate_start = layout["candidate_start"]
+    if len(row) <= candidate_start:
+        return None
+
+    dept_code = _normalize_dept_code(row[idx_by_name["codedudepartement"]])
+    if dept_code not in TARGET_DEPT_CODES:
+        return None
 
-        dept_code = _normalize_dept_code(row[idx_by_name["codedudepartement"]])
-        if dept_code not in TARGET_DEPT_CODES:
+    unit_key = (dept_code, *(row[i].strip() for i in layout["unit_idx"][1:]))
+    totals = (
+        _to_int(row[idx_by_name["inscrits"]]) or 0,
+        _to_int(row[idx_by_name["votants"]]) or 0,
+        _to_int(row[idx_by_name["exprimes"]]) or 0,
+    )
+
+    votes = {}
+    names = layout["names"]
+    name_offset = layout["name_offset"]
+    votes_offset = layout["votes_offset"]
+    last = max(name_offset, votes_offset)
+    for i in range(candidate_start, len(row), layout["chunk_size"]):
+        if i + last >= len(row):
+            break
+        if not row[i].strip():
             continue
+        label = row[i + name_offset]
+        candidate_name = names.get(label)
+        if candidate_name is None:
+            candidate_name = names[label] = _canonical_candidate_name(label.strip())
+        votes[candidate_name] = votes.get(candidate_name, 0) + (_to_int(row[i + votes_offset]) or 0)
+    return dept_code, unit_key, totals, votes
 
-        dept_name = row[idx_by_name["libelledudepartement"]].strip() or IDF_DEPARTMENTS.get(
-            dept_code, dept_code
-        )
-        commune_code = row[idx_by_name["codedelacommune"]].strip()
-        bureau_code = row[idx_by_name["codedubvote"]].strip()
-        bureau_key = (dept_code, commune_code, bureau_code)
-
-        if bureau_key not in seen_bureaus:
-            seen_bureaus.add(bureau_key)
-            registered = _to_int(row[idx_by_name["inscrits"]]) or 0
-            votes_cast = _to_int(row[idx_by_name["votants"]]) or 0
-            votes_valid = _to_int(row[idx_by_name["exprimes"]]) or 0
-
-            current = totals_by_dept.setdefault(
-                dept_code,
-                {"dept_name": dept_name, "registered": 0, "votes_cast": 0, "votes_valid": 0},
-            )
-            current["registered"] += registered
-            current["votes_cast"] += votes_cast
-            current["votes_valid"] += votes_valid
-
-        for i in range(candidate_start, len(row), chunk_size):
-            if i + 4 >= len(row):
-                break
-            panel = row[i].strip()
-            if not panel:
+
+def _read_interior_blocks(source, local_path):
+    options = source.get("options") or {}
+    fields = _election_fields(source)
+    print(f"[extract] source={source['id']} format={source['format']}")
+
+    seen_units = set()
+    totals_by_dept = {}
+    candidate_votes = {}
+
+    # Streamed line by line: only the per-department totals are kept, never
+    # the whole bureau file.
+    with local_path.open(
+        encoding=options.get("encoding", "latin-1"), errors="replace", newline=""
+    ) as handle:
+        reader = csv.reader(handle, delimiter=options.get("delimiter", ";"))
+        header = next(reader, None)
+        if not header:
+            return empty_frame(RESULT_DTYPES)
+
+        layout = _interior_layout(source, header)
+        dept_name_idx = layout["idx_by_name"]["libelledudepartement"]
+
+        for row in reader:
+            parsed = _interior_row(layout, row)
+            if parsed is None:
                 continue
-            last_name = row[i + 2].strip()
-            votes = _to_int(row[i + 4]) or 0
-            candidate_name = _canonical_candidate_name(last_name)
-            key = (dept_code, candidate_name)
-            candidate_votes[key] = candidate_votes.get(key, 0) + votes
+            dept_code, unit_key, (registered, votes_cast, votes_valid), votes = parsed
+
+            if unit_key not in seen_units:
+                seen_units.add(unit_key)
+                current = totals_by_dept.setdefault(
+                    dept_code,
+                    {
+                        "dept_name": row[dept_name_idx].strip()
+                        or DEPT_NAME_BY_CODE.get(dept_code, dept_code),
+                        "registered": 0,
+                        "votes_cast": 0,
+                        "votes_valid": 0,
+                    },
+                )
+                current["registered"] += registered
+                current["votes_cast"] += votes_cast
+                current["votes_valid"] += votes_valid
+
+            for candidate_name, candidate_count in votes.items():
+                key = (dept_code, candidate_name)
+                candidate_votes[key] = candidate_votes.get(key, 0) + candidate_count
 
     records = []
     for (dept_code, candidate_name), votes in candidate_votes.items():
@@ -468,9 +574,9 @@ def _read_2017_first_round_from_bureau_txt(url):
 
         records.append(
             {
-                "year": 2017,
+                **fields,
                 "dept_code": dept_code,
-                "dept_name": totals.get("dept_name", IDF_DEPARTMENTS.get(dept_code, dept_code)),
+                "dept_name": totals.get("dept_name", DEPT_NAME_BY_CODE.get(dept_code, dept_code)),
                 "candidate_name": candidate_name,
                 "registered": registered,
                 "votes_cast": votes_cast,
@@ -481,187 +587,259 @@ def _read_2017_first_round_from_bureau_txt(url):
             }
         )
 
-    result = pd.DataFrame.from_records(records)
-    if result.empty:
-        return pd.DataFrame(columns=_result_columns())
-    return result[_result_columns()]
-
-
-def _result_columns():
-    return [
-        "year",
-        "dept_code",
-        "dept_name",
-        "candidate_name",
-        "registered",
-        "votes_cast",
-        "votes_valid",
-        "votes",
-        "vote_share",
-        "turnout_rate",
-    ]
+    return frame_from_records(records, RESULT_DTYPES)
 
 
-def _collect_all_results():
-    all_records = []
-    for year, url in sorted(FIRST_ROUND_XLSX_URL_BY_YEAR.items()):
-        frame = _read_first_round_xlsx_by_department(year, url)
-        if not frame.empty:
-            all_records.extend(frame.to_dict(orient="records"))
+ELECTION_PARSERS = {
+    "france_politique_xlsx": _read_france_politique_xlsx,
+    "interior_blocks": _read_interior_blocks,
+}
 
-    frame_2017 = _read_2017_first_round_from_bureau_txt(FIRST_ROUND_2017_BUREAU_TXT_URL)
-    if not frame_2017.empty:
-        all_records.extend(frame_2017.to_dict(orient="records"))
 
-    if not all_records:
-        return pd.DataFrame(columns=_result_columns())
+def _parse_election_source(source, local_path):
+    return ELECTION_PARSERS[source["parser"]](source, local_path)
 
-    df = pd.DataFrame.from_records(all_records, columns=_result_columns())
+
+RESULT_GROUP_COLUMNS = [*ELECTION_KEY_COLUMNS, "year", "dept_code", "dept_name", "candidate_name"]
+
+
+def _reduce_results(df):
     if df.empty:
         return df
 
-    # Keep one row per year, department and candidate.
-    df = (
-        df.sort_values(["year", "dept_code", "candidate_name"])
-        .groupby(["year", "dept_code", "dept_name", "candidate_name"], as_index=False)
-        .agg(
-            registered=("registered", "max"),
-            votes_cast=("votes_cast", "max"),
-            votes_valid=("votes_valid", "max"),
-            votes=("votes", lambda s: s.sum(min_count=1)),
-            vote_share=("vote_share", "max"),
-            turnout_rate=("turnout_rate", "max"),
-        )
+    # Keep one row per election, department and candidate.
+    grouped = df.sort_values([*ELECTION_KEY_COLUMNS, "dept_code", "candidate_name"]).groupby(
+        RESULT_GROUP_COLUMNS, as_index=False, observed=True
     )
+    reduced = grouped.agg(
+        registered=("registered", "max"),
+        votes_cast=("votes_cast", "max"),
+        votes_valid=("votes_valid", "max"),
+        vote_share=("vote_share", "max"),
+        turnout_rate=("turnout_rate", "max"),
+    )
+    # Built-in sum instead of a Python callable per group.
+    reduced["votes"] = grouped["votes"].sum(min_count=1)["votes"].to_numpy()
 
     # If source includes votes+valid, recompute share from counts for consistency.
-    df["votes"] = pd.to_numeric(df["votes"], errors="coerce")
-    df["votes_valid"] = pd.to_numeric(df["votes_valid"], errors="coerce")
-    df["vote_share"] = pd.to_numeric(df["vote_share"], errors="coerce")
-    mask = df["votes"].notna() & df["votes_valid"].notna() & (df["votes_valid"] != 0)
-    df.loc[mask, "vote_share"] = (df.loc[mask, "votes"] / df.loc[mask, "votes_valid"]).round(6)
+    df = coerce_frame(reduced, RESULT_DTYPES)
+    mask = (df["votes"].notna() & df["votes_valid"].notna() & (df["votes_valid"] != 0)).to_numpy(
+        dtype=bool, na_value=False
+    )
+    share = df.loc[mask, "votes"].astype("float64") / df.loc[mask, "votes_valid"].astype("float64")
+    df.loc[mask, "vote_share"] = share.round(6).astype("float32")
+    return df
+
+
+def _collect_all_results():
+    sources = select_sources(parsers=ELECTION_PARSERS)
+    frames = run_sources(
+        sources,
+        _parse_election_source,
+        ",".join(TARGET_DEPT_CODES),
+        workers=budget_workers(SOURCE_WORKERS),
+    )
+
+    df = _reduce_results(concat_frames(frames, RESULT_DTYPES))
+    if MEMORY_REPORT and not df.empty:
+        print_memory_report(df, "election_results")
     return df
 
 
-def _read_odd_dep_dataframe():
+def _spill_all_results():
+    # Out-of-core variant: parsed frames go to disk as soon as they arrive,
+    # partitioned by year and department, and each partition is reduced on
+    # its own. The dedup key holds both columns, so the rows are the same.
+    sources = select_sources(parsers=ELECTION_PARSERS)
+    store = open_spill("election_results", ["year", "dept_code"], RESULT_DTYPES)
+    run_sources(
+        sources,
+        _parse_election_source,
+        ",".join(TARGET_DEPT_CODES),
+        workers=budget_workers(SOURCE_WORKERS),
+        consume=lambda frame: spill_frame(store, frame),
+    )
+    for key in spill_partitions(store):
+        write_partition(store, key, _reduce_results(read_partition(store, key)))
+    print(spill_summary(store))
+    return store
+
+
+SPEC_BY_ODD_PAIR = {
+    (spec["variable"], spec["sous_champ"] or ""): spec for spec in SOCIO_ECO_ODD_SPECS
+}
+ODD_SOURCE_PATTERN = re.compile(r"\(variable=([^,)]+)(?:,sous_champ=([^)]+))?\)")
+
+
+def _iter_odd_dep_chunks():
     print("[extract] source=insee_odd_dep")
     local_zip_path = _cached_download(ODD_DEP_ZIP_URL)
     with zipfile.ZipFile(local_zip_path) as archive:
         with archive.open(ODD_DEP_FILENAME) as csv_file:
-            df = pd.read_csv(csv_file, sep=";", encoding="latin-1", low_memory=False)
-    df["codgeo"] = df["codgeo"].map(_normalize_dept_code)
-    df = df[df["codgeo"].isin(TARGET_DEPT_CODES)].copy()
-    return df
-
-
-def _source_file_for_spec(spec):
-    suffix = f"variable={spec['variable']}"
-    if spec["sous_champ"] is not None:
-        suffix += f",sous_champ={spec['sous_champ']}"
+            for chunk in pd.read_csv(
+                csv_file, sep=";", encoding="latin-1", dtype=str, chunksize=ODD_CHUNK_ROWS
+            ):
+                codes = chunk["codgeo"].astype(str)
+                normalized = {code: _normalize_dept_code(code) for code in codes.unique()}
+                chunk["codgeo"] = codes.map(normalized)
+                chunk = chunk[chunk["codgeo"].isin(TARGET_DEPT_CODES)]
+                if not chunk.empty:
+                    yield chunk
+
+
+def _source_file_for_pair(variable, sous_champ):
+    suffix = f"variable={variable}"
+    if sous_champ:
+        suffix += f",sous_champ={sous_champ}"
     return f"{SOCIO_SOURCE_LABEL} ({suffix})"
 
 
-def _extract_socio_values_from_odd():
-    odd_dep_df = _read_odd_dep_dataframe()
-    if odd_dep_df.empty:
-        return pd.DataFrame(columns=["indicator_code", "insee_code", "year", "value", "source_file"])
+def _catalog_pair_selected(variable, sous_champ):
+    keys = [variable, f"{variable}:{sous_champ}"] if sous_champ else [variable]
+    if SOCIO_CATALOG_ALLOW and not any(
+        fnmatch.fnmatchcase(key, pattern) for key in keys for pattern in SOCIO_CATALOG_ALLOW
+    ):
+        return False
+    return not any(
+        fnmatch.fnmatchcase(key, pattern) for key in keys for pattern in SOCIO_CATALOG_DENY
+    )
+
 
-    year_columns = sorted(
-        [col for col in odd_dep_df.columns if re.fullmatch(r"A\d{4}", str(col))],
-        key=lambda col: int(col[1:]),
+def _catalog_indicator_code(variable, sous_champ):
+    spec = SPEC_BY_ODD_PAIR.get((variable, sous_champ))
+    if spec is not None:
+        return spec["indicator_code"]
+    code = "odd_" + re.sub(r"[^0-9a-z]+", "_", variable.lower()).strip("_")
+    if sous_champ:
+        code += "__" + re.sub(r"[^0-9a-z]+", "_", sous_champ.lower()).strip("_")
+    return code
+
+
+def _odd_indicator_code(variable, sous_champ):
+    if SOCIO_CATALOG_MODE == "catalog":
+        if not _catalog_pair_selected(variable, sous_champ):
+            return None
+        return _catalog_indicator_code(variable, sous_champ)
+    spec = SPEC_BY_ODD_PAIR.get((variable, sous_champ))
+    return spec["indicator_code"] if spec is not None else None
+
+
+def _to_float_series(series):
+    # Vectorised _to_float: same cleaning, unparsable cells become NaN.
+    text = (
+        series.astype("string")
+        .str.replace("\u00a0", "", regex=False)
+        .str.replace(" ", "", regex=False)
+        .str.replace(",", ".", regex=False)
+        .str.replace("%", "", regex=False)
     )
+    return pd.to_numeric(text, errors="coerce").astype("float64")
 
-    records = []
-    for spec in SOCIO_ECO_ODD_SPECS:
-        mask = odd_dep_df["variable"].astype(str) == spec["variable"]
-        if spec["sous_champ"] is None:
-            mask &= odd_dep_df["sous_champ"].isna()
-        else:
-            mask &= odd_dep_df["sous_champ"].fillna("").astype(str).str.strip() == spec["sous_champ"]
-
-        subset = odd_dep_df[mask].copy()
-        if subset.empty:
-            print(
-                f"[warn] no socio values found for {spec['indicator_code']} "
-                f"(variable={spec['variable']}, sous_champ={spec['sous_champ']})."
-            )
+
+def _iter_socio_value_frames():
+    # One long (indicator, department, year) frame per ODD_DEP chunk.
+    pair_codes = {}
+    for chunk in _iter_odd_dep_chunks():
+        year_columns = [col for col in chunk.columns if re.fullmatch(r"A\d{4}", str(col))]
+        chunk = chunk.assign(
+            variable=chunk["variable"].astype(str).str.strip(),
+            sous_champ=chunk["sous_champ"].fillna("").astype(str).str.strip(),
+        )
+
+        # Selection and naming are decided once per distinct pair, then
+        # broadcast to the rows with a merge.
+        pairs = chunk[["variable", "sous_champ"]].drop_duplicates()
+        for variable, sous_champ in pairs.itertuples(index=False):
+            if (variable, sous_champ) not in pair_codes:
+                pair_codes[(variable, sous_champ)] = _odd_indicator_code(variable, sous_champ)
+        selected = pd.DataFrame(
+            [
+                (variable, sous_champ, code, _source_file_for_pair(variable, sous_champ))
+                for (variable, sous_champ), code in pair_codes.items()
+                if code is not None
+            ],
+            columns=["variable", "sous_champ", "indicator_code", "source_file"],
+        )
+        chunk = chunk.merge(selected, on=["variable", "sous_champ"], how="inner")
+        if chunk.empty:
             continue
 
-        source_file = _source_file_for_spec(spec)
-        for row in subset.itertuples(index=False):
-            insee_code = f"{row.codgeo}000"
-            for year_col in year_columns:
-                raw_value = getattr(row, year_col)
-                value = _to_float(raw_value)
-                if value is None:
-                    continue
-                records.append(
-                    {
-                        "indicator_code": spec["indicator_code"],
-                        "insee_code": insee_code,
-                        "year": int(year_col[1:]),
-                        "value": value,
-                        "source_file": source_file,
-                    }
+        long_df = chunk.melt(
+            id_vars=["indicator_code", "codgeo", "source_file"],
+            value_vars=year_columns,
+            var_name="year",
+            value_name="value",
+        )
+        long_df["value"] = _to_float_series(long_df["value"])
+        long_df = long_df.dropna(subset=["value"])
+        long_df["year"] = long_df["year"].str[1:].astype("int16")
+        long_df["insee_code"] = long_df["codgeo"].map(
+            {code: dept_insee_code(code) for code in long_df["codgeo"].unique()}
+        )
+        yield coerce_frame(long_df[list(INDICATOR_DTYPES)], INDICATOR_DTYPES)
+
+    if SOCIO_CATALOG_MODE != "catalog":
+        for spec in SOCIO_ECO_ODD_SPECS:
+            if pair_codes.get((spec["variable"], spec["sous_champ"] or "")) is None:
+                print(
+                    f"[warn] no socio values found for {spec['indicator_code']} "
+                    f"(variable={spec['variable']}, sous_champ={spec['sous_champ']})."
                 )
 
-    values_df = pd.DataFrame.from_records(records)
-    if values_df.empty:
-        return pd.DataFrame(columns=["indicator_code", "insee_code", "year", "value", "source_file"])
 
-    values_df = (
+def _dedup_socio_values(values_df):
+    return (
         values_df.sort_values(["indicator_code", "insee_code", "year"])
         .drop_duplicates(subset=["indicator_code", "insee_code", "year"], keep="last")
         .reset_index(drop=True)
     )
-    return values_df
 
 
-def _align_socio_values_to_election_years(values_df):
+def _extract_socio_values_from_odd():
+    values_df = concat_frames(list(_iter_socio_value_frames()), INDICATOR_DTYPES)
     if values_df.empty:
         return values_df
 
-    target_years = sorted(ELECTION_DATE_BY_YEAR.keys())
-    aligned_records = []
-
-    for (indicator_code, insee_code), group in values_df.groupby(
-        ["indicator_code", "insee_code"], as_index=False
-    ):
-        series = group.sort_values("year").reset_index(drop=True)
-        known_years = series["year"].tolist()
-
-        for target_year in target_years:
-            exact = series[series["year"] == target_year]
-            if not exact.empty:
-                source = exact.iloc[-1]
-                aligned_records.append(
-                    {
-                        "indicator_code": indicator_code,
-                        "insee_code": insee_code,
-                        "year": int(target_year),
-                        "value": float(source["value"]),
-                        "source_file": source["source_file"],
-                    }
-                )
-                continue
+    values_df = _dedup_socio_values(values_df)
+    print(
+        f"[extract] odd_dep mode={SOCIO_CATALOG_MODE} "
+        f"indicators={values_df['indicator_code'].nunique()} rows={len(values_df)}"
+    )
+    return values_df
 
-            prior = [year for year in known_years if year <= target_year]
-            if not prior:
-                continue
-            source_year = max(prior)
 
-            source = series[series["year"] == source_year].iloc[-1]
-            aligned_records.append(
-                {
-                    "indicator_code": indicator_code,
-                    "insee_code": insee_code,
-                    "year": int(target_year),
-                    "value": float(source["value"]),
-                    "source_file": f"{source['source_file']} [aligned_from={int(source_year)}]",
-                }
-            )
+def _align_socio_values_to_election_years(values_df):
+    if values_df.empty:
+        return values_df
 
-    aligned_df = pd.DataFrame.from_records(aligned_records)
+    # For every election year, the latest known value at or before it (exact
+    # year first), in one as-of join instead of a loop per series.
+    keys = ["indicator_code", "insee_code"]
+    series = values_df[keys].astype(str).drop_duplicates()
+    targets = series.merge(
+        pd.DataFrame({"year": sorted(PRESIDENTIAL_DATES_BY_YEAR)}, dtype="int64"), how="cross"
+    ).sort_values("year")
+    known = values_df.assign(
+        indicator_code=values_df["indicator_code"].astype(str),
+        insee_code=values_df["insee_code"].astype(str),
+        source_year=values_df["year"].astype("int64"),
+    ).drop(columns="year")
+    aligned = pd.merge_asof(
+        targets,
+        known.sort_values("source_year"),
+        left_on="year",
+        right_on="source_year",
+        by=keys,
+        direction="backward",
+    ).dropna(subset=["source_year"])
+
+    shifted = aligned["source_year"] != aligned["year"]
+    source_file = aligned["source_file"].astype(str)
+    aligned["source_file"] = source_file.where(
+        ~shifted,
+        source_file + " [aligned_from=" + aligned["source_year"].astype("int64").astype(str) + "]",
+    )
+    aligned_df = coerce_frame(aligned[list(INDICATOR_DTYPES)], INDICATOR_DTYPES)
     return (
         aligned_df.sort_values(["indicator_code", "insee_code", "year"])
         .drop_duplicates(subset=["indicator_code", "insee_code", "year"], keep="last")
@@ -676,15 +854,27 @@ def _collect_socio_indicator_values():
 
     if ALIGN_SOCIO_TO_ELECTION_YEARS:
         values_df = _align_socio_values_to_election_years(values_df)
+    if MEMORY_REPORT:
+        print_memory_report(values_df, "socio_indicator_values")
     return values_df
 
 
-def _get_or_create_election(cur, year):
-    election_type = "presidentielle"
-    election_date = ELECTION_DATE_BY_YEAR[year]
-    round_no = 1
-    scope = "departement"
+def _spill_socio_indicator_values():
+    # Out-of-core variant, partitioned by department only: the alignment on
+    # election years needs every year of a series in the same partition.
+    store = open_spill("socio_indicator_values", ["insee_code"], INDICATOR_DTYPES)
+    for frame in _iter_socio_value_frames():
+        spill_frame(store, frame)
+    for key in spill_partitions(store):
+        values_df = _dedup_socio_values(read_partition(store, key))
+        if ALIGN_SOCIO_TO_ELECTION_YEARS:
+            values_df = _align_socio_values_to_election_years(values_df)
+        write_partition(store, key, values_df)
+    print(spill_summary(store))
+    return store
 
+
+def _get_or_create_election(cur, election_type, election_date, round_no, scope):
     cur.execute(
         """
         SELECT election_id
@@ -708,52 +898,53 @@ def _get_or_create_election(cur, year):
     return cur.fetchone()[0]
 
 
-def _get_or_create_candidate(cur, candidate_name):
+def _ensure_votes_nullable(cur):
     cur.execute(
         """
-        SELECT candidate_id
-        FROM candidate
-        WHERE candidate_name = %s
-          AND party_code IS NOT DISTINCT FROM %s
-        """,
-        (candidate_name, None),
-    )
-    row = cur.fetchone()
-    if row:
-        return row[0]
-
-    cur.execute(
+        SELECT is_nullable
+        FROM information_schema.columns
+        WHERE table_name = 'election_result' AND column_name = 'votes'
         """
-        INSERT INTO candidate (candidate_name, party_code)
-        VALUES (%s, %s)
-        RETURNING candidate_id
-        """,
-        (candidate_name, None),
     )
-    return cur.fetchone()[0]
+    row = cur.fetchone()
+    if row and row[0] == "NO":
+        cur.execute("ALTER TABLE election_result ALTER COLUMN votes DROP NOT NULL")
 
 
-def _ensure_votes_nullable(cur):
+def _ensure_dept_code_width(cur):
+    # Overseas departments have 3-character codes; older databases were
+    # created with char(2).
     cur.execute(
         """
-        SELECT is_nullable
+        SELECT character_maximum_length
         FROM information_schema.columns
-        WHERE table_name = 'election_result' AND column_name = 'votes'
+        WHERE table_name = 'geo_department' AND column_name = 'dept_code'
         """
     )
     row = cur.fetchone()
-    if row and row[0] == "NO":
-        cur.execute("ALTER TABLE election_result ALTER COLUMN votes DROP NOT NULL")
+    if not row or row[0] is None or row[0] >= 3:
+        return
+    cur.execute("ALTER TABLE geo_commune DROP CONSTRAINT IF EXISTS geo_commune_dept_code_fkey")
+    cur.execute("ALTER TABLE geo_department ALTER COLUMN dept_code TYPE varchar(3)")
+    cur.execute("ALTER TABLE geo_commune ALTER COLUMN dept_code TYPE varchar(3)")
+    cur.execute(
+        """
+        ALTER TABLE geo_commune
+        ADD CONSTRAINT geo_commune_dept_code_fkey
+        FOREIGN KEY (dept_code) REFERENCES geo_department (dept_code)
+        """
+    )
 
 
-def _ensure_idf_geo(cur):
+def _ensure_target_geo(cur):
+    _ensure_dept_code_width(cur)
     cur.executemany(
         """
         INSERT INTO geo_department (dept_code, dept_name)
         VALUES (%s, %s)
         ON CONFLICT (dept_code) DO NOTHING
         """,
-        [(code, name) for code, name in IDF_DEPARTMENTS.items() if code in TARGET_DEPT_CODES],
+        [(code, DEPT_NAME_BY_CODE[code]) for code in TARGET_DEPT_CODES if code in DEPT_NAME_BY_CODE],
     )
 
     cur.executemany(
@@ -765,14 +956,35 @@ def _ensure_idf_geo(cur):
             dept_code = EXCLUDED.dept_code
         """,
         [
-            (f"{code}000", f"{IDF_DEPARTMENTS[code]} (departement)", code)
+            (dept_insee_code(code), f"{DEPT_NAME_BY_CODE[code]} (departement)", code)
             for code in TARGET_DEPT_CODES
-            if code in IDF_DEPARTMENTS
+            if code in DEPT_NAME_BY_CODE
         ],
     )
 
 
-def _ensure_indicator_catalog(cur):
+def _catalog_entries(values_df):
+    # Indicators discovered in catalog mode are described by their ODD
+    # variable / sous_champ, recovered from source_file so the catalog can be
+    # registered in a different process than the one that extracted it.
+    spec_codes = {spec["indicator_code"] for spec in SOCIO_ECO_ODD_SPECS}
+    entries = {}
+    if values_df is None or values_df.empty:
+        return []
+    pairs = values_df[["indicator_code", "source_file"]].astype(str).drop_duplicates()
+    for code, source_file in pairs.itertuples(index=False):
+        if code in spec_codes or code in entries:
+            continue
+        match = ODD_SOURCE_PATTERN.search(source_file)
+        if match is None:
+            continue
+        variable, sous_champ = match.group(1), match.group(2)
+        name = f"{variable} ({sous_champ})" if sous_champ else variable
+        entries[code] = (code, name, None, SOCIO_SOURCE_LABEL)
+    return sorted(entries.values())
+
+
+def _ensure_indicator_catalog(cur, values_df=None):
     cur.executemany(
         """
         INSERT INTO indicator (indicator_code, indicator_name, unit, source)
@@ -787,7 +999,8 @@ def _ensure_indicator_catalog(cur):
                 SOCIO_SOURCE_LABEL,
             )
             for spec in SOCIO_ECO_ODD_SPECS
-        ],
+        ]
+        + _catalog_entries(values_df),
     )
 
     cur.execute(
@@ -804,23 +1017,28 @@ def _load_turnout_indicator_values(cur, results_df):
     cur.execute("SELECT indicator_id FROM indicator WHERE indicator_code = %s", ("turnout_rate",))
     row = cur.fetchone()
     if not row:
-        return
+        return []
     indicator_id = row[0]
 
+    # The turnout indicator follows presidential first rounds only; other
+    # elections of the same year would overwrite it.
+    first_rounds = results_df[
+        (results_df["election_type"] == "presidentielle") & (results_df["round"] == 1)
+    ]
     turnout_rows = (
-        results_df[["year", "dept_code", "turnout_rate"]]
+        first_rounds[["year", "dept_code", "turnout_rate"]]
         .dropna(subset=["turnout_rate"])
         .drop_duplicates(subset=["year", "dept_code"])
     )
     if turnout_rows.empty:
-        return
+        return []
 
     payload = [
         (
             indicator_id,
-            f"{r.dept_code}000",
+            dept_insee_code(r.dept_code),
             int(r.year),
-            float(r.turnout_rate),
+            round(float(r.turnout_rate), 6),
             "data.gouv - presidentielle premier tour",
         )
         for r in turnout_rows.itertuples(index=False)
@@ -836,64 +1054,189 @@ def _load_turnout_indicator_values(cur, results_df):
         """,
         payload,
     )
+    return sorted({(indicator_id, year) for indicator_id, _, year, _, _ in payload})
 
 
-def _load_socio_indicator_values(cur, values_df):
-    if values_df.empty:
-        print("[warn] no socio-economic values to load.")
-        return
+SOCIO_VALUE_COLUMNS = ["indicator_code", "insee_code", "year", "value", "source_file"]
 
-    indicator_codes = sorted(values_df["indicator_code"].dropna().unique().tolist())
+
+def _load_socio_indicator_values(cur, frames):
+    # Bulk path: COPY every frame (the whole set, or one partition at a time)
+    # into a temp table, then one set-based upsert joined to the catalog.
+    cur.execute("DROP TABLE IF EXISTS tmp_indicator_value")
     cur.execute(
         """
-        SELECT indicator_id, indicator_code
-        FROM indicator
-        WHERE indicator_code = ANY(%s)
-        """,
-        (indicator_codes,),
+        CREATE TEMP TABLE tmp_indicator_value (
+          indicator_code text, insee_code char(5), year integer, value numeric, source_file text
+        ) ON COMMIT DROP
+        """
     )
-    indicator_id_by_code = {code: indicator_id for indicator_id, code in cur.fetchall()}
-
-    payload = []
-    for row in values_df.itertuples(index=False):
-        indicator_id = indicator_id_by_code.get(row.indicator_code)
-        if indicator_id is None:
+    copied = 0
+    indicators = set()
+    departments = set()
+    for values_df in frames:
+        if values_df.empty:
             continue
-        payload.append(
-            (
-                indicator_id,
-                row.insee_code,
-                int(row.year),
-                float(row.value),
-                row.source_file,
-            )
-        )
-
-    if not payload:
-        print("[warn] socio-economic payload is empty after indicator lookup.")
-        return
+        copied += copy_frame(cur, "tmp_indicator_value", SOCIO_VALUE_COLUMNS, values_df)
+        indicators.update(values_df["indicator_code"].astype(str).unique())
+        departments.update(values_df["insee_code"].astype(str).unique())
+    if not copied:
+        print("[warn] no socio-economic values to load.")
+        return []
 
-    cur.executemany(
+    cur.execute(
         """
         INSERT INTO indicator_value (indicator_id, insee_code, year, value, source_file)
-        VALUES (%s, %s, %s, %s, %s)
+        SELECT i.indicator_id, t.insee_code, t.year, t.value, t.source_file
+        FROM tmp_indicator_value t
+        JOIN indicator i ON i.indicator_code = t.indicator_code
         ON CONFLICT (indicator_id, insee_code, year) DO UPDATE
         SET value = EXCLUDED.value,
             source_file = EXCLUDED.source_file
-        """,
-        payload,
+        """
     )
+    rows = cur.rowcount
+    if not rows:
+        print("[warn] socio-economic payload is empty after indicator lookup.")
+        return []
+
+    cur.execute(
+        """
+        SELECT DISTINCT i.indicator_id, t.year
+        FROM tmp_indicator_value t
+        JOIN indicator i ON i.indicator_code = t.indicator_code
+        """
+    )
+    loaded_series = sorted((int(i), int(y)) for i, y in cur.fetchall())
     print(
-        f"[load] socio indicators rows={len(payload)} "
-        f"indicators={values_df['indicator_code'].nunique()} "
-        f"departments={values_df['insee_code'].nunique()}"
+        f"[load] socio indicators rows={rows} "
+        f"indicators={len(indicators)} departments={len(departments)}"
     )
+    return loaded_series
+
+
+ELECTION_RESULT_COLUMNS = [
+    "election_id",
+    "insee_code",
+    "candidate_id",
+    "registered",
+    "votes_cast",
+    "votes_valid",
+    "votes",
+    "vote_share",
+]
 
 
-def _to_db_int(value):
-    if value is None or (isinstance(value, float) and pd.isna(value)):
-        return None
-    return int(value)
+def _election_result_payload(year_df, election_id, candidate_ids):
+    payload = pd.DataFrame(
+        {
+            "election_id": election_id,
+            "insee_code": year_df["dept_code"].astype(str).map(dept_insee_code),
+            "candidate_id": year_df["candidate_name"].astype(str).map(candidate_ids),
+            "registered": year_df["registered"],
+            "votes_cast": year_df["votes_cast"],
+            "votes_valid": year_df["votes_valid"],
+            "votes": year_df["votes"],
+            "vote_share": year_df["vote_share"].astype("float64").round(6),
+        }
+    )
+    return payload[ELECTION_RESULT_COLUMNS]
+
+
+def _election_keys(results_df):
+    keys = results_df[ELECTION_KEY_COLUMNS].drop_duplicates()
+    return sorted(
+        (str(election_type), str(election_date), int(round_no), str(scope))
+        for election_type, election_date, round_no, scope in keys.itertuples(index=False)
+    )
+
+
+def _prepare_election_dimensions(results_df):
+    # Elections and candidates are shared by every per-election load, so they
+    # are resolved once, serially, before the parallel phase starts.
+    ensure_schema()
+    conn = get_conn()
+    try:
+        with conn:
+            with conn.cursor() as cur:
+                advisory_xact_lock(cur, DIMENSION_LOCK_NAMESPACE, 0)
+                _ensure_votes_nullable(cur)
+                _ensure_target_geo(cur)
+                _ensure_indicator_catalog(cur)
+
+                election_ids = {
+                    key: _get_or_create_election(cur, *key) for key in _election_keys(results_df)
+                }
+                # Every (year, name) pair maps to a person: the same name can
+                # be two people in different years, and two spellings one.
+                names_by_year = results_df[["year", "candidate_name"]].drop_duplicates()
+                candidate_ids = resolve_candidates(
+                    cur,
+                    {
+                        (int(year), str(name))
+                        for year, name in names_by_year.itertuples(index=False)
+                    },
+                )
+    finally:
+        conn.close()
+    return election_ids, candidate_ids
+
+
+def _load_election(key, election_id, parts, candidate_ids):
+    # parts() yields the election's rows, whole or one partition at a time;
+    # it is called twice (fingerprint, then COPY) so nothing is kept between.
+    election_type, election_date, round_no, _ = key
+    year = int(election_date[:4])
+    target_insee = [dept_insee_code(code) for code in TARGET_DEPT_CODES]
+    names = {name: cid for (name_year, name), cid in candidate_ids.items() if name_year == year}
+    unit = f"load:{election_type}:{election_date}:t{round_no}:{key[3]}"
+    part_fingerprints = []
+    loaded_depts = set()
+    for election_df in parts():
+        payload = _election_result_payload(election_df, election_id, names)
+        part_fingerprints.append(checkpoints.frame_fingerprint(payload, target_insee))
+        loaded_depts.update(election_df["dept_code"].astype(str).unique())
+    unit_fingerprint = checkpoints.fingerprint(part_fingerprints)
+    departments = len(loaded_depts)
+    # Only departments with rows in this load are replaced: one left empty by
+    # the quality gate keeps its previous rows.
+    replaced_insee = [dept_insee_code(code) for code in sorted(loaded_depts)]
+
+    pool = get_pool()
+    conn = pool.getconn()
+    rows = None
+    try:
+        with conn:
+            with conn.cursor() as cur:
+                # Overlapping runs (a DAG retry, a manual run) queue up on the
+                # same election instead of interleaving DELETE and COPY.
+                advisory_xact_lock(cur, ELECTION_LOCK_NAMESPACE, election_id)
+                if checkpoints.loaded(cur, ELECTION_PIPELINE, unit, unit_fingerprint):
+                    print(f"[checkpoint] pipeline={ELECTION_PIPELINE} unit={unit} status=resumed")
+                    return unit_fingerprint
+                cur.execute(
+                    """
+                    DELETE FROM election_result
+                    WHERE election_id = %s AND insee_code = ANY(%s)
+                    """,
+                    (election_id, replaced_insee),
+                )
+                rows = 0
+                for election_df in parts():
+                    payload = _election_result_payload(election_df, election_id, names)
+                    rows += copy_frame(cur, "election_result", ELECTION_RESULT_COLUMNS, payload)
+                checkpoints.record_loaded(cur, ELECTION_PIPELINE, unit, unit_fingerprint, rows)
+                bump_load_version(
+                    cur, f"election_results:{election_type}:{election_date}:t{round_no}"
+                )
+    finally:
+        pool.putconn(conn)
+
+    print(
+        f"[load] election={election_type} date={election_date} round={round_no} rows={rows} "
+        f"departments={departments}"
+    )
+    return unit_fingerprint
 
 
 def _load_election_results(results_df):
@@ -901,85 +1244,242 @@ def _load_election_results(results_df):
         print("No election rows extracted from data.gouv.")
         return
 
+    parts_by_key = {}
+    for key, election_df in results_df.groupby(ELECTION_KEY_COLUMNS, observed=True):
+        key = (str(key[0]), str(key[1]), int(key[2]), str(key[3]))
+        parts_by_key[key] = lambda election_df=election_df: [election_df]
+    _load_elections(results_df, parts_by_key, results_df)
+
+
+def _load_elections(dimensions_df, parts_by_key, turnout_df):
+    # dimensions_df: election keys, years and candidate names; turnout_df:
+    # first-round turnout per department. Both are small next to the results,
+    # which each election reads through its parts_by_key entry.
+    election_ids, candidate_ids = _prepare_election_dimensions(dimensions_df)
+
+    # Each worker holds one pooled connection: more workers than DB_POOL_MAX
+    # would make getconn raise PoolError instead of waiting.
+    workers = max(1, min(LOAD_WORKERS, pool_max_size(), len(election_ids)))
+    errors = []
+    fingerprints = []
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {}
+        for key, parts in parts_by_key.items():
+            future = executor.submit(_load_election, key, election_ids[key], parts, candidate_ids)
+            futures[future] = key
+        for future in as_completed(futures):
+            try:
+                fingerprints.append(future.result())
+            except Exception as exc:
+                errors.append((futures[future], exc))
+
+    if errors:
+        failed = ", ".join(
+            f"{key[0]} {key[1]} t{key[2]} ({exc})"
+            for key, exc in sorted(errors, key=lambda e: e[0])
+        )
+        raise RuntimeError(f"Election load failed for: {failed}")
+
+    # Rollups, lags and correlations over every election of the run: redone
+    # as soon as one election was (re)loaded.
+    finalize_fingerprint = checkpoints.fingerprint(
+        sorted(fingerprints), SPATIAL_LAGS_ENABLED, STATS_ENABLED
+    )
     conn = get_conn()
     try:
         with conn:
             with conn.cursor() as cur:
-                _ensure_votes_nullable(cur)
-                _ensure_idf_geo(cur)
-                _ensure_indicator_catalog(cur)
+                if checkpoints.loaded(cur, ELECTION_PIPELINE, "finalize", finalize_fingerprint):
+                    print(f"[checkpoint] pipeline={ELECTION_PIPELINE} unit=finalize status=resumed")
+                    return
+                turnout_series = _load_turnout_indicator_values(cur, turnout_df)
+                refresh_bloc_rollups(cur, list(election_ids.values()))
+                # Only the elections and turnout years just loaded get their
+                # spatial lags recomputed; the neighbour graph is reused.
+                if SPATIAL_LAGS_ENABLED and has_neighbors(cur):
+                    refresh_election_lags(cur, list(election_ids.values()))
+                    refresh_indicator_lags(cur, turnout_series)
+                if STATS_ENABLED:
+                    refresh_indicator_vote_stats(cur, list(election_ids.values()))
+                checkpoints.record_loaded(cur, ELECTION_PIPELINE, "finalize", finalize_fingerprint)
+                bump_load_version(cur, "election_results")
+    finally:
+        conn.close()
 
-                candidate_cache = {}
-                target_insee = [f"{code}000" for code in TARGET_DEPT_CODES]
 
-                for year in sorted(results_df["year"].unique()):
-                    election_id = _get_or_create_election(cur, int(year))
+def prefetch_sources():
+    paths = _prefetch_sources(select_sources(parsers=ELECTION_PARSERS))
+    return paths + [_cached_download(ODD_DEP_ZIP_URL)]
 
-                    cur.execute(
-                        """
-                        DELETE FROM election_result
-                        WHERE election_id = %s AND insee_code = ANY(%s)
-                        """,
-                        (election_id, target_insee),
-                    )
 
-                    year_df = results_df[results_df["year"] == year]
-                    rows = []
-                    for record in year_df.itertuples(index=False):
-                        candidate_name = record.candidate_name
-                        if candidate_name not in candidate_cache:
-                            candidate_cache[candidate_name] = _get_or_create_candidate(
-                                cur, candidate_name
-                            )
-
-                        rows.append(
-                            (
-                                election_id,
-                                f"{record.dept_code}000",
-                                candidate_cache[candidate_name],
-                                _to_db_int(record.registered),
-                                _to_db_int(record.votes_cast),
-                                _to_db_int(record.votes_valid),
-                                _to_db_int(record.votes),
-                                None if pd.isna(record.vote_share) else float(record.vote_share),
-                            )
-                        )
-
-                    cur.executemany(
-                        """
-                        INSERT INTO election_result (
-                            election_id,
-                            insee_code,
-                            candidate_id,
-                            registered,
-                            votes_cast,
-                            votes_valid,
-                            votes,
-                            vote_share
-                        )
-                        VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-                        """,
-                        rows,
-                    )
+def load_election_results(results_df):
+    results_df = checkpoints.frame_unit(
+        ELECTION_PIPELINE,
+        "validate",
+        checkpoints.frame_fingerprint(results_df, QUALITY_GATE_ENABLED, RESULT_CHECKS),
+        lambda: validate_election_results(results_df),
+        RESULT_DTYPES,
+    )
+    _load_election_results(results_df)
+    return results_df
+
+
+def load_socio_indicator_values(values_df):
+    values_df = checkpoints.frame_unit(
+        SOCIO_PIPELINE,
+        "validate",
+        checkpoints.frame_fingerprint(values_df, QUALITY_GATE_ENABLED, INDICATOR_CHECKS),
+        lambda: validate_socio_indicator_values(values_df),
+        INDICATOR_DTYPES,
+    )
+    unit_fingerprint = checkpoints.frame_fingerprint(
+        values_df, sorted(TARGET_DEPT_CODES), SPATIAL_LAGS_ENABLED, STATS_ENABLED
+    )
+    _load_socio_unit(lambda: [values_df], values_df, unit_fingerprint, int(len(values_df)))
+    return values_df
 
-                    print(
-                        f"[load] year={int(year)} rows={len(rows)} departments="
-                        f"{year_df['dept_code'].nunique()}"
-                    )
 
-                _load_turnout_indicator_values(cur, results_df)
+def _load_socio_unit(parts, catalog_df, unit_fingerprint, rows):
+    # parts() yields the values to load, whole or one partition at a time;
+    # catalog_df only needs the distinct (indicator_code, source_file) pairs.
+    ensure_schema()
+    conn = get_conn()
+    try:
+        with conn:
+            with conn.cursor() as cur:
+                if checkpoints.loaded(cur, SOCIO_PIPELINE, "load", unit_fingerprint):
+                    print(f"[checkpoint] pipeline={SOCIO_PIPELINE} unit=load status=resumed")
+                    return
+                _ensure_target_geo(cur)
+                _ensure_indicator_catalog(cur, catalog_df)
+                loaded_series = _load_socio_indicator_values(cur, parts())
+                if SPATIAL_LAGS_ENABLED and has_neighbors(cur):
+                    refresh_indicator_lags(cur, loaded_series)
+                # Elections read the latest indicator year at or before their
+                # own, so only those from the earliest loaded year onward move.
+                if STATS_ENABLED and loaded_series:
+                    refresh_indicator_vote_stats(
+                        cur, min_year=min(year for _, year in loaded_series)
+                    )
+                checkpoints.record_loaded(cur, SOCIO_PIPELINE, "load", unit_fingerprint, rows)
+                bump_load_version(cur, "socio_indicator_values")
     finally:
         conn.close()
 
 
+TURNOUT_SUMMARY_COLUMNS = ["election_type", "round", "year", "dept_code", "turnout_rate"]
+
+
+def _validate_result_partitions(store):
+    # One pass over the partitions: quarantined rows are dropped in place,
+    # and the two small frames the loaders need whole are collected.
+    dimension_columns = [*ELECTION_KEY_COLUMNS, "year", "candidate_name"]
+    dimensions = []
+    turnout = []
+    partitions = ((key, read_partition(store, key)) for key in spill_partitions(store))
+    for key, results_df in validate_election_partitions(partitions):
+        write_partition(store, key, results_df)
+        dimensions.append(results_df[dimension_columns].drop_duplicates())
+        first_rounds = results_df[
+            (results_df["election_type"] == "presidentielle") & (results_df["round"] == 1)
+        ]
+        turnout.append(
+            first_rounds[TURNOUT_SUMMARY_COLUMNS]
+            .dropna(subset=["turnout_rate"])
+            .drop_duplicates(subset=["year", "dept_code"])
+        )
+    dimension_dtypes = {column: RESULT_DTYPES[column] for column in dimension_columns}
+    turnout_dtypes = {column: RESULT_DTYPES[column] for column in TURNOUT_SUMMARY_COLUMNS}
+    return concat_frames(dimensions, dimension_dtypes), concat_frames(turnout, turnout_dtypes)
+
+
+def _partition_parts(store, dimensions_df):
+    # Each election reads the partitions of its year, one at a time, and keeps
+    # its own rows.
+    partitions_by_year = {}
+    for key in spill_partitions(store):
+        partitions_by_year.setdefault(key[0], []).append(key)
+
+    def parts(key):
+        election_type, election_date, round_no, scope = key
+        year = str(int(election_date[:4]))
+        for partition in partitions_by_year.get(year, []):
+            results_df = read_partition(store, partition)
+            mask = (
+                (results_df["election_type"].astype(str) == election_type)
+                & (results_df["election_date"].astype(str) == election_date)
+                & (results_df["round"] == round_no)
+                & (results_df["scope"].astype(str) == scope)
+            )
+            if mask.any():
+                yield results_df[mask]
+
+    return {key: (lambda key=key: parts(key)) for key in _election_keys(dimensions_df)}
+
+
+def _run_partitioned_election_pipeline():
+    store = _spill_all_results()
+    try:
+        if not store["parts"]:
+            raise RuntimeError("No election data extracted. Check the adapters in sources.py.")
+        dimensions_df, turnout_df = _validate_result_partitions(store)
+        _load_elections(dimensions_df, _partition_parts(store, dimensions_df), turnout_df)
+    finally:
+        close_spill(store)
+    print(
+        f"[done] loaded {len(_election_keys(dimensions_df))} elections for years "
+        f"{', '.join(str(y) for y in sorted(dimensions_df['year'].unique()))} "
+        f"on target departments {', '.join(sorted(TARGET_DEPT_CODES))} (out-of-core)."
+    )
+    report_peak_rss("election_results")
+
+
+def _run_partitioned_socio_pipeline():
+    store = _spill_socio_indicator_values()
+    try:
+        catalog = []
+        part_fingerprints = []
+        rows = 0
+        years = set()
+        partitions = ((key, read_partition(store, key)) for key in spill_partitions(store))
+        for key, values_df in validate_socio_partitions(partitions):
+            write_partition(store, key, values_df)
+            catalog.append(values_df[["indicator_code", "source_file"]].drop_duplicates())
+            part_fingerprints.append(checkpoints.frame_fingerprint(values_df))
+            rows += len(values_df)
+            years.update(int(year) for year in values_df["year"].unique())
+        if not rows:
+            raise RuntimeError("No socio-economic values extracted from INSEE ODD dataset.")
+
+        unit_fingerprint = checkpoints.fingerprint(
+            part_fingerprints, sorted(TARGET_DEPT_CODES), SPATIAL_LAGS_ENABLED, STATS_ENABLED
+        )
+        catalog_df = pd.concat(catalog, ignore_index=True)
+        _load_socio_unit(
+            lambda: (read_partition(store, key) for key in spill_partitions(store)),
+            catalog_df,
+            unit_fingerprint,
+            rows,
+        )
+    finally:
+        close_spill(store)
+    print(
+        "[done] loaded socio-economic indicator values for years "
+        f"{min(years)}-{max(years)} (rows={rows}, out-of-core)."
+    )
+    report_peak_rss("socio_indicator_values")
+
+
 def run_election_pipeline():
+    if out_of_core_enabled():
+        return _run_partitioned_election_pipeline()
     results_df = _collect_all_results()
     if results_df.empty:
-        raise RuntimeError("No election data extracted. Check source URLs in run_etl.py.")
+        raise RuntimeError("No election data extracted. Check the adapters in sources.py.")
 
-    _load_election_results(results_df)
+    results_df = load_election_results(results_df)
     print(
-        "[done] loaded election results for years "
+        f"[done] loaded {len(_election_keys(results_df))} elections for years "
         f"{', '.join(str(y) for y in sorted(results_df['year'].unique()))} "
         f"on target departments {', '.join(sorted(TARGET_DEPT_CODES))}."
     )
@@ -993,21 +1493,42 @@ def collect_socio_indicator_values_dataframe():
     return _collect_socio_indicator_values()
 
 
+def _checkpointed_socio_indicator_values():
+    local_zip_path = _cached_download(ODD_DEP_ZIP_URL)
+    checkpoints.record(
+        SOCIO_PIPELINE,
+        "download:insee_odd_dep",
+        checkpoints.fingerprint(ODD_DEP_ZIP_URL),
+        url=ODD_DEP_ZIP_URL,
+        blob=local_zip_path.name,
+    )
+    parse_fingerprint = checkpoints.fingerprint(
+        local_zip_path.name,
+        SOCIO_ECO_ODD_SPECS,
+        SOCIO_CATALOG_MODE,
+        SOCIO_CATALOG_ALLOW,
+        SOCIO_CATALOG_DENY,
+        ALIGN_SOCIO_TO_ELECTION_YEARS,
+        sorted(PRESIDENTIAL_DATES_BY_YEAR),
+        sorted(TARGET_DEPT_CODES),
+    )
+    return checkpoints.frame_unit(
+        SOCIO_PIPELINE,
+        "parse:insee_odd_dep",
+        parse_fingerprint,
+        _collect_socio_indicator_values,
+        INDICATOR_DTYPES,
+    )
+
+
 def run_socio_economic_pipeline():
-    values_df = _collect_socio_indicator_values()
+    if out_of_core_enabled():
+        return _run_partitioned_socio_pipeline()
+    values_df = _checkpointed_socio_indicator_values()
     if values_df.empty:
         raise RuntimeError("No socio-economic values extracted from INSEE ODD dataset.")
 
-    conn = get_conn()
-    try:
-        with conn:
-            with conn.cursor() as cur:
-                _ensure_idf_geo(cur)
-                _ensure_indicator_catalog(cur)
-                _load_socio_indicator_values(cur, values_df)
-    finally:
-        conn.close()
-
+    values_df = load_socio_indicator_values(values_df)
     print(
         "[done] loaded socio-economic indicator values for years "
         f"{values_df['year'].min()}-{values_df['year'].max()} "
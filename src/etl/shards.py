@@ -0,0 +1,339 @@
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import pandas as pd
+
+from .frames import INDICATOR_DTYPES, RESULT_DTYPES, coerce_frame, concat_frames
+from .geo import ALL_DEPT_CODES, dept_codes_by_region
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+SHARDS_DIR = Path(os.getenv("SHARDS_DIR", "data/processed/shards"))
+SHARD_WORKERS = int(os.getenv("SHARD_WORKERS", str(max(1, (os.cpu_count() or 2) // 2))))
+SHARD_MEMORY_LIMIT_MB = int(os.getenv("SHARD_MEMORY_LIMIT_MB", "0"))
+POLL_SECONDS = 0.5
+
+# run_etl reads TARGET_DEPT_CODES once at import time, so every shard (and
+# the final merge) runs in its own interpreter with the variable set for it.
+# Nothing in this module imports run_etl at module level for that reason.
+
+
+def _run_dir(run_id):
+    return SHARDS_DIR / run_id
+
+
+def _shard_dir(run_id, shard_id):
+    return _run_dir(run_id) / f"shard-{shard_id:03d}"
+
+
+def plan_shards(dept_codes, shard_size=None):
+    dept_codes = sorted(set(dept_codes))
+    if shard_size:
+        return [dept_codes[i : i + shard_size] for i in range(0, len(dept_codes), shard_size)]
+    return list(dept_codes_by_region(dept_codes).values())
+
+
+def write_plan(run_id, shards):
+    run_dir = _run_dir(run_id)
+    run_dir.mkdir(parents=True, exist_ok=True)
+    plan = {
+        "run_id": run_id,
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "shards": [{"shard_id": i, "dept_codes": codes} for i, codes in enumerate(shards)],
+    }
+    (run_dir / "plan.json").write_text(json.dumps(plan, indent=1), encoding="utf-8")
+    return plan
+
+
+def read_plan(run_id):
+    path = _run_dir(run_id) / "plan.json"
+    if not path.exists():
+        raise RuntimeError(f"No shard plan for run {run_id} ({path}).")
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def shard_status(run_id, shard_id):
+    path = _shard_dir(run_id, shard_id) / "done.json"
+    if not path.exists():
+        return None
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def _worker_env(dept_codes, memory_limit_mb=0):
+    env = dict(os.environ)
+    env["TARGET_DEPT_CODES"] = ",".join(dept_codes)
+    env["PYTHONPATH"] = os.pathsep.join(
+        [str(PROJECT_ROOT)] + [p for p in env.get("PYTHONPATH", "").split(os.pathsep) if p]
+    )
+    # Shards are the parallel unit: each parses its sources one at a time and
+    # sizes its buffers on its share of the memory.
+    env["ETL_SOURCE_WORKERS"] = "1"
+    if memory_limit_mb:
+        env["ETL_MEMORY_BUDGET_MB"] = str(memory_limit_mb)
+    return env
+
+
+def _process_tree_rss_mb(pid):
+    # Resident memory of a worker and of every process under it, from /proc
+    # (Linux); None where /proc is not available.
+    proc = Path("/proc")
+    if not (proc / str(pid)).exists():
+        return None
+    children = {}
+    for entry in proc.iterdir():
+        if not entry.name.isdigit():
+            continue
+        try:
+            stat = (entry / "stat").read_text()
+        except OSError:
+            continue
+        ppid = int(stat.rsplit(")", 1)[1].split()[1])
+        children.setdefault(ppid, []).append(int(entry.name))
+
+    page_mb = os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    total = 0.0
+    stack = [pid]
+    while stack:
+        current = stack.pop()
+        stack.extend(children.get(current, []))
+        try:
+            total += int((proc / str(current) / "statm").read_text().split()[1]) * page_mb
+        except (OSError, IndexError, ValueError):
+            continue
+    return total
+
+
+def _kill_worker(process):
+    # Workers run in their own session: the whole group, parsing processes
+    # included, goes down with them.
+    try:
+        os.killpg(process.pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+    process.wait()
+
+
+def _spawn_worker(run_id, shard, memory_limit_mb):
+    shard_dir = _shard_dir(run_id, shard["shard_id"])
+    shard_dir.mkdir(parents=True, exist_ok=True)
+    (shard_dir / "done.json").unlink(missing_ok=True)
+    log_handle = open(shard_dir / "worker.log", "w", encoding="utf-8")
+    process = subprocess.Popen(
+        [sys.executable, "-m", "src.etl.shards", "worker", run_id, str(shard["shard_id"])],
+        cwd=Path.cwd(),
+        env=_worker_env(shard["dept_codes"], memory_limit_mb),
+        stdout=log_handle,
+        stderr=subprocess.STDOUT,
+        start_new_session=True,
+    )
+    return process, log_handle
+
+
+def run_shards(run_id, shard_ids=None, workers=None, memory_limit_mb=None):
+    plan = read_plan(run_id)
+    workers = workers or SHARD_WORKERS
+    memory_limit_mb = SHARD_MEMORY_LIMIT_MB if memory_limit_mb is None else memory_limit_mb
+
+    if shard_ids is None:
+        pending = [s for s in plan["shards"] if shard_status(run_id, s["shard_id"]) is None]
+    else:
+        pending = [s for s in plan["shards"] if s["shard_id"] in set(shard_ids)]
+
+    running = {}
+    failed = []
+    while pending or running:
+        while pending and len(running) < workers:
+            shard = pending.pop(0)
+            running[shard["shard_id"]] = _spawn_worker(run_id, shard, memory_limit_mb)
+            print(
+                f"[shard] run={run_id} shard={shard['shard_id']} "
+                f"depts={','.join(shard['dept_codes'])}"
+            )
+
+        time.sleep(POLL_SECONDS)
+        for shard_id, (process, log_handle) in list(running.items()):
+            code = process.poll()
+            if code is None and memory_limit_mb:
+                # The limit covers the shard as a whole: its worker and the
+                # parsing processes it starts.
+                rss = _process_tree_rss_mb(process.pid)
+                if rss is not None and rss > memory_limit_mb:
+                    print(
+                        f"[warn] shard={shard_id} rss_mb={rss:.0f} above "
+                        f"SHARD_MEMORY_LIMIT_MB={memory_limit_mb}, stopped"
+                    )
+                    _kill_worker(process)
+                    code = process.returncode
+            if code is None:
+                continue
+            log_handle.close()
+            del running[shard_id]
+            if code == 0 and shard_status(run_id, shard_id) is not None:
+                print(f"[shard] run={run_id} shard={shard_id} status=done")
+            else:
+                failed.append(shard_id)
+                print(
+                    f"[shard] run={run_id} shard={shard_id} status=failed exit={code} "
+                    f"log={_shard_dir(run_id, shard_id) / 'worker.log'}"
+                )
+    return sorted(failed)
+
+
+def run_shard_worker(run_id, shard_id):
+    plan = read_plan(run_id)
+    shard = plan["shards"][shard_id]
+    os.environ["TARGET_DEPT_CODES"] = ",".join(shard["dept_codes"])
+    from . import run_etl
+
+    if set(run_etl.TARGET_DEPT_CODES) != set(shard["dept_codes"]):
+        raise RuntimeError("run_etl was imported before the shard departments were set.")
+
+    started = time.perf_counter()
+    results_df = run_etl.collect_election_results_dataframe()
+    values_df = run_etl.collect_socio_indicator_values_dataframe()
+
+    shard_dir = _shard_dir(run_id, shard_id)
+    shard_dir.mkdir(parents=True, exist_ok=True)
+    results_df.to_parquet(shard_dir / "results.parquet", index=False)
+    values_df.to_parquet(shard_dir / "indicators.parquet", index=False)
+
+    status = {
+        "shard_id": shard_id,
+        "dept_codes": shard["dept_codes"],
+        "result_rows": int(len(results_df)),
+        "indicator_rows": int(len(values_df)),
+        "seconds": round(time.perf_counter() - started, 3),
+        "finished_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+    }
+    (shard_dir / "done.json").write_text(json.dumps(status, indent=1), encoding="utf-8")
+    print(f"[shard] shard={shard_id} results={len(results_df)} indicators={len(values_df)}")
+    return status
+
+
+def _read_shard_frames(run_id, plan, filename, dtypes):
+    frames = [
+        coerce_frame(pd.read_parquet(_shard_dir(run_id, shard["shard_id"]) / filename), dtypes)
+        for shard in plan["shards"]
+    ]
+    return concat_frames(frames, dtypes)
+
+
+def merge_shards(run_id):
+    plan = read_plan(run_id)
+    missing = [
+        s["shard_id"] for s in plan["shards"] if shard_status(run_id, s["shard_id"]) is None
+    ]
+    if missing:
+        raise RuntimeError(f"Cannot merge run {run_id}: shards not finished {missing}.")
+
+    dept_codes = sorted(code for shard in plan["shards"] for code in shard["dept_codes"])
+    os.environ["TARGET_DEPT_CODES"] = ",".join(dept_codes)
+    from . import run_etl
+
+    results_df = _read_shard_frames(run_id, plan, "results.parquet", RESULT_DTYPES)
+    values_df = _read_shard_frames(run_id, plan, "indicators.parquet", INDICATOR_DTYPES)
+
+    if results_df.empty:
+        raise RuntimeError(f"No election rows in shards of run {run_id}.")
+    run_etl.load_election_results(results_df)
+    if not values_df.empty:
+        run_etl.load_socio_indicator_values(values_df)
+    print(
+        f"[done] merged run={run_id} shards={len(plan['shards'])} "
+        f"departments={len(dept_codes)} results={len(results_df)} indicators={len(values_df)}"
+    )
+
+
+def _run_merge_process(run_id):
+    plan = read_plan(run_id)
+    dept_codes = sorted(code for shard in plan["shards"] for code in shard["dept_codes"])
+    completed = subprocess.run(
+        [sys.executable, "-m", "src.etl.shards", "merge", run_id],
+        cwd=Path.cwd(),
+        env=_worker_env(dept_codes),
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(f"Merge of run {run_id} failed (exit={completed.returncode}).")
+
+
+def run_sharded_pipeline(dept_codes=None, shard_size=None, workers=None, run_id=None):
+    if run_id is None or not (_run_dir(run_id) / "plan.json").exists():
+        run_id = run_id or datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S")
+        write_plan(run_id, plan_shards(dept_codes or ALL_DEPT_CODES, shard_size))
+
+    # Download once up front so workers only read the shared cache.
+    from . import run_etl
+
+    run_etl.prefetch_sources()
+
+    failed = run_shards(run_id, workers=workers)
+    if failed:
+        raise RuntimeError(
+            f"Shards {failed} of run {run_id} failed; rerun them with "
+            f"`python -m src.etl.shards run --run-id {run_id}`."
+        )
+    _run_merge_process(run_id)
+    return run_id
+
+
+def _parse_dept_codes(value):
+    if not value or value == "all":
+        return list(ALL_DEPT_CODES)
+    return [code.strip() for code in value.split(",") if code.strip()]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Execution ETL par shards de departements.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="planifie, execute les shards puis fusionne")
+    run_parser.add_argument("--departments", default="all")
+    run_parser.add_argument("--shard-size", type=int, default=None)
+    run_parser.add_argument("--workers", type=int, default=None)
+    run_parser.add_argument("--run-id", default=None)
+    run_parser.add_argument("--shard", type=int, action="append", dest="shards")
+
+    worker_parser = commands.add_parser("worker", help="extrait et transforme un shard")
+    worker_parser.add_argument("run_id")
+    worker_parser.add_argument("shard_id", type=int)
+
+    merge_parser = commands.add_parser("merge", help="fusionne et charge les shards termines")
+    merge_parser.add_argument("run_id")
+
+    status_parser = commands.add_parser("status", help="etat des shards d'un run")
+    status_parser.add_argument("run_id")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "worker":
+        run_shard_worker(args.run_id, args.shard_id)
+    elif args.command == "merge":
+        merge_shards(args.run_id)
+    elif args.command == "status":
+        for shard in read_plan(args.run_id)["shards"]:
+            status = shard_status(args.run_id, shard["shard_id"])
+            state = "done" if status else "pending"
+            print(f"shard={shard['shard_id']} state={state} depts={','.join(shard['dept_codes'])}")
+    elif args.shards:
+        if not args.run_id:
+            parser.error("--shard requires --run-id")
+        failed = run_shards(args.run_id, shard_ids=args.shards, workers=args.workers)
+        if failed:
+            return 1
+    else:
+        run_sharded_pipeline(
+            _parse_dept_codes(args.departments), args.shard_size, args.workers, args.run_id
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
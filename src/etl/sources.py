@@ -0,0 +1,284 @@
+from __future__ import annotations
+
+import fnmatch
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import pandas as pd
+
+from . import checkpoints
+from .cache import cached_download
+
+SOURCE_OUTPUT_DIR = Path(os.getenv("SOURCE_OUTPUT_DIR", "data/processed/sources"))
+SOURCE_OUTPUT_CACHE = os.getenv("SOURCE_OUTPUT_CACHE", "true").lower() in {"1", "true", "yes"}
+SOURCE_WORKERS = int(os.getenv("ETL_SOURCE_WORKERS", str(min(8, os.cpu_count() or 1))))
+# Extra adapters, as a JSON list of entries shaped like ELECTION_SOURCES.
+ELECTION_SOURCES_FILE = os.getenv("ELECTION_SOURCES_FILE", "")
+# Glob patterns on adapter ids, e.g. "presidentielle_*_t1,europeennes_*".
+# Only the first rounds are verified against the published totals, so the
+# second-round sheets are opt-in ("*" or "presidentielle_*_t2").
+DEFAULT_ELECTION_SOURCES = "presidentielle_*_t1"
+ELECTION_SOURCES_SELECT = tuple(
+    pattern.strip()
+    for pattern in os.getenv("ELECTION_SOURCES", DEFAULT_ELECTION_SOURCES).split(",")
+    if pattern.strip()
+)
+# Bumped whenever a parser changes its output, so cached outputs are rebuilt.
+PARSER_VERSION = 1
+# Checkpoint pipeline name of the download and parse units (checkpoints.py).
+ELECTION_PIPELINE = "election_results"
+
+ADAPTER_FIELDS = (
+    "id",
+    "election_type",
+    "round",
+    "election_date",
+    "scope",
+    "format",
+    "url",
+    "parser",
+)
+ELECTION_TYPES = {"presidentielle", "legislatives", "europeennes", "regionales", "municipales"}
+
+PRESIDENTIAL_DATES_BY_YEAR = {
+    1969: ("1969-06-01", "1969-06-15"),
+    1974: ("1974-05-05", "1974-05-19"),
+    1981: ("1981-04-26", "1981-05-10"),
+    1988: ("1988-04-24", "1988-05-08"),
+    1995: ("1995-04-23", "1995-05-07"),
+    2002: ("2002-04-21", "2002-05-05"),
+    2007: ("2007-04-22", "2007-05-06"),
+    2012: ("2012-04-22", "2012-05-06"),
+    2017: ("2017-04-23", "2017-05-07"),
+    2022: ("2022-04-10", "2022-04-24"),
+}
+
+# france-politique.fr workbooks: one sheet per round, one row per department.
+PRESIDENTIAL_XLSX_URL_BY_YEAR = {
+    1969: (
+        "https://static.data.gouv.fr/resources/election-presidentielle-1969-resultats-par-"
+        "departement/20220419-000314/france-politique.fr-presidentielle-1969.xlsx"
+    ),
+    1974: (
+        "https://static.data.gouv.fr/resources/election-presidentielle-1974-resultats-par-"
+        "departement/20160821-213008/France-politique.fr_Presidentielle_1974.xlsx"
+    ),
+    1981: (
+        "https://static.data.gouv.fr/resources/election-presidentielle-1981-resultats-par-"
+        "departement/20160821-213523/France-politique.fr_Presidentielle_1981.xlsx"
+    ),
+    1988: (
+        "https://static.data.gouv.fr/resources/election-presidentielle-1988-resultats-par-"
+        "departement/20160821-213723/France-politique.fr_Presidentielle_1988.xlsx"
+    ),
+    1995: (
+        "https://static.data.gouv.fr/resources/election-presidentielle-1995-resultats-par-"
+        "departement/20160821-213837/France-politique.fr_Presidentielle_1995.xlsx"
+    ),
+    2002: (
+        "https://static.data.gouv.fr/resources/election-presidentielle-2002-resultats-par-"
+        "departement/20160821-213930/France-politique.fr_Presidentielle_2002.xlsx"
+    ),
+    2007: (
+        "https://static.data.gouv.fr/resources/election-presidentielle-2007-resultats-par-"
+        "departement/20160821-214058/France-politique.fr_Presidentielle_2007.xlsx"
+    ),
+    2012: (
+        "https://static.data.gouv.fr/resources/election-presidentielle-2012-resultats-par-"
+        "departement/20160821-214241/France-politique.fr_Presidentielle_2012.xlsx"
+    ),
+    2022: (
+        "https://static.data.gouv.fr/resources/election-presidentielle-2012-resultats-par-"
+        "departement-1/20220414-215243/france-politique.fr-presidentielle-2022.xlsx"
+    ),
+}
+
+PRESIDENTIAL_2017_BUREAU_TXT_URL = (
+    "https://static.data.gouv.fr/resources/election-presidentielle-des-23-avril-et-7-mai-"
+    "2017-resultats-definitifs-du-1er-tour-par-bureaux-de-vote/20170427-100955/PR17_BVot_T1_FE.txt"
+)
+
+
+# Only presidential adapters ship. Second rounds read the "Second tour" sheet
+# of the same workbooks and are not verified yet; legislative and European
+# elections have no verified file URL and are left to ELECTION_SOURCES_FILE.
+def _presidential_sources():
+    sources = []
+    for year, url in sorted(PRESIDENTIAL_XLSX_URL_BY_YEAR.items()):
+        for round_no, sheet in ((1, "Premier tour"), (2, "Second tour")):
+            sources.append(
+                {
+                    "id": f"presidentielle_{year}_t{round_no}",
+                    "election_type": "presidentielle",
+                    "round": round_no,
+                    "election_date": PRESIDENTIAL_DATES_BY_YEAR[year][round_no - 1],
+                    "scope": "departement",
+                    "format": "xlsx",
+                    "url": url,
+                    "parser": "france_politique_xlsx",
+                    "options": {"sheet": sheet},
+                }
+            )
+    sources.append(
+        {
+            "id": "presidentielle_2017_t1",
+            "election_type": "presidentielle",
+            "round": 1,
+            "election_date": PRESIDENTIAL_DATES_BY_YEAR[2017][0],
+            "scope": "departement",
+            "format": "txt",
+            "url": PRESIDENTIAL_2017_BUREAU_TXT_URL,
+            "parser": "interior_blocks",
+            "options": {"encoding": "latin-1", "delimiter": ";", "name_offset": 2},
+        }
+    )
+    return sorted(sources, key=lambda source: (source["election_date"], source["id"]))
+
+
+ELECTION_SOURCES = _presidential_sources()
+
+
+def validate_source(source, parsers=None):
+    missing = [field for field in ADAPTER_FIELDS if source.get(field) in (None, "")]
+    if missing:
+        raise RuntimeError(f"Source adapter {source.get('id')!r} is missing {missing}.")
+    if source["election_type"] not in ELECTION_TYPES:
+        raise RuntimeError(
+            f"Source adapter {source['id']!r} has unknown election_type "
+            f"{source['election_type']!r}."
+        )
+    if parsers is not None and source["parser"] not in parsers:
+        raise RuntimeError(
+            f"Source adapter {source['id']!r} uses unknown parser {source['parser']!r}."
+        )
+    return source
+
+
+def load_sources(path=None):
+    sources = {source["id"]: source for source in ELECTION_SOURCES}
+    path = path or ELECTION_SOURCES_FILE
+    if path:
+        # File entries add adapters or replace built-in ones with the same id.
+        for source in json.loads(Path(path).read_text(encoding="utf-8")):
+            sources[source["id"]] = dict(source, options=source.get("options") or {})
+    return list(sources.values())
+
+
+def select_sources(patterns=None, parsers=None, path=None):
+    patterns = patterns or ELECTION_SOURCES_SELECT
+    selected = [
+        validate_source(source, parsers)
+        for source in load_sources(path)
+        if any(fnmatch.fnmatch(source["id"], pattern) for pattern in patterns)
+    ]
+    if not selected:
+        raise RuntimeError(f"No election source matches {', '.join(patterns)}.")
+    return selected
+
+
+def _output_key(source, local_path, context):
+    stat = local_path.stat()
+    payload = json.dumps(
+        {
+            "source": source,
+            # Raw files are content addressed: the name carries their SHA-256.
+            "raw": [local_path.name, stat.st_size],
+            "context": context,
+            "parser_version": PARSER_VERSION,
+        },
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _output_path(source, key):
+    return SOURCE_OUTPUT_DIR / f"{source['id']}-{key[:12]}.parquet"
+
+
+def run_source(source, parse, context=""):
+    started = time.perf_counter()
+    local_path = cached_download(source["url"], source.get("filename"), source.get("sha256"))
+    checkpoints.record(
+        ELECTION_PIPELINE,
+        f"download:{source['id']}",
+        checkpoints.fingerprint(source["url"], source.get("sha256")),
+        url=source["url"],
+        blob=local_path.name,
+    )
+    key = _output_key(source, local_path, context)
+    output_path = _output_path(source, key)
+    if SOURCE_OUTPUT_CACHE and output_path.exists():
+        frame = pd.read_parquet(output_path)
+        status = "cached"
+    else:
+        frame = parse(source, local_path)
+        if SOURCE_OUTPUT_CACHE:
+            SOURCE_OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+            tmp_path = output_path.with_name(f"{output_path.name}.{os.getpid()}.part")
+            frame.to_parquet(tmp_path, index=False)
+            os.replace(tmp_path, output_path)
+        status = "parsed"
+    # The output key already covers the raw file, the adapter and the
+    # departments: the cached Parquet is the unit's checkpoint.
+    checkpoints.record(
+        ELECTION_PIPELINE,
+        f"parse:{source['id']}",
+        key,
+        rows=int(len(frame)),
+        output=output_path if SOURCE_OUTPUT_CACHE else None,
+    )
+    print(
+        f"[source] id={source['id']} status={status} rows={len(frame)} "
+        f"seconds={time.perf_counter() - started:.2f}"
+    )
+    return frame
+
+
+def run_sources(sources, parse, context="", workers=None, consume=None):
+    # Each adapter downloads, parses and caches on its own; parsing is CPU
+    # bound (XLSX, bureau files), so adapters run in separate processes.
+    # With consume, every frame is handed over as soon as it is parsed and
+    # not kept: at most one frame per worker is held at a time.
+    workers = max(1, min(workers or SOURCE_WORKERS, len(sources)))
+    if workers == 1:
+        frames = []
+        for source in sources:
+            frame = run_source(source, parse, context)
+            if consume is None:
+                frames.append(frame)
+            else:
+                consume(frame)
+        return frames
+
+    frames = {}
+    errors = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(run_source, source, parse, context): source["id"] for source in sources
+        }
+        for future in as_completed(futures):
+            try:
+                frame = future.result()
+            except Exception as exc:
+                errors.append((futures[future], exc))
+                continue
+            if consume is None:
+                frames[futures[future]] = frame
+            else:
+                consume(frame)
+
+    if errors:
+        failed = ", ".join(f"{source_id} ({exc})" for source_id, exc in sorted(errors))
+        raise RuntimeError(f"Election sources failed: {failed}")
+    return [frames[source["id"]] for source in sources if source["id"] in frames]
+
+
+def prefetch(sources):
+    return [
+        cached_download(source["url"], source.get("filename"), source.get("sha256"))
+        for source in sources
+    ]
@@ -0,0 +1,399 @@
+from __future__ import annotations
+
+import json
+import os
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from scipy.spatial import cKDTree
+
+from . import checkpoints
+from .cache import cached_download
+from .db import copy_frame, ensure_schema, get_conn
+from .geo import dept_insee_code
+
+COMMUNES_API_URL = (
+    "https://geo.api.gouv.fr/departements/{dept_code}/communes"
+    "?fields=nom,code,codeDepartement,population,surface,centre&format=json"
+)
+EARTH_RADIUS_KM = 6371.0088
+SPATIAL_NEIGHBORS_K = int(os.getenv("SPATIAL_NEIGHBORS_K", "8"))
+SPATIAL_RADIUS_KM = float(os.getenv("SPATIAL_RADIUS_KM", "0")) or None
+SPATIAL_LAGS_ENABLED = os.getenv("SPATIAL_LAGS", "true").lower() in {"1", "true", "yes"}
+# Indicator/year series lagged per sparse product: the dense block is
+# geographies x batch, whatever the size of the indicator catalog.
+SPATIAL_LAG_BATCH = max(1, int(os.getenv("SPATIAL_LAG_BATCH_SERIES", "16")))
+# Distances are floored so that co-located centroids do not get infinite
+# inverse-distance weights.
+MIN_DISTANCE_KM = 0.5
+NEIGHBOR_COLUMNS = ["insee_code", "neighbor_code", "rank", "distance_km", "weight"]
+
+def _read_communes_api(dept_code):
+    local_path = cached_download(
+        COMMUNES_API_URL.format(dept_code=dept_code), filename=f"communes_{dept_code}.json"
+    )
+    records = []
+    for item in json.loads(local_path.read_text(encoding="utf-8")):
+        centre = (item.get("centre") or {}).get("coordinates") or [None, None]
+        records.append(
+            {
+                "insee_code": item["code"],
+                "commune_name": item["nom"],
+                "dept_code": item.get("codeDepartement") or dept_code,
+                "population": item.get("population"),
+                "area_km2": None if item.get("surface") is None else item["surface"] / 100.0,
+                "longitude": centre[0],
+                "latitude": centre[1],
+            }
+        )
+    return pd.DataFrame.from_records(records)
+
+
+def fill_commune_coordinates(cur, dept_codes):
+    frames = [_read_communes_api(code) for code in dept_codes]
+    communes = pd.concat([f for f in frames if not f.empty], ignore_index=True)
+    if communes.empty:
+        return 0
+
+    cur.execute(
+        """
+        CREATE TEMP TABLE tmp_commune_geo (
+          insee_code char(5), commune_name text, dept_code varchar(3),
+          population integer, area_km2 numeric, latitude numeric, longitude numeric
+        ) ON COMMIT DROP
+        """
+    )
+    columns = [
+        "insee_code",
+        "commune_name",
+        "dept_code",
+        "population",
+        "area_km2",
+        "latitude",
+        "longitude",
+    ]
+    communes["population"] = communes["population"].astype("Int64")
+    copy_frame(cur, "tmp_commune_geo", columns, communes)
+    cur.execute(
+        """
+        INSERT INTO geo_commune (insee_code, commune_name, dept_code, population, area_km2,
+                                 latitude, longitude)
+        SELECT insee_code, commune_name, dept_code, population, area_km2, latitude, longitude
+        FROM tmp_commune_geo
+        ON CONFLICT (insee_code) DO UPDATE
+        SET commune_name = EXCLUDED.commune_name,
+            population = EXCLUDED.population,
+            area_km2 = EXCLUDED.area_km2,
+            latitude = EXCLUDED.latitude,
+            longitude = EXCLUDED.longitude
+        """
+    )
+
+    # Department-level rows get the population-weighted centroid of their
+    # communes, so the current departmental facts have coordinates too.
+    communes["weight"] = communes["population"].fillna(0).astype("float64").clip(lower=1)
+    communes["wlat"] = communes["latitude"] * communes["weight"]
+    communes["wlon"] = communes["longitude"] * communes["weight"]
+    totals = communes.groupby("dept_code").agg(
+        population=("population", "sum"),
+        area_km2=("area_km2", "sum"),
+        weight=("weight", "sum"),
+        wlat=("wlat", "sum"),
+        wlon=("wlon", "sum"),
+    )
+    cur.executemany(
+        """
+        UPDATE geo_commune
+        SET population = %s, area_km2 = %s, latitude = %s, longitude = %s
+        WHERE insee_code = %s
+        """,
+        [
+            (
+                int(row.population),
+                round(float(row.area_km2), 3),
+                round(row.wlat / row.weight, 6),
+                round(row.wlon / row.weight, 6),
+                dept_insee_code(code),
+            )
+            for code, row in totals.iterrows()
+        ],
+    )
+    print(f"[spatial] communes={len(communes)} departments={len(totals)}")
+    return len(communes)
+
+
+def _unit_vectors(latitude, longitude):
+    lat = np.radians(np.asarray(latitude, dtype="float64"))
+    lon = np.radians(np.asarray(longitude, dtype="float64"))
+    return np.column_stack([np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)])
+
+
+def _chord_to_km(chord):
+    return 2.0 * EARTH_RADIUS_KM * np.arcsin(np.clip(chord / 2.0, 0.0, 1.0))
+
+
+def _km_to_chord(km):
+    return 2.0 * np.sin(km / (2.0 * EARTH_RADIUS_KM))
+
+
+def build_neighbor_index(latitude, longitude):
+    # A k-d tree over unit-sphere coordinates: chord distance is monotonic in
+    # great-circle distance, so k-NN and radius queries stay exact.
+    return cKDTree(_unit_vectors(latitude, longitude))
+
+
+def knn_edges(tree, k):
+    n = tree.n
+    k = min(k, n - 1)
+    if k <= 0:
+        return np.empty(0, int), np.empty(0, int), np.empty(0), np.empty(0, int)
+    chords, indexes = tree.query(tree.data, k=k + 1)
+    # Column 0 is the point itself.
+    sources = np.repeat(np.arange(n), k)
+    targets = indexes[:, 1:].ravel()
+    ranks = np.tile(np.arange(1, k + 1), n)
+    return sources, targets, _chord_to_km(chords[:, 1:].ravel()), ranks
+
+
+def radius_edges(tree, radius_km, max_neighbors=None):
+    pairs = tree.query_pairs(_km_to_chord(radius_km), output_type="ndarray")
+    if len(pairs) == 0:
+        return np.empty(0, int), np.empty(0, int), np.empty(0), np.empty(0, int)
+    sources = np.concatenate([pairs[:, 0], pairs[:, 1]])
+    targets = np.concatenate([pairs[:, 1], pairs[:, 0]])
+    chords = np.linalg.norm(tree.data[sources] - tree.data[targets], axis=1)
+    distances = _chord_to_km(chords)
+    order = np.lexsort((distances, sources))
+    sources, targets, distances = sources[order], targets[order], distances[order]
+    starts = np.searchsorted(sources, sources, side="left")
+    ranks = np.arange(len(sources)) - starts + 1
+    if max_neighbors:
+        keep = ranks <= max_neighbors
+        sources, targets = sources[keep], targets[keep]
+        distances, ranks = distances[keep], ranks[keep]
+    return sources, targets, distances, ranks
+
+
+def neighbor_table(points, k=None, radius_km=None):
+    k = k or SPATIAL_NEIGHBORS_K
+    radius_km = radius_km if radius_km is not None else SPATIAL_RADIUS_KM
+    frames = []
+    # Departments and communes are never neighbours of each other.
+    for _, level in points.groupby("level", sort=False):
+        if len(level) < 2:
+            continue
+        tree = build_neighbor_index(level["latitude"], level["longitude"])
+        if radius_km:
+            sources, targets, distances, ranks = radius_edges(tree, radius_km, k)
+        else:
+            sources, targets, distances, ranks = knn_edges(tree, k)
+        codes = level["insee_code"].to_numpy()
+        inverse = 1.0 / np.maximum(distances, MIN_DISTANCE_KM)
+        totals = np.bincount(sources, weights=inverse, minlength=len(level))
+        frames.append(
+            pd.DataFrame(
+                {
+                    "insee_code": codes[sources],
+                    "neighbor_code": codes[targets],
+                    "rank": ranks.astype("int16"),
+                    "distance_km": distances.round(3),
+                    "weight": (inverse / totals[sources]).round(6),
+                }
+            )
+        )
+    if not frames:
+        return pd.DataFrame(columns=NEIGHBOR_COLUMNS)
+    return pd.concat(frames, ignore_index=True)
+
+
+def _read_points(cur):
+    cur.execute(
+        """
+        SELECT insee_code::text, dept_code::text, latitude::float8, longitude::float8
+        FROM geo_commune
+        WHERE latitude IS NOT NULL AND longitude IS NOT NULL
+        """
+    )
+    points = pd.DataFrame(
+        cur.fetchall(), columns=["insee_code", "dept_code", "latitude", "longitude"]
+    )
+    is_department = points["insee_code"] == points["dept_code"].map(dept_insee_code)
+    points["level"] = np.where(is_department, "departement", "commune")
+    return points
+
+
+def rebuild_neighbors(cur, k=None, radius_km=None):
+    edges = neighbor_table(_read_points(cur), k, radius_km)
+    cur.execute("DELETE FROM geo_neighbor")
+    copy_frame(cur, "geo_neighbor", NEIGHBOR_COLUMNS, edges)
+    print(f"[spatial] neighbor edges={len(edges)}")
+    return len(edges)
+
+
+def _read_weights(cur):
+    cur.execute("SELECT insee_code::text, neighbor_code::text, weight::float8 FROM geo_neighbor")
+    edges = pd.DataFrame(cur.fetchall(), columns=["insee_code", "neighbor_code", "weight"])
+    codes = pd.Index(sorted(set(edges["insee_code"]) | set(edges["neighbor_code"])))
+    matrix = sparse.csr_matrix(
+        (
+            edges["weight"].to_numpy(),
+            (codes.get_indexer(edges["insee_code"]), codes.get_indexer(edges["neighbor_code"])),
+        ),
+        shape=(len(codes), len(codes)),
+    )
+    return codes, matrix
+
+
+def spatial_lag(weights, codes, frame, key_columns, value_column):
+    # One sparse product per batch: rows are geographies, columns are the
+    # series (candidates, or indicator/year pairs). Missing neighbours are
+    # dropped and the remaining weights renormalised.
+    wide = frame.pivot_table(
+        index="insee_code", columns=key_columns, values=value_column, aggfunc="first"
+    ).reindex(codes)
+    values = wide.to_numpy(dtype="float64")
+    present = ~np.isnan(values)
+    numerator = weights @ np.where(present, values, 0.0)
+    denominator = weights @ present.astype("float64")
+    counts = (weights > 0).astype("float64") @ present.astype("float64")
+    with np.errstate(invalid="ignore", divide="ignore"):
+        lagged = numerator / denominator
+
+    n_rows, n_cols = lagged.shape
+    series = wide.columns.to_frame(index=False).iloc[np.tile(np.arange(n_cols), n_rows)]
+    out = series.reset_index(drop=True)
+    out.columns = key_columns
+    out.insert(0, "insee_code", np.repeat(codes.to_numpy(), n_cols))
+    out["lag"] = lagged.ravel()
+    out["neighbor_count"] = counts.ravel().astype("int16")
+    return out[out["neighbor_count"] > 0].reset_index(drop=True)
+
+
+def refresh_election_lags(cur, election_ids=None):
+    codes, weights = _read_weights(cur)
+    if len(codes) == 0:
+        return 0
+    if election_ids is None:
+        cur.execute("SELECT DISTINCT election_id FROM election_result")
+        election_ids = [row[0] for row in cur.fetchall()]
+
+    total = 0
+    for election_id in election_ids:
+        cur.execute(
+            """
+            SELECT insee_code::text, candidate_id, vote_share::float8
+            FROM election_result
+            WHERE election_id = %s AND insee_code = ANY(%s)
+            """,
+            (election_id, list(codes)),
+        )
+        frame = pd.DataFrame(cur.fetchall(), columns=["insee_code", "candidate_id", "vote_share"])
+        cur.execute(
+            "DELETE FROM election_result_spatial_lag WHERE election_id = %s", (election_id,)
+        )
+        if frame.empty:
+            continue
+        lags = spatial_lag(weights, codes, frame, ["candidate_id"], "vote_share")
+        lags["election_id"] = election_id
+        lags["lag_vote_share"] = lags["lag"].round(6)
+        total += copy_frame(
+            cur,
+            "election_result_spatial_lag",
+            ["election_id", "insee_code", "candidate_id", "lag_vote_share", "neighbor_count"],
+            lags,
+        )
+    print(f"[spatial] election lag rows={total} elections={len(election_ids)}")
+    return total
+
+
+def refresh_indicator_lags(cur, indicator_years=None):
+    codes, weights = _read_weights(cur)
+    if len(codes) == 0:
+        return 0
+    if indicator_years is None:
+        cur.execute("SELECT DISTINCT indicator_id, year FROM indicator_value")
+        indicator_years = cur.fetchall()
+    if not indicator_years:
+        return 0
+
+    indicator_years = sorted(set((int(i), int(y)) for i, y in indicator_years))
+    total = 0
+    for start in range(0, len(indicator_years), SPATIAL_LAG_BATCH):
+        batch = indicator_years[start : start + SPATIAL_LAG_BATCH]
+        indicator_ids = [i for i, _ in batch]
+        years = [y for _, y in batch]
+        cur.execute(
+            """
+            SELECT iv.indicator_id, iv.year, iv.insee_code::text, iv.value::float8
+            FROM indicator_value iv
+            JOIN unnest(%s::int[], %s::int[]) AS sel (indicator_id, year)
+              ON sel.indicator_id = iv.indicator_id AND sel.year = iv.year
+            WHERE iv.insee_code = ANY(%s)
+            """,
+            (indicator_ids, years, list(codes)),
+        )
+        frame = pd.DataFrame(
+            cur.fetchall(), columns=["indicator_id", "year", "insee_code", "value"]
+        )
+        cur.execute(
+            """
+            DELETE FROM indicator_value_spatial_lag lag
+            USING unnest(%s::int[], %s::int[]) AS sel (indicator_id, year)
+            WHERE lag.indicator_id = sel.indicator_id AND lag.year = sel.year
+            """,
+            (indicator_ids, years),
+        )
+        if frame.empty:
+            continue
+
+        lags = spatial_lag(weights, codes, frame, ["indicator_id", "year"], "value")
+        lags["lag_value"] = lags["lag"].round(6)
+        total += copy_frame(
+            cur,
+            "indicator_value_spatial_lag",
+            ["indicator_id", "insee_code", "year", "lag_value", "neighbor_count"],
+            lags,
+        )
+    print(f"[spatial] indicator lag rows={total} series={len(indicator_years)}")
+    return total
+
+
+def has_neighbors(cur):
+    cur.execute("SELECT to_regclass('geo_neighbor')")
+    if cur.fetchone()[0] is None:
+        return False
+    cur.execute("SELECT EXISTS (SELECT 1 FROM geo_neighbor)")
+    return bool(cur.fetchone()[0])
+
+
+def run_spatial_pipeline(dept_codes=None, fetch_communes=True):
+    from .run_etl import TARGET_DEPT_CODES
+
+    dept_codes = dept_codes or TARGET_DEPT_CODES
+    ensure_schema()
+    conn = get_conn()
+    try:
+        with conn:
+            with conn.cursor() as cur:
+                if fetch_communes:
+                    fill_commune_coordinates(cur, dept_codes)
+                rebuild_neighbors(cur)
+                refresh_election_lags(cur)
+                refresh_indicator_lags(cur)
+                # Stamps the lag partitions for model retraining.
+                checkpoints.record_loaded(
+                    cur, "spatial", "lags", checkpoints.fingerprint(sorted(dept_codes))
+                )
+    finally:
+        conn.close()
+    print(f"[done] spatial features refreshed for departments {', '.join(sorted(dept_codes))}.")
+
+
+def main():
+    run_spatial_pipeline()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,158 @@
+from __future__ import annotations
+
+import os
+import re
+import resource
+import shutil
+import uuid
+from pathlib import Path
+
+import pandas as pd
+
+from .frames import coerce_frame, concat_frames, empty_frame
+
+MEMORY_BUDGET_MB = float(os.getenv("ETL_MEMORY_BUDGET_MB", "0"))
+# auto: out-of-core as soon as a memory budget is set; true/false force it.
+OUT_OF_CORE_MODE = os.getenv("ETL_OUT_OF_CORE", "auto").lower()
+SPILL_DIR = Path(os.getenv("ETL_SPILL_DIR", "data/processed/spill"))
+# Share of the budget that pending partitions may hold before they are
+# written out; the rest is left to the partition being reduced or loaded.
+SPILL_BUFFER_SHARE = 0.25
+DEFAULT_BUFFER_MB = 64
+# Expected peak of one source-parsing process (interpreter, pandas, one
+# parsed file); the budget left after the parent bounds how many run at once.
+SOURCE_WORKER_MB = float(os.getenv("ETL_SOURCE_WORKER_MB", "256"))
+
+
+def out_of_core_enabled():
+    if OUT_OF_CORE_MODE in {"1", "true", "yes"}:
+        return True
+    if OUT_OF_CORE_MODE in {"0", "false", "no"}:
+        return False
+    return MEMORY_BUDGET_MB > 0
+
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux. For RUSAGE_CHILDREN it is the peak
+    # of the largest finished child (source parsers), counted on top.
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return (own + children) / 1024
+
+
+def budget_workers(workers):
+    # Parsing processes that fit next to the parent and its spill buffers.
+    if not MEMORY_BUDGET_MB:
+        return workers
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    available = MEMORY_BUDGET_MB * (1 - SPILL_BUFFER_SHARE) - own
+    return max(1, min(workers, int(available // SOURCE_WORKER_MB)))
+
+
+def report_peak_rss(stage):
+    peak = peak_rss_mb()
+    print(f"[memory] stage={stage} peak_rss_mb={peak:.0f} budget_mb={MEMORY_BUDGET_MB:g}")
+    if MEMORY_BUDGET_MB and peak > MEMORY_BUDGET_MB:
+        print(f"[warn] peak RSS {peak:.0f} MB above ETL_MEMORY_BUDGET_MB={MEMORY_BUDGET_MB:g}")
+    return peak
+
+
+def _buffer_limit_bytes():
+    if MEMORY_BUDGET_MB:
+        return int(MEMORY_BUDGET_MB * SPILL_BUFFER_SHARE * 1024 * 1024)
+    return DEFAULT_BUFFER_MB * 1024 * 1024
+
+
+def _partition_dir(store, key):
+    parts = []
+    for column, value in zip(store["columns"], key):
+        value = re.sub(r"[^0-9A-Za-z_.-]+", "_", str(value))
+        parts.append(f"{column}={value}")
+    return store["dir"].joinpath(*parts)
+
+
+def open_spill(name, partition_columns, dtypes):
+    # A spill store: frames are split on partition_columns, buffered, and
+    # appended as Parquet parts under <spill dir>/<name>-<run>/col=value/.
+    store_dir = SPILL_DIR / f"{name}-{uuid.uuid4().hex[:8]}"
+    store_dir.mkdir(parents=True, exist_ok=True)
+    return {
+        "name": name,
+        "dir": store_dir,
+        "columns": list(partition_columns),
+        "dtypes": dtypes,
+        "buffers": {},
+        "buffered_bytes": 0,
+        "parts": {},
+        "rows": 0,
+        "flushes": 0,
+    }
+
+
+def spill_frame(store, frame):
+    if frame.empty:
+        return store
+    columns = store["columns"]
+    for key, chunk in frame.groupby(columns, observed=True, sort=False):
+        key = tuple(key) if isinstance(key, tuple) else (key,)
+        key = tuple(str(value) for value in key)
+        store["buffers"].setdefault(key, []).append(chunk)
+        store["buffered_bytes"] += int(chunk.memory_usage(index=False, deep=True).sum())
+        store["rows"] += len(chunk)
+    if store["buffered_bytes"] > _buffer_limit_bytes():
+        flush_spill(store)
+    return store
+
+
+def flush_spill(store):
+    for key, chunks in store["buffers"].items():
+        frame = concat_frames(chunks, store["dtypes"])
+        part_no = store["parts"].get(key, 0)
+        path = _partition_dir(store, key) / f"part-{part_no:05d}.parquet"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        frame.to_parquet(path, index=False)
+        store["parts"][key] = part_no + 1
+    if store["buffers"]:
+        store["flushes"] += 1
+    store["buffers"] = {}
+    store["buffered_bytes"] = 0
+    return store
+
+
+def spill_partitions(store):
+    flush_spill(store)
+    return sorted(store["parts"])
+
+
+def read_partition(store, key):
+    flush_spill(store)
+    paths = sorted(_partition_dir(store, key).glob("part-*.parquet"))
+    if not paths:
+        return empty_frame(store["dtypes"])
+    frames = [coerce_frame(pd.read_parquet(path), store["dtypes"]) for path in paths]
+    return concat_frames(frames, store["dtypes"])
+
+
+def write_partition(store, key, frame):
+    # Replaces a partition with its reduced form (one part), keeping the key.
+    partition_dir = _partition_dir(store, key)
+    shutil.rmtree(partition_dir, ignore_errors=True)
+    store["parts"].pop(key, None)
+    if frame.empty:
+        return store
+    partition_dir.mkdir(parents=True, exist_ok=True)
+    frame.to_parquet(partition_dir / "part-00000.parquet", index=False)
+    store["parts"][key] = 1
+    return store
+
+
+def spill_summary(store):
+    return (
+        f"[spill] store={store['name']} partitions={len(store['parts'])} "
+        f"rows={store['rows']} flushes={store['flushes']} dir={store['dir']}"
+    )
+
+
+def close_spill(store):
+    store["buffers"] = {}
+    shutil.rmtree(store["dir"], ignore_errors=True)
@@ -0,0 +1,222 @@
+from __future__ import annotations
+
+import os
+
+import numpy as np
+import pandas as pd
+
+from .db import copy_frame, ensure_schema, get_conn
+
+STATS_ENABLED = os.getenv("STATS_ENABLED", "true").lower() in {"1", "true", "yes"}
+STATS_MIN_OBSERVATIONS = int(os.getenv("STATS_MIN_OBSERVATIONS", "5"))
+
+STAT_COLUMNS = [
+    "election_id",
+    "scope_level",
+    "scope_code",
+    "indicator_id",
+    "target_kind",
+    "target_code",
+    "n_obs",
+    "pearson_r",
+    "slope",
+    "intercept",
+]
+
+CANDIDATE_TARGETS_QUERY = """
+    SELECT er.insee_code::text, gc.dept_code::text, gd.region_name,
+           er.insee_code = rpad(gc.dept_code, 5, '0') AS is_department,
+           er.candidate_id::text, er.vote_share::float8
+    FROM election_result er
+    JOIN geo_commune gc ON gc.insee_code = er.insee_code
+    JOIN geo_department gd ON gd.dept_code = gc.dept_code
+    WHERE er.election_id = %s
+"""
+
+BLOC_TARGETS_QUERY = """
+    SELECT CASE WHEN level = 'departement' THEN rpad(geo_code, 5, '0') ELSE geo_code END,
+           bloc_code, vote_share
+    FROM bloc_result
+    WHERE election_id = %s AND level IN ('commune', 'departement')
+"""
+
+# Latest value at or before the election year, per indicator and geography.
+# Geography first, on indicator_value_geo_year_idx; the codes are cast to
+# char(5), as a text[] comparison cannot use the index.
+INDICATORS_QUERY = """
+    SELECT DISTINCT ON (iv.insee_code, iv.indicator_id)
+           iv.indicator_id, iv.insee_code::text, iv.value::float8
+    FROM indicator_value iv
+    WHERE iv.insee_code = ANY(%s::char(5)[]) AND iv.year <= %s
+    ORDER BY iv.insee_code, iv.indicator_id, iv.year DESC
+"""
+
+
+def pairwise_stats(x, y):
+    # Pearson r and OLS slope/intercept for every (x column, y column) pair
+    # at once, on pairwise-complete observations: a handful of matrix
+    # products instead of one regression per pair.
+    mx = ~np.isnan(x)
+    my = ~np.isnan(y)
+    x0 = np.where(mx, x, 0.0)
+    y0 = np.where(my, y, 0.0)
+    mxf = mx.astype("float64")
+    myf = my.astype("float64")
+
+    n = mxf.T @ myf
+    sx = x0.T @ myf
+    sy = mxf.T @ y0
+    sxx = (x0 * x0).T @ myf
+    syy = mxf.T @ (y0 * y0)
+    sxy = x0.T @ y0
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        cov = sxy - sx * sy / n
+        var_x = sxx - sx * sx / n
+        var_y = syy - sy * sy / n
+        r = cov / np.sqrt(var_x * var_y)
+        slope = cov / var_x
+        intercept = (sy - slope * sx) / n
+    degenerate = (var_x <= 1e-12) | (var_y <= 1e-12)
+    r[degenerate] = np.nan
+    slope[var_x <= 1e-12] = np.nan
+    intercept[var_x <= 1e-12] = np.nan
+    return n, np.clip(r, -1.0, 1.0), slope, intercept
+
+
+def _scopes(geos):
+    scopes = []
+    departments = geos[geos["is_department"]]
+    if len(departments):
+        scopes.append(("france", "FR", departments.index.to_numpy()))
+        for region, group in departments.groupby("region_name"):
+            scopes.append(("region", region, group.index.to_numpy()))
+    communes = geos[~geos["is_department"]]
+    for dept_code, group in communes.groupby("dept_code"):
+        scopes.append(("departement", dept_code, group.index.to_numpy()))
+    return scopes
+
+
+def _stats_frame(election_id, scope_level, scope_code, indicator_ids, target_kind, targets, stats):
+    n, r, slope, intercept = stats
+    keep = n >= STATS_MIN_OBSERVATIONS
+    rows, cols = np.nonzero(keep)
+    return pd.DataFrame(
+        {
+            "election_id": election_id,
+            "scope_level": scope_level,
+            "scope_code": scope_code,
+            "indicator_id": indicator_ids[rows],
+            "target_kind": target_kind,
+            "target_code": targets[cols],
+            "n_obs": n[rows, cols].astype("int32"),
+            "pearson_r": r[rows, cols].round(6),
+            "slope": slope[rows, cols],
+            "intercept": intercept[rows, cols],
+        }
+    )
+
+
+def compute_election_stats(cur, election_id, year):
+    cur.execute(CANDIDATE_TARGETS_QUERY, (election_id,))
+    candidates = pd.DataFrame(
+        cur.fetchall(),
+        columns=["insee_code", "dept_code", "region_name", "is_department", "target", "value"],
+    )
+    if candidates.empty:
+        return pd.DataFrame(columns=STAT_COLUMNS)
+
+    geos = (
+        candidates[["insee_code", "dept_code", "region_name", "is_department"]]
+        .drop_duplicates("insee_code")
+        .sort_values("insee_code")
+        .reset_index(drop=True)
+    )
+    codes = pd.Index(geos["insee_code"])
+
+    cur.execute(INDICATORS_QUERY, (codes.tolist(), year))
+    indicators = pd.DataFrame(cur.fetchall(), columns=["indicator_id", "insee_code", "value"])
+    if indicators.empty:
+        return pd.DataFrame(columns=STAT_COLUMNS)
+    x_wide = indicators.pivot(index="insee_code", columns="indicator_id", values="value")
+    x_wide = x_wide.reindex(codes)
+    indicator_ids = x_wide.columns.to_numpy(dtype="int64")
+    x = x_wide.to_numpy(dtype="float64")
+
+    target_sets = [
+        (
+            "candidate",
+            candidates.pivot(index="insee_code", columns="target", values="value").reindex(codes),
+        )
+    ]
+    cur.execute("SELECT to_regclass('bloc_result')")
+    if cur.fetchone()[0] is not None:
+        cur.execute(BLOC_TARGETS_QUERY, (election_id,))
+        blocs = pd.DataFrame(cur.fetchall(), columns=["insee_code", "target", "value"])
+        if not blocs.empty:
+            y_blocs = blocs.pivot(index="insee_code", columns="target", values="value")
+            target_sets.append(("bloc", y_blocs.reindex(codes)))
+
+    frames = []
+    for scope_level, scope_code, rows in _scopes(geos):
+        if len(rows) < STATS_MIN_OBSERVATIONS:
+            continue
+        for target_kind, y_wide in target_sets:
+            stats = pairwise_stats(x[rows], y_wide.to_numpy(dtype="float64")[rows])
+            frames.append(
+                _stats_frame(
+                    election_id,
+                    scope_level,
+                    scope_code,
+                    indicator_ids,
+                    target_kind,
+                    y_wide.columns.astype(str).to_numpy(),
+                    stats,
+                )
+            )
+    if not frames:
+        return pd.DataFrame(columns=STAT_COLUMNS)
+    return pd.concat(frames, ignore_index=True)
+
+
+def refresh_indicator_vote_stats(cur, election_ids=None, min_year=None):
+    cur.execute(
+        """
+        SELECT election_id, EXTRACT(YEAR FROM election_date)::int
+        FROM election
+        WHERE (%s::int[] IS NULL OR election_id = ANY(%s::int[]))
+          AND (%s::int IS NULL OR EXTRACT(YEAR FROM election_date)::int >= %s::int)
+        ORDER BY election_date
+        """,
+        (election_ids, election_ids, min_year, min_year),
+    )
+    elections = cur.fetchall()
+
+    total = 0
+    for election_id, year in elections:
+        frame = compute_election_stats(cur, election_id, year)
+        cur.execute("DELETE FROM indicator_vote_stat WHERE election_id = %s", (election_id,))
+        if not frame.empty:
+            total += copy_frame(cur, "indicator_vote_stat", STAT_COLUMNS, frame)
+    print(f"[stats] indicator x vote rows={total} elections={len(elections)}")
+    return total
+
+
+def run_stats_pipeline():
+    ensure_schema()
+    conn = get_conn()
+    try:
+        with conn:
+            with conn.cursor() as cur:
+                refresh_indicator_vote_stats(cur)
+    finally:
+        conn.close()
+
+
+def main():
+    run_stats_pipeline()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
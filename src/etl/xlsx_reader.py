@@ -0,0 +1,100 @@
+from __future__ import annotations
+
+import os
+
+import pandas as pd
+
+XLSX_ENGINE = os.getenv("XLSX_ENGINE", "auto").lower()
+
+
+def _calamine_available():
+    try:
+        import python_calamine  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def resolve_engine(engine=None):
+    engine = (engine or XLSX_ENGINE).lower()
+    if engine == "auto":
+        return "calamine" if _calamine_available() else "openpyxl"
+    if engine not in {"calamine", "openpyxl"}:
+        raise ValueError(f"Unsupported XLSX engine: {engine}")
+    return engine
+
+
+def _iter_rows_openpyxl(path, sheet_name):
+    from openpyxl import load_workbook
+
+    # read_only streams the sheet XML row by row instead of building the
+    # full cell object model of every sheet in the workbook.
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        if sheet_name not in workbook.sheetnames:
+            raise RuntimeError(f"Sheet '{sheet_name}' not found in {path}.")
+        for row in workbook[sheet_name].iter_rows(values_only=True):
+            yield row
+    finally:
+        workbook.close()
+
+
+def _iter_rows_calamine(path, sheet_name):
+    from python_calamine import CalamineWorkbook
+
+    workbook = CalamineWorkbook.from_path(str(path))
+    if sheet_name not in workbook.sheet_names:
+        raise RuntimeError(f"Sheet '{sheet_name}' not found in {path}.")
+    sheet = workbook.get_sheet_by_name(sheet_name)
+    if hasattr(sheet, "iter_rows"):
+        rows = sheet.iter_rows()
+    else:
+        rows = sheet.to_python(skip_empty_area=False)
+    for row in rows:
+        # calamine returns "" for empty cells where openpyxl returns None.
+        yield tuple(None if value == "" else value for value in row)
+
+
+def _header_names(raw_header):
+    names = []
+    seen = {}
+    for i, value in enumerate(raw_header):
+        name = str(value).strip() if value is not None and str(value).strip() else f"Unnamed: {i}"
+        # Same de-duplication as pandas.read_excel, so downstream column
+        # lookups keep working.
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        names.append(name)
+    return names
+
+
+def read_sheet(path, sheet_name, plan_columns, engine=None):
+    engine = resolve_engine(engine)
+    if engine == "calamine":
+        rows = _iter_rows_calamine(path, sheet_name)
+    else:
+        rows = _iter_rows_openpyxl(path, sheet_name)
+
+    raw_header = next(rows, None)
+    if raw_header is None:
+        return pd.DataFrame()
+    header = _header_names(raw_header)
+
+    # The caller sees the header once and decides which columns to keep and
+    # which rows are worth materializing.
+    columns, keep_row = plan_columns(header)
+    indexes = [header.index(column) for column in columns]
+
+    data = []
+    for row in rows:
+        values = [row[i] if i < len(row) else None for i in indexes]
+        if all(value is None for value in values):
+            continue
+        if keep_row is not None and not keep_row(dict(zip(columns, values))):
+            continue
+        data.append(values)
+
+    return pd.DataFrame(data, columns=columns)
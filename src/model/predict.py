@@ -0,0 +1,339 @@
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import threading
+import time
+import traceback
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src.etl.db import (
+    bump_load_version,
+    copy_frame,
+    ensure_schema,
+    fetch_load_version,
+    get_conn,
+)
+
+from .registry import DEFAULT_MODEL_NAME, latest_version, load_model
+from .tensor import read_indicator_frame
+
+MODEL_CACHE_MAX_ENTRIES = int(os.getenv("MODEL_CACHE_MAX_ENTRIES", "4"))
+PREDICTION_BATCH_ROWS = int(os.getenv("PREDICTION_BATCH_ROWS", "250000"))
+SCENARIOS_PATH = Path(os.getenv("MODEL_SCENARIOS_PATH", "data/processed/model/scenarios.json"))
+PREDICT_HTTP_HOST = os.getenv("PREDICT_HTTP_HOST", "127.0.0.1")
+PREDICT_HTTP_PORT = int(os.getenv("PREDICT_HTTP_PORT", "8090"))
+NATIONAL_SHARE_FEATURE = "national_share"
+DEFAULT_SCENARIOS = [{"name": "baseline"}]
+
+PREDICTION_COLUMNS = [
+    "model_name",
+    "model_version",
+    "scenario",
+    "insee_code",
+    "candidate_id",
+    "predicted_share",
+]
+
+LATEST_CANDIDATES_QUERY = """
+    WITH latest AS (
+      SELECT election_id, EXTRACT(YEAR FROM election_date)::int AS year
+      FROM election
+      WHERE election_type = 'presidentielle' AND round = 1
+      ORDER BY election_date DESC
+      LIMIT 1
+    )
+    SELECT latest.year, er.candidate_id, AVG(er.vote_share)::float8
+    FROM election_result er
+    JOIN latest ON latest.election_id = er.election_id
+    JOIN geo_commune gc ON gc.insee_code = er.insee_code
+    WHERE er.insee_code = rpad(gc.dept_code, 5, '0')
+    GROUP BY latest.year, er.candidate_id
+    ORDER BY er.candidate_id
+"""
+
+_MODELS = OrderedDict()
+_MODELS_LOCK = threading.Lock()
+_INPUTS = {}
+_INPUTS_LOCK = threading.Lock()
+
+
+def get_model(name=DEFAULT_MODEL_NAME, version=None):
+    version = version or latest_version(name)
+    key = (name, version)
+    with _MODELS_LOCK:
+        if key in _MODELS:
+            _MODELS.move_to_end(key)
+            return _MODELS[key]
+
+    # Loaded outside the lock: a slow unpickle must not block scoring with
+    # models that are already warm.
+    entry = load_model(name, version)
+    with _MODELS_LOCK:
+        _MODELS[key] = entry
+        _MODELS.move_to_end(key)
+        while len(_MODELS) > MODEL_CACHE_MAX_ENTRIES:
+            evicted, _ = _MODELS.popitem(last=False)
+            print(f"[predict] evicted model={evicted[0]} version={evicted[1]}")
+    return entry
+
+
+def model_cache_info():
+    with _MODELS_LOCK:
+        entries = [f"{name}/{version}" for name, version in _MODELS]
+    return {"entries": entries, "max_entries": MODEL_CACHE_MAX_ENTRIES}
+
+
+def _read_scoring_inputs(cur):
+    indicators = read_indicator_frame(cur)
+    # Aligned socio indicators: the most recent year available for each
+    # geography and feature.
+    latest = indicators.sort_values("year").drop_duplicates(["insee_code", "feature"], keep="last")
+    geo_features = latest.pivot(index="insee_code", columns="feature", values="value")
+
+    cur.execute(LATEST_CANDIDATES_QUERY)
+    candidates = pd.DataFrame(cur.fetchall(), columns=["year", "candidate_id", "national_share"])
+    if candidates.empty:
+        raise RuntimeError("No first-round presidential results to take candidates from.")
+    return {"geo_features": geo_features.sort_index(), "candidates": candidates}
+
+
+def scoring_inputs(force=False):
+    # Inputs only change when the ETL loads something, so they are cached on
+    # the load-version stamp.
+    conn = get_conn()
+    try:
+        with conn.cursor() as cur:
+            version = fetch_load_version(cur)
+            with _INPUTS_LOCK:
+                if not force and _INPUTS.get("version") == version:
+                    return _INPUTS["inputs"]
+            inputs = _read_scoring_inputs(cur)
+    finally:
+        conn.close()
+    with _INPUTS_LOCK:
+        _INPUTS.update(version=version, inputs=inputs)
+    return inputs
+
+
+def _geo_matrix(inputs, feature_names, scenario):
+    geo = inputs["geo_features"].reindex(columns=feature_names)
+    for feature, delta in (scenario.get("shifts") or {}).items():
+        if feature in geo.columns:
+            geo[feature] = geo[feature] + float(delta)
+    for feature, factor in (scenario.get("scales") or {}).items():
+        if feature in geo.columns:
+            geo[feature] = geo[feature] * float(factor)
+    return geo.index.to_numpy(), geo.to_numpy(dtype="float32")
+
+
+def _national_shares(inputs, scenario):
+    candidates = inputs["candidates"]
+    shares = candidates.set_index("candidate_id")["national_share"].astype("float64")
+    overrides = {int(k): float(v) for k, v in (scenario.get("national_shares") or {}).items()}
+    if overrides:
+        shares.update(pd.Series(overrides))
+    return shares.index.to_numpy(dtype="int64"), shares.to_numpy(dtype="float32")
+
+
+def score_scenario(model, meta, inputs, scenario):
+    features = meta["features"]
+    if meta.get("target", "candidate") != "candidate":
+        raise RuntimeError(
+            f"Model {meta['name']}/{meta['version']} is not a candidate-level model."
+        )
+    if features[-1] != NATIONAL_SHARE_FEATURE:
+        raise RuntimeError(f"Model {meta['name']}/{meta['version']} has an unexpected layout.")
+    geo_codes, geo_matrix = _geo_matrix(inputs, features[:-1], scenario)
+    candidate_ids, shares = _national_shares(inputs, scenario)
+    n_geo, n_candidates = len(geo_codes), len(candidate_ids)
+
+    # Every geography x candidate row at once: geography features repeated
+    # per candidate, national share tiled per geography.
+    design = np.empty((n_geo * n_candidates, len(features)), dtype="float32")
+    design[:, :-1] = np.repeat(geo_matrix, n_candidates, axis=0)
+    design[:, -1] = np.tile(shares, n_geo)
+
+    predicted = np.empty(design.shape[0], dtype="float64")
+    for start in range(0, design.shape[0], PREDICTION_BATCH_ROWS):
+        stop = start + PREDICTION_BATCH_ROWS
+        predicted[start:stop] = model.predict(design[start:stop])
+
+    # Independent per-candidate predictions are clipped and rescaled so the
+    # shares of a geography sum to one.
+    predicted = np.clip(predicted, 0.0, 1.0).reshape(n_geo, n_candidates)
+    totals = predicted.sum(axis=1, keepdims=True)
+    predicted = np.divide(predicted, totals, out=np.zeros_like(predicted), where=totals > 0)
+
+    return pd.DataFrame(
+        {
+            "model_name": meta["name"],
+            "model_version": meta["version"],
+            "scenario": scenario["name"],
+            "insee_code": np.repeat(geo_codes, n_candidates),
+            "candidate_id": np.tile(candidate_ids, n_geo),
+            "predicted_share": predicted.ravel().round(6),
+        }
+    )
+
+
+def write_predictions(frame):
+    ensure_schema()
+    conn = get_conn()
+    try:
+        with conn:
+            with conn.cursor() as cur:
+                for (name, version, scenario), _ in frame.groupby(
+                    ["model_name", "model_version", "scenario"], sort=False
+                ):
+                    cur.execute(
+                        """
+                        DELETE FROM model_prediction
+                        WHERE model_name = %s AND model_version = %s AND scenario = %s
+                        """,
+                        (name, version, scenario),
+                    )
+                rows = copy_frame(cur, "model_prediction", PREDICTION_COLUMNS, frame)
+                bump_load_version(cur, "model_prediction")
+    finally:
+        conn.close()
+    return rows
+
+
+def score(scenarios=None, name=DEFAULT_MODEL_NAME, version=None, write=True):
+    scenarios = scenarios or DEFAULT_SCENARIOS
+    model, meta = get_model(name, version)
+    inputs = scoring_inputs()
+
+    frames = []
+    summary = []
+    for scenario in scenarios:
+        if not scenario.get("name"):
+            raise ValueError("Every scenario needs a name.")
+        started = time.perf_counter()
+        frame = score_scenario(model, meta, inputs, scenario)
+        frames.append(frame)
+        summary.append(
+            {
+                "scenario": scenario["name"],
+                "rows": int(len(frame)),
+                "seconds": round(time.perf_counter() - started, 3),
+            }
+        )
+    predictions = pd.concat(frames, ignore_index=True)
+    if write:
+        write_predictions(predictions)
+    for item in summary:
+        print(
+            f"[predict] model={meta['name']} version={meta['version']} "
+            f"scenario={item['scenario']} rows={item['rows']} seconds={item['seconds']}"
+        )
+    return predictions, {"model": meta["name"], "version": meta["version"], "scenarios": summary}
+
+
+def load_scenarios(path=None):
+    path = Path(path or SCENARIOS_PATH)
+    if not path.exists():
+        return list(DEFAULT_SCENARIOS)
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def run_prediction_pipeline():
+    try:
+        latest_version(DEFAULT_MODEL_NAME)
+    except RuntimeError as exc:
+        # The DAG runs before the first training; nothing to score yet.
+        print(f"[warn] {exc}")
+        return None
+    _, summary = score(load_scenarios())
+    return summary
+
+
+class PredictionHandler(BaseHTTPRequestHandler):
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/health":
+            self._send_json(200, {"status": "ok", "models": model_cache_info()})
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        if self.path != "/score":
+            self._send_json(404, {"error": "not found"})
+            return
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+            request = json.loads(self.rfile.read(length) or b"{}")
+            predictions, summary = score(
+                request.get("scenarios"),
+                request.get("model") or DEFAULT_MODEL_NAME,
+                request.get("version"),
+                write=request.get("write", True),
+            )
+            if request.get("return_rows"):
+                summary["rows"] = predictions.to_dict(orient="records")
+        except (ValueError, RuntimeError) as exc:
+            self._send_json(400, {"error": str(exc)})
+            return
+        except Exception as exc:
+            # Database errors, malformed scenarios: the client still gets an
+            # answer instead of a dropped connection.
+            print(f"[predict-http] error {type(exc).__name__}: {exc}")
+            traceback.print_exc()
+            self._send_json(500, {"error": f"{type(exc).__name__}: {exc}"})
+            return
+        self._send_json(200, summary)
+
+    def log_message(self, format, *args):
+        print(f"[predict-http] {self.address_string()} {format % args}")
+
+
+def serve(host=None, port=None):
+    address = (host or PREDICT_HTTP_HOST, port or PREDICT_HTTP_PORT)
+    server = ThreadingHTTPServer(address, PredictionHandler)
+    print(f"[predict-http] listening on http://{address[0]}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Predictions par lots (scenarios).")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    score_parser = commands.add_parser("score", help="score les scenarios et ecrit en base")
+    score_parser.add_argument("--scenarios", default=None)
+    score_parser.add_argument("--model", default=DEFAULT_MODEL_NAME)
+    score_parser.add_argument("--version", default=None)
+    score_parser.add_argument("--dry-run", action="store_true")
+
+    serve_parser = commands.add_parser("serve", help="endpoint HTTP local (POST /score)")
+    serve_parser.add_argument("--host", default=None)
+    serve_parser.add_argument("--port", type=int, default=None)
+
+    args = parser.parse_args(argv)
+    if args.command == "serve":
+        serve(args.host, args.port)
+    else:
+        score(load_scenarios(args.scenarios), args.model, args.version, write=not args.dry_run)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,73 @@
+from __future__ import annotations
+
+import json
+import os
+import shutil
+from datetime import datetime, timezone
+from pathlib import Path
+
+import joblib
+
+REGISTRY_DIR = Path(os.getenv("MODEL_REGISTRY_DIR", "data/processed/model/registry"))
+DEFAULT_MODEL_NAME = os.getenv("MODEL_NAME", "vote_share")
+
+
+def _model_dir(name, root=None):
+    return Path(root or REGISTRY_DIR) / name
+
+
+def list_models(root=None):
+    root = Path(root or REGISTRY_DIR)
+    if not root.exists():
+        return []
+    return sorted(p.name for p in root.iterdir() if p.is_dir() and list_versions(p.name, root))
+
+
+def list_versions(name=DEFAULT_MODEL_NAME, root=None):
+    model_dir = _model_dir(name, root)
+    if not model_dir.exists():
+        return []
+    return sorted(
+        p.name
+        for p in model_dir.iterdir()
+        if p.is_dir() and p.name.startswith("v") and (p / "meta.json").exists()
+    )
+
+
+def latest_version(name=DEFAULT_MODEL_NAME, root=None):
+    versions = list_versions(name, root)
+    if not versions:
+        raise RuntimeError(f"No registered version of model '{name}' in {_model_dir(name, root)}.")
+    return versions[-1]
+
+
+def register_model(model, meta, name=DEFAULT_MODEL_NAME, root=None):
+    versions = list_versions(name, root)
+    version = f"v{int(versions[-1][1:]) + 1 if versions else 1:04d}"
+    final_dir = _model_dir(name, root) / version
+    staging_dir = final_dir.with_name(f".{version}.staging")
+    shutil.rmtree(staging_dir, ignore_errors=True)
+    staging_dir.mkdir(parents=True)
+
+    meta = dict(meta, name=name, version=version)
+    meta.setdefault("created_at", datetime.now(timezone.utc).isoformat(timespec="seconds"))
+    joblib.dump(model, staging_dir / "model.joblib")
+    (staging_dir / "meta.json").write_text(json.dumps(meta, indent=1), encoding="utf-8")
+    # A version directory only appears once both files are complete.
+    staging_dir.rename(final_dir)
+    print(f"[registry] model={name} version={version} family={meta.get('family')}")
+    return version
+
+
+def read_meta(name=DEFAULT_MODEL_NAME, version=None, root=None):
+    version = version or latest_version(name, root)
+    path = _model_dir(name, root) / version / "meta.json"
+    if not path.exists():
+        raise RuntimeError(f"Model '{name}' has no version {version}.")
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def load_model(name=DEFAULT_MODEL_NAME, version=None, root=None):
+    meta = read_meta(name, version, root)
+    model = joblib.load(_model_dir(name, root) / meta["version"] / "model.joblib")
+    return model, meta
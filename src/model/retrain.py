@@ -0,0 +1,143 @@
+from __future__ import annotations
+
+import argparse
+import os
+import time
+
+from src.etl.db import get_conn
+
+from .registry import list_models, load_model, read_meta, register_model
+from .search import make_model
+from .tensor import build_training_arrays, partition_hashes, read_training_frames
+
+# Extra trees / boosting iterations added on a warm start.
+WARM_START_STEP = int(os.getenv("RETRAIN_WARM_START_STEP", "50"))
+# Above this share of changed partitions the model is refit from scratch.
+WARM_START_MAX_CHANGED = float(os.getenv("RETRAIN_WARM_START_MAX_CHANGED", "0.25"))
+# Warm starts only ever grow the model; every N of them it is rebuilt.
+MAX_WARM_STARTS = int(os.getenv("RETRAIN_MAX_WARM_STARTS", "3"))
+WARM_START_PARAM = {"random_forest": "n_estimators", "gradient_boosting": "max_iter"}
+
+
+def changed_partitions(trained, current):
+    keys = set(trained) | set(current)
+    return sorted(key for key in keys if trained.get(key) != current.get(key))
+
+
+def _model_target(meta):
+    return meta.get("target", "candidate")
+
+
+def _current_partitions(targets):
+    conn = get_conn()
+    try:
+        with conn.cursor() as cur:
+            return {target: partition_hashes(cur, target) for target in targets}
+    finally:
+        conn.close()
+
+
+def _warm_start_model(name, meta, changed, labels):
+    family = meta["family"]
+    if family not in WARM_START_PARAM:
+        return None
+    # A candidate model cannot grow trees on bloc shares, and vice versa.
+    if _model_target(meta) != labels["target"]:
+        return None
+    if meta.get("features") != labels["features"]:
+        return None
+    if meta.get("warm_starts", 0) >= MAX_WARM_STARTS:
+        return None
+    if len(changed) > WARM_START_MAX_CHANGED * max(1, len(meta.get("partitions") or {})):
+        return None
+
+    model, _ = load_model(name, meta["version"])
+    param = WARM_START_PARAM[family]
+    # The fitted trees are kept; only the new ones see the refreshed data.
+    model.set_params(**{"warm_start": True, param: getattr(model, param) + WARM_START_STEP})
+    return model
+
+
+def retrain_model(name, meta, arrays, labels, partitions, changed):
+    started = time.perf_counter()
+    model = _warm_start_model(name, meta, changed, labels)
+    mode = "warm_start" if model is not None else "full"
+    if model is None:
+        model = make_model(meta["family"], meta["params"])
+    model.fit(arrays["features"], arrays["target"])
+    if mode == "warm_start":
+        model.set_params(warm_start=False)
+
+    new_meta = {
+        "family": meta["family"],
+        "params": meta["params"],
+        "features": labels["features"],
+        "years": labels["years"],
+        "target": labels["target"],
+        "train_rows": int(arrays["target"].shape[0]),
+        "validation": meta.get("validation"),
+        "partitions": partitions,
+        "parent_version": meta["version"],
+        "retrain_mode": mode,
+        "changed_partitions": changed,
+        "warm_starts": meta.get("warm_starts", 0) + 1 if mode == "warm_start" else 0,
+        "fit_seconds": round(time.perf_counter() - started, 3),
+    }
+    return register_model(model, new_meta, name), mode
+
+
+def retrain_models(names=None, force=False):
+    names = names or list_models()
+    if not names:
+        print("[warn] no registered model to retrain.")
+        return []
+
+    # Cheap path first: only the partition hashes are read. An unchanged
+    # month stops here without touching the training data.
+    metas = {name: read_meta(name) for name in names}
+    current = _current_partitions(sorted({_model_target(meta) for meta in metas.values()}))
+    stale = {}
+    summary = []
+    for name, meta in metas.items():
+        target = _model_target(meta)
+        changed = changed_partitions(meta.get("partitions") or {}, current[target])
+        if changed or force:
+            stale.setdefault(target, []).append((name, meta, changed))
+        else:
+            print(f"[retrain] model={name} version={meta['version']} status=up_to_date")
+            summary.append({"model": name, "version": meta["version"], "mode": "skipped"})
+
+    # Models are retrained on the target they were registered with, one
+    # training frame per target.
+    for target, models in sorted(stale.items()):
+        results, indicators, partitions = read_training_frames(target=target)
+        arrays, labels = build_training_arrays(results, indicators, target)
+        for name, meta, changed in models:
+            version, mode = retrain_model(name, meta, arrays, labels, partitions, changed)
+            shown = ", ".join(changed[:5]) + (", ..." if len(changed) > 5 else "")
+            print(
+                f"[retrain] model={name} version={version} parent={meta['version']} "
+                f"target={target} mode={mode} changed={len(changed)} ({shown})"
+            )
+            summary.append({"model": name, "version": version, "mode": mode, "changed": changed})
+        del results, indicators, arrays
+    return summary
+
+
+def run_retrain_pipeline():
+    return retrain_models()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Reentrainement des modeles dont les donnees ont change."
+    )
+    parser.add_argument("--model", action="append", dest="models")
+    parser.add_argument("--force", action="store_true")
+    args = parser.parse_args(argv)
+    retrain_models(args.models, args.force)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
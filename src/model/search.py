@@ -0,0 +1,225 @@
+from __future__ import annotations
+
+import argparse
+import itertools
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+from sklearn.ensemble import HistGradientBoostingRegressor, RandomForestRegressor
+from sklearn.impute import SimpleImputer
+from sklearn.linear_model import Ridge
+from sklearn.metrics import mean_absolute_error, mean_squared_error
+from sklearn.pipeline import make_pipeline
+from threadpoolctl import threadpool_limits
+
+from .registry import DEFAULT_MODEL_NAME, register_model
+from .tensor import attach_tensor, build_tensor, detach_tensor, release_tensor
+
+MODEL_DIR = Path(os.getenv("MODEL_DIR", "data/processed/model"))
+SEARCH_WORKERS = int(os.getenv("MODEL_SEARCH_WORKERS", str(os.cpu_count() or 1)))
+RANDOM_STATE = 42
+
+
+def _linear(alpha):
+    return make_pipeline(SimpleImputer(strategy="median"), Ridge(alpha=alpha))
+
+
+def _random_forest(n_estimators, max_depth, min_samples_leaf):
+    # n_jobs=1: the search already runs one model per core.
+    return RandomForestRegressor(
+        n_estimators=n_estimators,
+        max_depth=max_depth,
+        min_samples_leaf=min_samples_leaf,
+        n_jobs=1,
+        random_state=RANDOM_STATE,
+    )
+
+
+def _gradient_boosting(learning_rate, max_leaf_nodes):
+    return HistGradientBoostingRegressor(
+        learning_rate=learning_rate,
+        max_leaf_nodes=max_leaf_nodes,
+        max_iter=300,
+        random_state=RANDOM_STATE,
+    )
+
+
+MODEL_FAMILIES = {
+    "linear": (_linear, {"alpha": [0.1, 1.0, 10.0]}),
+    "random_forest": (
+        _random_forest,
+        {"n_estimators": [200], "max_depth": [None, 12], "min_samples_leaf": [1, 5]},
+    ),
+    "gradient_boosting": (
+        _gradient_boosting,
+        {"learning_rate": [0.05, 0.1], "max_leaf_nodes": [15, 31]},
+    ),
+}
+
+
+def search_space(families=None):
+    space = []
+    for family in families or MODEL_FAMILIES:
+        _, grid = MODEL_FAMILIES[family]
+        names = sorted(grid)
+        for values in itertools.product(*(grid[name] for name in names)):
+            space.append((family, dict(zip(names, values))))
+    return space
+
+
+def make_model(family, params):
+    factory, _ = MODEL_FAMILIES[family]
+    return factory(**params)
+
+
+def temporal_split(views, test_year_index=None):
+    # Rows are sorted by year: train on every earlier election, test on the
+    # last one. Both sides are slices of the shared buffer.
+    row_year = views["row_year"]
+    test_year_index = int(row_year[-1]) if test_year_index is None else test_year_index
+    start = int(np.searchsorted(row_year, test_year_index, side="left"))
+    stop = int(np.searchsorted(row_year, test_year_index, side="right"))
+    if start == 0:
+        raise RuntimeError("Temporal split needs at least one election before the test year.")
+    return slice(0, start), slice(start, stop)
+
+
+_WORKER_TENSOR = {}
+
+
+def _attach_worker(handle):
+    # Once per worker process; every task of that worker reuses the views.
+    # OpenMP/BLAS pools are pinned to one thread so workers x threads never
+    # exceeds the core count.
+    threadpool_limits(1)
+    _WORKER_TENSOR["views"], _WORKER_TENSOR["block"] = attach_tensor(handle)
+
+
+def evaluate_candidate(family, params, handle=None):
+    if handle is not None and "views" not in _WORKER_TENSOR:
+        _attach_worker(handle)
+    views = _WORKER_TENSOR["views"]
+    train, test = temporal_split(views)
+
+    started = time.perf_counter()
+    model = make_model(family, params)
+    model.fit(views["features"][train], views["target"][train])
+    predicted = model.predict(views["features"][test])
+    actual = views["target"][test]
+    return {
+        "family": family,
+        "params": params,
+        "mae": round(float(mean_absolute_error(actual, predicted)), 6),
+        "rmse": round(float(np.sqrt(mean_squared_error(actual, predicted))), 6),
+        "train_rows": train.stop - train.start,
+        "test_rows": test.stop - test.start,
+        "seconds": round(time.perf_counter() - started, 3),
+        "pid": os.getpid(),
+    }
+
+
+def run_search(handle, families=None, workers=None):
+    space = search_space(families)
+    workers = max(1, min(workers or SEARCH_WORKERS, len(space)))
+    results = []
+    errors = []
+    with ProcessPoolExecutor(
+        max_workers=workers, initializer=_attach_worker, initargs=(handle,)
+    ) as executor:
+        futures = {
+            executor.submit(evaluate_candidate, family, params): (family, params)
+            for family, params in space
+        }
+        for future in as_completed(futures):
+            family, params = futures[future]
+            try:
+                result = future.result()
+            except Exception as exc:
+                errors.append((family, params, exc))
+                print(f"[search] family={family} params={params} status=failed ({exc})")
+                continue
+            results.append(result)
+            print(
+                f"[search] family={family} params={params} mae={result['mae']} "
+                f"rmse={result['rmse']} seconds={result['seconds']}"
+            )
+
+    if not results:
+        raise RuntimeError(f"Every search candidate failed: {errors}")
+    return sorted(results, key=lambda r: (r["mae"], r["rmse"]))
+
+
+def write_search_report(results, handle, output_dir=None):
+    output_dir = Path(output_dir or MODEL_DIR)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    labels = handle["labels"]
+    report = {
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "years": labels["years"],
+        "features": labels["features"],
+        "best": results[0],
+        "results": results,
+    }
+    path = output_dir / "search_results.json"
+    path.write_text(json.dumps(report, indent=1), encoding="utf-8")
+    return path
+
+
+def fit_final_model(handle, result, name=DEFAULT_MODEL_NAME):
+    # The winning configuration is refit on every election, then versioned.
+    views, block = attach_tensor(handle)
+    try:
+        model = make_model(result["family"], result["params"])
+        model.fit(views["features"], views["target"])
+        train_rows = int(views["target"].shape[0])
+    finally:
+        del views
+        detach_tensor(handle, block)
+    labels = handle["labels"]
+    meta = {
+        "family": result["family"],
+        "params": result["params"],
+        "features": labels["features"],
+        "years": labels["years"],
+        "target": labels["target"],
+        "train_rows": train_rows,
+        "validation": {"mae": result["mae"], "rmse": result["rmse"]},
+        "partitions": handle["partitions"],
+    }
+    return register_model(model, meta, name)
+
+
+def run_search_pipeline(families=None, workers=None, backend=None, register=True):
+    handle, block = build_tensor(backend=backend)
+    try:
+        results = run_search(handle, families, workers)
+        version = fit_final_model(handle, results[0]) if register else None
+    finally:
+        release_tensor(handle, block)
+    path = write_search_report(results, handle)
+    best = results[0]
+    print(
+        f"[done] best={best['family']} params={best['params']} mae={best['mae']} "
+        f"candidates={len(results)} report={path} version={version}"
+    )
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Recherche d'hyperparametres en parallele.")
+    parser.add_argument("--family", action="append", choices=sorted(MODEL_FAMILIES))
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--backend", choices=["memmap", "shm"], default=None)
+    parser.add_argument("--no-register", action="store_true")
+    args = parser.parse_args(argv)
+    run_search_pipeline(args.family, args.workers, args.backend, not args.no_register)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,431 @@
+from __future__ import annotations
+
+import json
+import os
+import uuid
+from multiprocessing import shared_memory
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src.etl import checkpoints
+from src.etl.db import get_conn
+
+TENSOR_DIR = Path(os.getenv("MODEL_TENSOR_DIR", "data/processed/model/tensor"))
+# Partition hashes last computed, with the stamps they were computed under.
+PARTITION_STAMPS_PATH = Path(
+    os.getenv("MODEL_PARTITION_STAMPS", "data/processed/model/partition_stamps.json")
+)
+TENSOR_BACKEND = os.getenv("MODEL_TENSOR_BACKEND", "memmap").lower()
+# "candidate" trains on election_result rows, "bloc" on the department-level
+# bloc_result rollup (one target per political bloc).
+MODEL_TARGET = os.getenv("MODEL_TARGET", "candidate").lower()
+ALIGNMENT = 64
+
+# Department-level rows only (pseudo commune code rpad(dept_code, 5, '0'));
+# live loads add commune rows next to them.
+RESULTS_QUERY = """
+    SELECT EXTRACT(YEAR FROM e.election_date)::int AS year, er.insee_code::text,
+           er.candidate_id, er.vote_share::float8
+    FROM election_result er
+    JOIN election e ON e.election_id = er.election_id
+    JOIN geo_commune gc ON gc.insee_code = er.insee_code
+    WHERE e.election_type = 'presidentielle' AND e.round = 1
+      AND er.insee_code = rpad(gc.dept_code, 5, '0')
+      AND er.vote_share IS NOT NULL
+"""
+
+BLOC_RESULTS_QUERY = """
+    SELECT EXTRACT(YEAR FROM e.election_date)::int AS year, rpad(br.geo_code, 5, '0'),
+           br.bloc_code, br.vote_share
+    FROM bloc_result br
+    JOIN election e ON e.election_id = br.election_id
+    WHERE e.election_type = 'presidentielle' AND e.round = 1
+      AND br.level = 'departement' AND br.vote_share IS NOT NULL
+"""
+
+INDICATORS_QUERY = """
+    SELECT iv.year, iv.insee_code::text, i.indicator_code, iv.value::float8
+    FROM indicator_value iv
+    JOIN indicator i ON i.indicator_id = iv.indicator_id
+"""
+
+INDICATOR_LAGS_QUERY = """
+    SELECT lag.year, lag.insee_code::text, 'lag_' || i.indicator_code, lag.lag_value
+    FROM indicator_value_spatial_lag lag
+    JOIN indicator i ON i.indicator_id = lag.indicator_id
+"""
+
+# One hash per feature partition (election year, indicator x year). Models
+# record the hashes they were trained on; see src/model/retrain.py. Result
+# and bloc hashes are computed for the requested years only.
+RESULT_PARTITION_HASH_QUERY = """
+    SELECT 'results:' || EXTRACT(YEAR FROM e.election_date)::int,
+           md5(string_agg(er.insee_code || ':' || er.candidate_id || ':' || er.vote_share::text,
+                          ',' ORDER BY er.insee_code, er.candidate_id))
+    FROM election_result er
+    JOIN election e ON e.election_id = er.election_id
+    JOIN geo_commune gc ON gc.insee_code = er.insee_code
+    WHERE e.election_type = 'presidentielle' AND e.round = 1
+      AND er.insee_code = rpad(gc.dept_code, 5, '0')
+      AND er.vote_share IS NOT NULL
+      AND EXTRACT(YEAR FROM e.election_date)::int = ANY(%s)
+    GROUP BY 1
+"""
+
+BLOC_PARTITION_HASH_QUERY = """
+    SELECT 'blocs:' || EXTRACT(YEAR FROM e.election_date)::int,
+           md5(string_agg(br.geo_code || ':' || br.bloc_code || ':' || br.vote_share::text,
+                          ',' ORDER BY br.geo_code, br.bloc_code))
+    FROM bloc_result br
+    JOIN election e ON e.election_id = br.election_id
+    WHERE e.election_type = 'presidentielle' AND e.round = 1
+      AND br.level = 'departement' AND br.vote_share IS NOT NULL
+      AND EXTRACT(YEAR FROM e.election_date)::int = ANY(%s)
+    GROUP BY 1
+"""
+
+INDICATOR_PARTITION_HASH_QUERY = """
+    SELECT 'indicator:' || i.indicator_code || ':' || iv.year,
+           md5(string_agg(iv.insee_code || ':' || coalesce(iv.value::text, ''),
+                          ',' ORDER BY iv.insee_code))
+    FROM indicator_value iv
+    JOIN indicator i ON i.indicator_id = iv.indicator_id
+    GROUP BY 1
+"""
+
+LAG_PARTITION_HASH_QUERY = """
+    SELECT 'lag:' || i.indicator_code || ':' || lag.year,
+           md5(string_agg(lag.insee_code || ':' || coalesce(lag.lag_value::text, ''),
+                          ',' ORDER BY lag.insee_code))
+    FROM indicator_value_spatial_lag lag
+    JOIN indicator i ON i.indicator_id = lag.indicator_id
+    GROUP BY 1
+"""
+
+# Stamps come from the load bookkeeping, never from the facts: the checkpoint
+# of every unit that writes a partition group (fingerprint and completion
+# time), and the bureau table for elections loaded live.
+ELECTION_YEARS_QUERY = """
+    SELECT DISTINCT EXTRACT(YEAR FROM election_date)::int
+    FROM election
+    WHERE election_type = 'presidentielle' AND round = 1
+"""
+
+CHECKPOINT_STAMP_QUERY = """
+    SELECT pipeline, unit, fingerprint, completed_at::text
+    FROM etl_checkpoint
+    ORDER BY pipeline, unit
+"""
+
+LIVE_STAMP_QUERY = """
+    SELECT EXTRACT(YEAR FROM e.election_date)::int, count(*), max(lb.updated_at)::text
+    FROM live_bureau lb
+    JOIN election e ON e.election_id = lb.election_id
+    WHERE e.election_type = 'presidentielle' AND e.round = 1
+    GROUP BY 1
+"""
+
+# Numeric arrays kept in the shared buffer. Rows are sorted by year so a
+# temporal train/test split is a contiguous slice (a view, never a copy).
+ARRAY_NAMES = ("features", "target", "row_year", "row_geo", "row_candidate")
+
+
+def _fetch(cur, query, columns):
+    cur.execute(query)
+    return pd.DataFrame(cur.fetchall(), columns=columns)
+
+
+def _has_lag_table(cur):
+    cur.execute("SELECT to_regclass('indicator_value_spatial_lag')")
+    return cur.fetchone()[0] is not None
+
+
+def _partition_group(key):
+    # results:<year> and blocs:<year> are stamped per year; indicator and lag
+    # partitions are all written by the same load units.
+    kind = key.split(":", 1)[0]
+    return key if kind in ("results", "blocs") else kind
+
+
+def partition_stamps(cur, target=None):
+    # {group: stamp}. A group with no recorded load, or every group when
+    # checkpoints are off, has a None stamp and is always hashed.
+    prefix = "blocs" if (target or MODEL_TARGET) == "bloc" else "results"
+    cur.execute(ELECTION_YEARS_QUERY)
+    parts = {f"{prefix}:{row[0]}": [] for row in cur.fetchall()}
+    parts.update(indicator=[], lag=[])
+    if not checkpoints.CHECKPOINTS_ENABLED:
+        return {group: None for group in sorted(parts)}
+
+    bloc_groups = [group for group in parts if group.startswith("blocs:")]
+    cur.execute(CHECKPOINT_STAMP_QUERY)
+    for pipeline, unit, unit_fingerprint, completed_at in cur.fetchall():
+        stamp = [pipeline, unit, unit_fingerprint, completed_at]
+        fields = unit.split(":")
+        if unit.startswith("load:presidentielle:") and fields[3] == "t1":
+            parts.setdefault(f"{prefix}:{int(fields[2][:4])}", []).append(stamp)
+        elif unit == "finalize":
+            # Bloc rollups, turnout indicators and lags are rebuilt there.
+            for group in bloc_groups + ["indicator", "lag"]:
+                parts[group].append(stamp)
+        elif pipeline == "blocs":
+            for group in bloc_groups:
+                parts[group].append(stamp)
+        elif pipeline == "socio_indicator_values" and unit == "load":
+            parts["indicator"].append(stamp)
+            parts["lag"].append(stamp)
+        elif pipeline == "spatial":
+            parts["lag"].append(stamp)
+    cur.execute("SELECT to_regclass('live_bureau')")
+    if cur.fetchone()[0] is not None:
+        cur.execute(LIVE_STAMP_QUERY)
+        for year, bureaus, updated_at in cur.fetchall():
+            parts.setdefault(f"{prefix}:{year}", []).append(["live", bureaus, updated_at])
+    return {
+        group: checkpoints.fingerprint(stamp) if stamp else None
+        for group, stamp in sorted(parts.items())
+    }
+
+
+def _read_stamp_cache():
+    if not PARTITION_STAMPS_PATH.exists():
+        return {}
+    return json.loads(PARTITION_STAMPS_PATH.read_text(encoding="utf-8"))
+
+
+def _write_stamp_cache(cache):
+    PARTITION_STAMPS_PATH.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = PARTITION_STAMPS_PATH.with_name(f"{PARTITION_STAMPS_PATH.name}.{os.getpid()}.part")
+    tmp_path.write_text(json.dumps(cache, indent=1, sort_keys=True), encoding="utf-8")
+    os.replace(tmp_path, PARTITION_STAMPS_PATH)
+
+
+def partition_hashes(cur, target=None):
+    # Only the groups whose stamp moved since the last call are scanned; the
+    # others keep the hashes cached under their stamp.
+    target = target or MODEL_TARGET
+    stamps = partition_stamps(cur, target)
+    cache = _read_stamp_cache()
+    cached = cache.get(target, {"stamps": {}, "hashes": {}})
+    stale = {
+        group
+        for group, stamp in stamps.items()
+        if stamp is None or cached["stamps"].get(group) != stamp
+    }
+    hashes = {
+        key: value
+        for key, value in cached["hashes"].items()
+        if _partition_group(key) in stamps and _partition_group(key) not in stale
+    }
+
+    queries = []
+    years = sorted(int(group.split(":")[1]) for group in stale if ":" in group)
+    if years:
+        query = BLOC_PARTITION_HASH_QUERY if target == "bloc" else RESULT_PARTITION_HASH_QUERY
+        queries.append((query, (years,)))
+    if "indicator" in stale:
+        queries.append((INDICATOR_PARTITION_HASH_QUERY, None))
+    if "lag" in stale and _has_lag_table(cur):
+        queries.append((LAG_PARTITION_HASH_QUERY, None))
+    for query, params in queries:
+        cur.execute(query, params)
+        hashes.update(dict(cur.fetchall()))
+
+    cache[target] = {"stamps": stamps, "hashes": hashes}
+    _write_stamp_cache(cache)
+    print(f"[tensor] target={target} partition groups={len(stamps)} rehashed={len(stale)}")
+    return dict(sorted(hashes.items()))
+
+
+def read_indicator_frame(cur):
+    columns = ["year", "insee_code", "feature", "value"]
+    indicators = _fetch(cur, INDICATORS_QUERY, columns)
+    if _has_lag_table(cur):
+        lags = _fetch(cur, INDICATOR_LAGS_QUERY, columns)
+        indicators = pd.concat([indicators, lags], ignore_index=True)
+    return indicators
+
+
+def read_training_frames(conn=None, target=None):
+    target = target or MODEL_TARGET
+    own_conn = conn is None
+    conn = conn or get_conn()
+    try:
+        with conn.cursor() as cur:
+            query = BLOC_RESULTS_QUERY if target == "bloc" else RESULTS_QUERY
+            results = _fetch(cur, query, ["year", "insee_code", "candidate_id", "target"])
+            indicators = read_indicator_frame(cur)
+            partitions = partition_hashes(cur, target)
+    finally:
+        if own_conn:
+            conn.close()
+    return results, indicators, partitions
+
+
+def build_training_arrays(results, indicators, target=None):
+    if results.empty:
+        raise RuntimeError("No first-round presidential results to build the training tensor.")
+
+    years = np.array(sorted(results["year"].unique()), dtype="int16")
+    geos = np.array(sorted(results["insee_code"].unique()), dtype=object)
+    # Candidate ids, or bloc codes when MODEL_TARGET=bloc.
+    candidates = np.array(sorted(results["candidate_id"].unique()))
+
+    wide = indicators.pivot_table(
+        index=["year", "insee_code"], columns="feature", values="value", aggfunc="first"
+    )
+    feature_names = list(wide.columns)
+
+    # The candidate's national mean share is part of the design: the models
+    # learn the local deviation from it, which transfers across elections
+    # with different candidate lists.
+    results = results.sort_values(["year", "insee_code", "candidate_id"], kind="stable")
+    national = results.groupby(["year", "candidate_id"])["target"].transform("mean")
+    keys = pd.MultiIndex.from_arrays([results["year"], results["insee_code"]])
+    geo_features = wide.reindex(keys).to_numpy(dtype="float32")
+    features = np.column_stack([geo_features, national.to_numpy(dtype="float32")])
+
+    arrays = {
+        "features": np.ascontiguousarray(features, dtype="float32"),
+        "target": results["target"].to_numpy(dtype="float32"),
+        "row_year": np.searchsorted(years, results["year"].to_numpy()).astype("int16"),
+        "row_geo": np.searchsorted(geos, results["insee_code"].to_numpy()).astype("int32"),
+        "row_candidate": np.searchsorted(candidates, results["candidate_id"].to_numpy()).astype(
+            "int32"
+        ),
+    }
+    labels = {
+        "years": years.tolist(),
+        "geos": geos.tolist(),
+        "candidates": candidates.tolist(),
+        "target": target or MODEL_TARGET,
+        "features": feature_names + ["national_share"],
+    }
+    return arrays, labels
+
+
+def _layout(arrays):
+    layout = {}
+    offset = 0
+    for name in ARRAY_NAMES:
+        array = arrays[name]
+        offset = -(-offset // ALIGNMENT) * ALIGNMENT
+        layout[name] = {"offset": offset, "shape": list(array.shape), "dtype": array.dtype.str}
+        offset += array.nbytes
+    return layout, max(offset, 1)
+
+
+def _views(buffer, layout):
+    return {
+        name: np.ndarray(
+            tuple(spec["shape"]),
+            dtype=np.dtype(spec["dtype"]),
+            buffer=buffer,
+            offset=spec["offset"],
+        )
+        for name, spec in layout.items()
+    }
+
+
+def pack_tensor(arrays, labels, backend=None, path=None, partitions=None):
+    # Everything lives in one contiguous buffer described by a small,
+    # picklable handle; workers receive the handle, never the arrays.
+    backend = (backend or TENSOR_BACKEND).lower()
+    layout, size = _layout(arrays)
+    handle = {
+        "backend": backend,
+        "layout": layout,
+        "labels": labels,
+        "size": size,
+        "partitions": partitions or {},
+    }
+
+    if backend == "shm":
+        block = shared_memory.SharedMemory(create=True, size=size)
+        handle["name"] = block.name
+        buffer = block.buf
+    elif backend == "memmap":
+        path = Path(path or TENSOR_DIR)
+        path.mkdir(parents=True, exist_ok=True)
+        # One file per run: a concurrent search or retrain never truncates
+        # the tensor another run's workers are reading.
+        tensor_path = path / f"tensor-{os.getpid()}-{uuid.uuid4().hex[:8]}.bin"
+        block = np.memmap(tensor_path, dtype="uint8", mode="w+", shape=(size,))
+        handle["path"] = str(tensor_path)
+        buffer = block
+    else:
+        raise ValueError(f"Unsupported tensor backend: {backend}")
+
+    for name, view in _views(buffer, layout).items():
+        view[...] = arrays[name]
+    if backend == "memmap":
+        block.flush()
+        (path / "tensor.json").write_text(json.dumps(handle), encoding="utf-8")
+        del block
+        block = None
+
+    rows, columns = arrays["features"].shape
+    print(f"[tensor] backend={backend} rows={rows} features={columns} bytes={size}")
+    return handle, block
+
+
+def attach_tensor(handle):
+    # Zero-copy: the returned arrays are read-only views over the shared
+    # block (or the page cache of the memory-mapped file).
+    if handle["backend"] == "shm":
+        block = shared_memory.SharedMemory(name=handle["name"])
+        buffer = block.buf
+    else:
+        block = np.memmap(handle["path"], dtype="uint8", mode="r", shape=(handle["size"],))
+        buffer = block
+    views = _views(buffer, handle["layout"])
+    for view in views.values():
+        view.flags.writeable = False
+    return views, block
+
+
+def load_handle(path=None):
+    path = Path(path or TENSOR_DIR) / "tensor.json"
+    if not path.exists():
+        raise RuntimeError(f"No packed tensor at {path}; run `python -m src.model.search` first.")
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def detach_tensor(handle, block):
+    # For processes that attached to a tensor they do not own: closes the
+    # shared memory mapping and leaves unlinking to the owner. A memmap is
+    # unmapped once the caller drops its last reference.
+    if block is None or handle["backend"] != "shm":
+        return
+    try:
+        block.close()
+    except BufferError:
+        pass
+
+
+def release_tensor(handle, block):
+    if handle["backend"] == "memmap":
+        # Mappings still open elsewhere keep the pages until they close.
+        Path(handle["path"]).unlink(missing_ok=True)
+        index = Path(handle["path"]).with_name("tensor.json")
+        if index.exists() and load_handle(index.parent)["path"] == handle["path"]:
+            index.unlink(missing_ok=True)
+        return
+    if block is None:
+        return
+    if handle["backend"] == "shm":
+        try:
+            block.close()
+        except BufferError:
+            # Views are still alive in this process; unlinking is enough,
+            # the segment goes away with the last mapping.
+            pass
+        block.unlink()
+
+
+def build_tensor(backend=None, path=None, conn=None):
+    results, indicators, partitions = read_training_frames(conn)
+    arrays, labels = build_training_arrays(results, indicators)
+    return pack_tensor(arrays, labels, backend, path, partitions)
@@ -0,0 +1,126 @@
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import duckdb
+
+ROOT = Path(__file__).resolve().parents[1]
+SOURCE_ID = "presidentielle_2017_live"
+HEADER = (
+    "Code du departement;Libelle du departement;Code de la circonscription;"
+    "Libelle de la circonscription;Code de la commune;Libelle de la commune;Code du b.vote;"
+    "Inscrits;Abstentions;% Abs/Ins;Votants;% Vot/Ins;Blancs;% Blancs/Ins;% Blancs/Vot;Nuls;"
+    "% Nuls/Ins;% Nuls/Vot;Exprimes;% Exp/Ins;% Exp/Vot;N Panneau;Sexe;Nom;Prenom;Voix;"
+    "% Voix/Ins;% Voix/Exp"
+)
+
+
+def _bureau(code, macron, le_pen, melenchon):
+    blocks = [(1, "MACRON", macron), (2, "LE PEN", le_pen), (3, "MELENCHON", melenchon)]
+    return (
+        f"75;Paris;01;1ere;101;Paris 1er;{code};1000;200;20;800;80;10;1;1;10;1;1;"
+        f"{macron + le_pen + melenchon};78;97;"
+        + ";".join(f"{no};M;{name};X;{votes};0;0" for no, name, votes in blocks)
+        + "\n"
+    )
+
+
+def _run_live(tmp_path):
+    sources = tmp_path / "sources.json"
+    sources.write_text(
+        json.dumps(
+            [
+                {
+                    "id": SOURCE_ID,
+                    "election_type": "presidentielle",
+                    "round": 1,
+                    "election_date": "2017-04-23",
+                    "scope": "departement",
+                    "format": "txt",
+                    "url": "file:///dev/null",
+                    "parser": "interior_blocks",
+                    "options": {"delimiter": ";", "name_offset": 2},
+                }
+            ]
+        ),
+        encoding="utf-8",
+    )
+    env = dict(
+        os.environ,
+        PYTHONPATH=str(ROOT),
+        DB_BACKEND="embedded",
+        EMBEDDED_PARQUET_SNAPSHOTS="false",
+        TARGET_DEPT_CODES="75",
+        ELECTION_SOURCES_FILE=str(sources),
+    )
+    completed = subprocess.run(
+        [sys.executable, "-m", "src.etl.live", SOURCE_ID, "--feed", "feed", "--once"],
+        cwd=tmp_path,
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    assert completed.returncode == 0, completed.stderr
+    return completed.stdout
+
+
+def _commune_votes(tmp_path):
+    conn = duckdb.connect(str(tmp_path / "data/warehouse/mspr.duckdb"), read_only=True)
+    try:
+        rows = conn.execute(
+            """
+            SELECT c.candidate_name, er.votes, er.votes_valid
+            FROM election_result er
+            JOIN candidate c ON c.candidate_id = er.candidate_id
+            WHERE er.insee_code = '75101'
+            """
+        ).fetchall()
+        offsets = conn.execute("SELECT file_offset FROM live_feed_file").fetchall()
+    finally:
+        conn.close()
+    return {name: (votes, valid) for name, votes, valid in rows}, [row[0] for row in offsets]
+
+
+def _feed(tmp_path, *lines, append=False):
+    feed = tmp_path / "feed"
+    feed.mkdir(exist_ok=True)
+    path = feed / "bv.txt"
+    with path.open("a" if append else "w", encoding="latin-1") as handle:
+        if not append:
+            handle.write(HEADER + "\n")
+        handle.writelines(lines)
+    return path
+
+
+def test_correction_replaces_bureau_after_restart(tmp_path):
+    _feed(tmp_path, _bureau("0001", 390, 150, 240), _bureau("0002", 310, 190, 280))
+    _run_live(tmp_path)
+
+    path = _feed(tmp_path, _bureau("0002", 400, 100, 280), append=True)
+    _run_live(tmp_path)
+
+    votes, offsets = _commune_votes(tmp_path)
+    assert votes["MACRON"] == (790, 1560)
+    assert votes["MARINE LE PEN"] == (250, 1560)
+    assert votes["MELENCHON"] == (520, 1560)
+    assert offsets == [path.stat().st_size]
+
+    # Nothing new: the restart resumes at the stored offset and applies nothing.
+    assert "[live] bureaus=" not in _run_live(tmp_path)
+    assert _commune_votes(tmp_path)[0] == votes
+
+
+def test_correction_in_the_same_poll(tmp_path):
+    _feed(
+        tmp_path,
+        _bureau("0001", 390, 150, 240),
+        _bureau("0002", 310, 190, 280),
+        _bureau("0002", 400, 100, 280),
+    )
+    _run_live(tmp_path)
+
+    votes, _ = _commune_votes(tmp_path)
+    assert votes["MACRON"] == (790, 1560)
+    assert votes["MELENCHON"] == (520, 1560)